@@ -11,6 +11,16 @@ def create_app(config_name="production"):
     else:
         app.config.from_object("app.config.ProductionConfig")
 
+    # Chart queries read a local snapshot of timelapse.db when enabled
+    from app.services import snapshot_service
+
+    snapshot_service.configure(app.config["CHARTS_SNAPSHOT_MAX_AGE"])
+
+    # Live chart streams are only served by processes that allow them
+    from app.services import live_service
+
+    live_service.configure(app.config["CHARTS_LIVE_MAX_STREAMS"])
+
     # Context processor to make camera name available to all templates
     @app.context_processor
     def inject_camera_name():
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 
 class Config:
@@ -14,6 +15,14 @@ class Config:
     VIDEOS_DIR = "/var/www/html/videos"
     STATUS_IMAGE = "/var/www/html/status.jpg"
 
+    # Seconds the charts may lag timelapse.db when reading its local
+    # snapshot; None reads timelapse.db directly
+    CHARTS_SNAPSHOT_MAX_AGE: Optional[float] = None
+
+    # Open /charts/api/live streams allowed per process; None keeps
+    # live_service.MAX_SUBSCRIBERS
+    CHARTS_LIVE_MAX_STREAMS: Optional[int] = None
+
     # Job management
     JOB_STATUS_FILE = "/tmp/raspilapse-job.json"
     MAX_JOB_TIMEOUT = 7200  # 2 hours max
@@ -21,6 +30,10 @@ class Config:
 
 class ProductionConfig(Config):
     DEBUG = False
+    CHARTS_SNAPSHOT_MAX_AGE = float(os.environ.get("CHARTS_SNAPSHOT_MAX_AGE", "30"))
+    # Streams belong to the gevent live service, which raises this; the
+    # gthread service refuses them so they can't hold its threads
+    CHARTS_LIVE_MAX_STREAMS = int(os.environ.get("CHARTS_LIVE_MAX_STREAMS", "0"))
 
 
 class DevelopmentConfig(Config):
@@ -1,15 +1,57 @@
 """Routes for interactive charts page."""
 
-from flask import Blueprint, render_template, jsonify, request
+import click
+import math
+import yaml
+from datetime import datetime
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    render_template,
+    jsonify,
+    request,
+    stream_with_context,
+)
+from app.services import (
+    chart_binary,
+    charts_service,
+    export_service,
+    index_service,
+    live_service,
+    overlay_service,
+    stats_service,
+)
 from app.services.charts_service import (
     get_data_range,
     query_chart_data,
+    query_chart_delta,
+    query_chart_batch,
+    stream_chart_data,
     get_mode_zones,
+    get_capture_gaps,
     get_available_metrics,
+    DOWNSAMPLE_MODES,
+    TS_FORMATS,
 )
 
 bp = Blueprint("charts", __name__)
 
+# Upper bound on panels per /api/batch request
+MAX_BATCH_PANELS = 10
+
+# Upper bound on bins per axis for /api/correlation
+MAX_CORRELATION_BINS = 200
+
+# Most bins per histogram
+MAX_HISTOGRAM_BINS = 1000
+
+# Most time-of-day bins per heatmap row (one per minute)
+MAX_HEATMAP_BINS = 1440
+
+# Response encodings for /api/data and /api/batch
+OUTPUT_FORMATS = ("json", "binary")
+
 
 @bp.route("/")
 def index():
@@ -19,6 +61,11 @@ def index():
     return render_template("charts.html", data_range=data_range, metrics=metrics)
 
 
+def get_page_token(page):
+    """Scope a client page token to the endpoint it was sent to."""
+    return f"{request.endpoint}:{page}" if page else None
+
+
 @bp.route("/api/data")
 def api_data():
     """
@@ -29,15 +76,65 @@ def api_data():
         end: ISO timestamp for end of range
         metrics: Comma-separated list of metric names
         downsample: Maximum number of points (default: 500)
+        mode: Downsampling mode, "lttb" (default) or "m4"
+        resolution: "auto" (default) to use rollups for long ranges, or "raw"
+        cursor: Only return rows appended after this cursor (from a
+            previous response); start/end/downsample are ignored
+        since: Only return rows with a unix timestamp after this value
+        stream: "1" to stream every row in the range without downsampling,
+            as {"columns", "cursor", "rows", "count"}; downsample, mode and
+            resolution are ignored
+        format: "json" (default) or "binary" for the compact columnar
+            encoding described in app.services.chart_binary
+        ts: Timestamp format for JSON, "iso" (default) or "epoch_ms"
+        page: Page token; a newer request with the same token cancels
+            this one's SQL
     """
     start = request.args.get("start")
     end = request.args.get("end")
     metrics_param = request.args.get("metrics", "")
     downsample = request.args.get("downsample", "500")
+    mode = request.args.get("mode", "lttb")
+    resolution = request.args.get("resolution", "auto")
+    output_format = request.args.get("format", "json")
+    ts_format = request.args.get("ts", "iso")
+
+    if mode not in DOWNSAMPLE_MODES:
+        return jsonify({"error": f"Unknown mode: {mode}"}), 400
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({"error": f"Unknown format: {output_format}"}), 400
+    if ts_format not in TS_FORMATS:
+        return jsonify({"error": f"Unknown timestamp format: {ts_format}"}), 400
 
     # Parse metrics
     metrics = [m.strip() for m in metrics_param.split(",") if m.strip()]
 
+    # Delta query for auto-refresh
+    cursor_param = request.args.get("cursor", "")
+    since_param = request.args.get("since", "")
+    if cursor_param or since_param:
+        try:
+            cursor = int(cursor_param) if cursor_param else None
+            since = float(since_param) if since_param else None
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        data = query_chart_delta(
+            cursor=cursor,
+            since=since,
+            metrics=metrics if metrics else None,
+            ts_format=ts_format,
+        )
+        return jsonify(data)
+
+    # Full-resolution export, written as rows are read
+    if request.args.get("stream") == "1":
+        stream = stream_chart_data(
+            start=start, end=end, metrics=metrics if metrics else None
+        )
+        if isinstance(stream, dict):
+            return jsonify(stream)
+        return Response(stream_with_context(stream), mimetype="application/json")
+
     # Parse downsample
     try:
         downsample = int(downsample)
@@ -50,11 +147,346 @@ def api_data():
         end=end,
         metrics=metrics if metrics else None,
         downsample=downsample,
+        mode=mode,
+        resolution=resolution,
+        ts_format="unix" if output_format == "binary" else ts_format,
+        token=get_page_token(request.args.get("page")),
+    )
+
+    if output_format == "binary" and "error" not in data:
+        return Response(
+            chart_binary.encode_chart_data(data), mimetype=chart_binary.MIME_TYPE
+        )
+    return jsonify(data)
+
+
+@bp.route("/api/live")
+def api_live():
+    """
+    Push captures as they are appended, as Server-Sent Events.
+
+    Each "captures" event carries a delta in the /api/data?cursor= shape,
+    with the new cursor as its event id. A "reload" event means more rows
+    arrived than a delta holds and the page should reload its range.
+
+    Query params:
+        metrics: Comma-separated list of metric names
+        cursor: Push rows appended after this cursor (default: from now);
+            the Last-Event-ID header of a reconnecting browser wins
+        ts: Timestamp format, "iso" (default) or "epoch_ms"
+
+    Returns 503 when the per-process stream limit is reached; the page
+    polls /api/data with its cursor instead.
+    """
+    ts_format = request.args.get("ts", "iso")
+    if ts_format not in TS_FORMATS:
+        return jsonify({"error": f"Unknown timestamp format: {ts_format}"}), 400
+
+    metrics = [
+        m.strip() for m in request.args.get("metrics", "").split(",") if m.strip()
+    ]
+    cursor_param = request.headers.get("Last-Event-ID") or request.args.get("cursor")
+    try:
+        cursor = int(cursor_param) if cursor_param else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    feed = live_service.open_live_feed(
+        metrics=metrics, cursor=cursor, ts_format=ts_format
+    )
+    if isinstance(feed, dict):
+        return jsonify(feed), 503 if feed.get("busy") else 400
+
+    return Response(
+        feed,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@bp.route("/api/batch", methods=["POST"])
+def api_batch():
+    """
+    Query several chart panels and the mode zones in one request.
+
+    JSON body:
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        panels: List of {"id", "metrics", "downsample"} panel specs
+        modes: Include mode zones (default: true)
+        resolution: "auto" (default) to use rollups for long ranges, or "raw"
+        format: "json" (default) or "binary"
+        ts: Timestamp format for JSON, "iso" (default) or "epoch_ms"
+        page: Page token; a newer request with the same token cancels
+            this one's SQL
+    """
+    body = request.get_json(silent=True) or {}
+    panels = body.get("panels")
+    output_format = body.get("format", "json")
+    ts_format = body.get("ts", "iso")
+
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({"error": f"Unknown format: {output_format}"}), 400
+    if ts_format not in TS_FORMATS:
+        return jsonify({"error": f"Unknown timestamp format: {ts_format}"}), 400
+
+    if not isinstance(panels, list) or not panels:
+        return jsonify({"error": "No panels specified"}), 400
+    if len(panels) > MAX_BATCH_PANELS:
+        return jsonify({"error": f"At most {MAX_BATCH_PANELS} panels allowed"}), 400
+
+    specs = []
+    for panel in panels:
+        if not isinstance(panel, dict) or "id" not in panel:
+            return jsonify({"error": "Each panel needs an id"}), 400
+
+        metrics = panel.get("metrics", [])
+        if isinstance(metrics, str):
+            metrics = [m.strip() for m in metrics.split(",") if m.strip()]
+
+        # Parse downsample
+        try:
+            downsample = int(panel.get("downsample", 500))
+            downsample = max(50, min(2000, downsample))  # Clamp to reasonable range
+        except (TypeError, ValueError):
+            downsample = 500
+
+        specs.append({"id": panel["id"], "metrics": metrics, "downsample": downsample})
+
+    data = query_chart_batch(
+        start=body.get("start"),
+        end=body.get("end"),
+        panels=specs,
+        include_modes=bool(body.get("modes", True)),
+        resolution=body.get("resolution", "auto"),
+        ts_format="unix" if output_format == "binary" else ts_format,
+        token=get_page_token(body.get("page")),
+    )
+
+    if output_format == "binary" and "error" not in data:
+        return Response(
+            chart_binary.encode_chart_batch(data), mimetype=chart_binary.MIME_TYPE
+        )
+    return jsonify(data)
+
+
+@bp.route("/api/stats")
+def api_stats():
+    """
+    Get summary statistics per metric over a time range.
+
+    Query params:
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        metrics: Comma-separated list of numeric metric names
+        bucket: Optional "hour" or "day" to also return per-bucket stats
+    """
+    metrics_param = request.args.get("metrics", "")
+    metrics = [m.strip() for m in metrics_param.split(",") if m.strip()]
+    bucket = request.args.get("bucket") or None
+
+    if bucket is not None and bucket not in stats_service.STATS_BUCKETS:
+        return jsonify({"error": f"Unknown bucket: {bucket}"}), 400
+
+    data = stats_service.query_stats(
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        metrics=metrics if metrics else None,
+        bucket=bucket,
+    )
+    return jsonify(data)
+
+
+@bp.route("/api/histogram")
+def api_histogram():
+    """
+    Get the distribution of one metric as bin counts.
+
+    Query params:
+        metric: Numeric metric name (required)
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        bins: Number of bins (default: 50)
+        scale: "linear" (default) or "log"
+    """
+    metric = request.args.get("metric", "")
+    if not metric:
+        return jsonify({"error": "A metric is required"}), 400
+
+    scale = request.args.get("scale", "linear")
+    if scale not in stats_service.AXIS_SCALES:
+        return jsonify({"error": f"Unknown scale: {scale}"}), 400
+
+    # Parse bins
+    try:
+        bins = int(request.args.get("bins", "50"))
+        bins = max(5, min(MAX_HISTOGRAM_BINS, bins))  # Clamp to reasonable range
+    except ValueError:
+        bins = 50
+
+    data = stats_service.query_histogram(
+        metric=metric,
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        bins=bins,
+        scale=scale,
+    )
+    return jsonify(data)
+
+
+@bp.route("/api/correlation")
+def api_correlation():
+    """
+    Get a 2D histogram of two metrics for scatter views.
+
+    Query params:
+        x: Numeric metric for the x axis
+        y: Numeric metric for the y axis
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        bins: Bins per axis (default: 50)
+        xscale: "linear" (default) or "log"
+        yscale: "linear" (default) or "log"
+    """
+    x = request.args.get("x", "")
+    y = request.args.get("y", "")
+    if not x or not y:
+        return jsonify({"error": "Both x and y metrics are required"}), 400
+
+    x_scale = request.args.get("xscale", "linear")
+    y_scale = request.args.get("yscale", "linear")
+    for scale in (x_scale, y_scale):
+        if scale not in stats_service.AXIS_SCALES:
+            return jsonify({"error": f"Unknown scale: {scale}"}), 400
+
+    # Parse bins
+    try:
+        bins = int(request.args.get("bins", "50"))
+        bins = max(5, min(MAX_CORRELATION_BINS, bins))  # Clamp to reasonable range
+    except ValueError:
+        bins = 50
+
+    data = stats_service.query_correlation(
+        x=x,
+        y=y,
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        bins=bins,
+        x_scale=x_scale,
+        y_scale=y_scale,
+    )
+    return jsonify(data)
+
+
+@bp.route("/api/overlay")
+def api_overlay():
+    """
+    Overlay several days of metrics on one time-of-day axis.
+
+    Query params:
+        days: Comma-separated local days, as ISO dates or days before
+            today (default: "0,1", today and yesterday)
+        metrics: Comma-separated list of numeric metric names
+        downsample: Points on the shared time-of-day axis (default: 500)
+        from: Start of the time-of-day window, "HH:MM" (default: 00:00)
+        to: End of the time-of-day window, "HH:MM" (default: 24:00)
+    """
+    days = [d.strip() for d in request.args.get("days", "").split(",") if d.strip()]
+    metrics_param = request.args.get("metrics", "")
+    metrics = [m.strip() for m in metrics_param.split(",") if m.strip()]
+
+    # Parse downsample
+    try:
+        downsample = int(request.args.get("downsample", "500"))
+        downsample = max(50, min(2000, downsample))  # Clamp to reasonable range
+    except ValueError:
+        downsample = 500
+
+    try:
+        from_time = overlay_service.parse_time_of_day(request.args.get("from", "00:00"))
+        to_time = overlay_service.parse_time_of_day(request.args.get("to", "24:00"))
+    except ValueError:
+        return jsonify({"error": "Invalid time of day"}), 400
+
+    data = overlay_service.query_overlay(
+        days=days if days else None,
+        metrics=metrics if metrics else None,
+        downsample=downsample,
+        from_time=from_time,
+        to_time=to_time,
     )
+    return jsonify(data)
+
+
+@bp.route("/api/heatmap")
+def api_heatmap():
+    """
+    Get a day x time-of-day matrix of one metric ("metric keogram").
+
+    Query params:
+        metric: Numeric metric name (required)
+        start: ISO timestamp for start of range (default: 30 days ago)
+        end: ISO timestamp for end of range
+        bins: Time-of-day bins per day (default: 144, 10-minute slots)
+        agg: "avg" (default), "min", "max" or "count"
+    """
+    metric = request.args.get("metric", "")
+    if not metric:
+        return jsonify({"error": "A metric is required"}), 400
 
+    agg = request.args.get("agg", "avg")
+    if agg not in overlay_service.HEATMAP_AGGREGATES:
+        return jsonify({"error": f"Unknown aggregate: {agg}"}), 400
+
+    # Parse bins
+    try:
+        bins = int(request.args.get("bins", "144"))
+        bins = max(24, min(MAX_HEATMAP_BINS, bins))  # Clamp to reasonable range
+    except ValueError:
+        bins = 144
+
+    data = overlay_service.query_heatmap(
+        metric=metric,
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        bins=bins,
+        agg=agg,
+    )
     return jsonify(data)
 
 
+@bp.route("/api/export")
+def api_export():
+    """
+    Download captures in a time range for offline analysis.
+
+    Query params:
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        metrics: Comma-separated list of metric names (default: all)
+        format: "csv" (default) or "parquet" when pyarrow is installed
+    """
+    metrics_param = request.args.get("metrics", "")
+    metrics = [m.strip() for m in metrics_param.split(",") if m.strip()]
+    fmt = request.args.get("format", "csv")
+
+    export = export_service.export_captures(
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        metrics=metrics if metrics else None,
+        fmt=fmt,
+    )
+    if isinstance(export, dict):
+        return jsonify(export), 400
+
+    filename = f"captures_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(export),
+        mimetype=export_service.EXPORT_MIME_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @bp.route("/api/range")
 def api_range():
     """Get available data range (earliest/latest timestamps)."""
@@ -77,7 +509,108 @@ def api_modes():
     return jsonify({"zones": zones})
 
 
+def get_capture_interval():
+    """Read timelapse.interval (seconds) from the raspilapse config, if set."""
+    try:
+        with open(current_app.config["RASPILAPSE_CONFIG"], "r") as f:
+            config = yaml.safe_load(f) or {}
+        interval = float(config.get("timelapse", {}).get("interval"))
+    except (OSError, yaml.YAMLError, AttributeError, TypeError, ValueError):
+        return None
+    return interval if math.isfinite(interval) and interval > 0 else None
+
+
+@bp.route("/api/gaps")
+def api_gaps():
+    """
+    Get stretches where capturing stalled, for overlay on the charts.
+
+    Query params:
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        factor: Multiple of the capture interval that counts as a gap
+            (default: 3)
+        interval: Capture interval in seconds (default: timelapse.interval
+            from the raspilapse config)
+    """
+    try:
+        factor = float(request.args.get("factor", charts_service.GAP_FACTOR))
+        interval_param = request.args.get("interval")
+        interval = float(interval_param) if interval_param else get_capture_interval()
+    except ValueError:
+        return jsonify({"error": "Invalid factor or interval"}), 400
+
+    # float() accepts "nan" and "inf", which can't be serialized as JSON
+    if interval is not None and not math.isfinite(interval):
+        return jsonify({"error": "Invalid factor or interval"}), 400
+    if interval is None or interval <= 0:
+        return jsonify({"error": "Capture interval not configured"}), 400
+    if not math.isfinite(factor) or factor <= 0:
+        return jsonify({"error": "Invalid factor or interval"}), 400
+
+    data = get_capture_gaps(
+        interval,
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+        factor=factor,
+    )
+    return jsonify(dict(data, interval=interval))
+
+
+@bp.route("/api/cadence")
+def api_cadence():
+    """
+    Get the spread of time between consecutive captures, per hour and mode.
+
+    Query params:
+        start: ISO timestamp for start of range
+        end: ISO timestamp for end of range
+        interval: Capture interval in seconds (default: timelapse.interval
+            from the raspilapse config)
+    """
+    try:
+        interval_param = request.args.get("interval")
+        interval = float(interval_param) if interval_param else get_capture_interval()
+    except ValueError:
+        return jsonify({"error": "Invalid interval"}), 400
+
+    if interval is not None and not math.isfinite(interval):
+        return jsonify({"error": "Invalid interval"}), 400
+    if interval is None or interval <= 0:
+        return jsonify({"error": "Capture interval not configured"}), 400
+
+    data = stats_service.query_cadence(
+        interval,
+        start=request.args.get("start"),
+        end=request.args.get("end"),
+    )
+    return jsonify(data)
+
+
 @bp.route("/api/metrics")
 def api_metrics():
     """Get list of available metrics."""
     return jsonify({"metrics": get_available_metrics()})
+
+
+@bp.cli.command("indexes")
+@click.option("--create", is_flag=True, help="Create missing recommended indexes.")
+def indexes_command(create):
+    """Check index coverage of the charts queries on captures."""
+    db_path = charts_service.DATABASE_PATH
+    if not db_path.exists():
+        raise click.ClickException(f"Database not found: {db_path}")
+
+    if create:
+        created = index_service.ensure_indexes(db_path)
+        for name in created:
+            click.echo(f"Created index {name}")
+
+    for report in index_service.check_query_plans(db_path):
+        status = "ok" if report["covered"] else "NOT COVERED"
+        click.echo(f"{report['query']}: {status}")
+        for line in report["plan"]:
+            click.echo(f"    {line}")
+
+    for name, columns in index_service.get_missing_indexes(db_path):
+        click.echo(f"Missing index {name} on captures ({columns})")
@@ -0,0 +1,124 @@
+"""Compact binary columnar encoding of chart series.
+
+Layout (all numbers little-endian):
+
+    0   4 bytes   magic b"RLCB"
+    4   uint16    format version (1)
+    6   uint16    reserved (0)
+    8   uint32    header length in bytes
+    12  header    UTF-8 JSON, padded with spaces to a multiple of 8 bytes
+
+followed by one block per entry of header["series"], in order:
+
+    float64[count]      timestamps, epoch milliseconds
+    per numeric metric in series["metrics"]:
+        uint8[ceil(count / 8)]  validity bitmap, LSB first, 1 = value present
+        padding to a multiple of 4 bytes
+        float32[count]          values, NaN where the bitmap bit is 0
+    padding to a multiple of 8 bytes
+
+Non-numeric metrics (mode) travel as JSON lists in series["text"]. Every
+other key of a series or of the response is copied into the header.
+"""
+
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List
+
+MAGIC = b"RLCB"
+VERSION = 1
+
+MIME_TYPE = "application/vnd.raspilapse.chart"
+
+_PREAMBLE = struct.Struct("<4sHHI")
+
+
+def _pad(length: int, alignment: int) -> bytes:
+    """Zero bytes needed to bring length up to a multiple of alignment."""
+    return b"\0" * (-length % alignment)
+
+
+def _little_endian(values: array) -> bytes:
+    """Get the bytes of an array in little-endian order."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_block(series: Dict[str, Any], numeric: List[str]) -> bytes:
+    """Encode the timestamps and numeric columns of one series."""
+    count = len(series["timestamps"])
+    parts = [_little_endian(array("d", (ts * 1000.0 for ts in series["timestamps"])))]
+
+    for metric in numeric:
+        values = series["data"][metric]
+        bitmap = bytearray((count + 7) // 8)
+        column = array("f", bytes(4 * count))
+        for i, value in enumerate(values):
+            if value is None:
+                column[i] = float("nan")
+            else:
+                bitmap[i >> 3] |= 1 << (i & 7)
+                column[i] = value
+        parts.append(bytes(bitmap) + _pad(len(bitmap), 4))
+        parts.append(_little_endian(column))
+
+    block = b"".join(parts)
+    return block + _pad(len(block), 8)
+
+
+def _is_numeric(values: List[Any]) -> bool:
+    """Check a column holds only numbers and nulls."""
+    return all(
+        value is None
+        or (isinstance(value, (int, float)) and not isinstance(value, bool))
+        for value in values
+    )
+
+
+def _series_header(series: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe a series in the JSON header and pick its numeric metrics."""
+    header = {k: v for k, v in series.items() if k not in ("timestamps", "data")}
+    header["count"] = len(series["timestamps"])
+    header["metrics"] = [m for m, v in series["data"].items() if _is_numeric(v)]
+    header["text"] = {
+        m: v for m, v in series["data"].items() if m not in header["metrics"]
+    }
+    return header
+
+
+def encode(meta: Dict[str, Any], series: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode series in the binary chart format.
+
+    Args:
+        meta: Response-level keys to put in the header (cursor, zones, ...)
+        series: Series with unix-second "timestamps" and per-metric "data";
+            a series with an "id" key is encoded as a batch panel
+
+    Returns:
+        The encoded payload
+    """
+    headers = [_series_header(s) for s in series]
+    blocks = [_encode_block(s, h["metrics"]) for s, h in zip(series, headers)]
+
+    header = json.dumps(dict(meta, series=headers), separators=(",", ":")).encode()
+    header += b" " * (-(_PREAMBLE.size + len(header)) % 8)
+
+    return b"".join([_PREAMBLE.pack(MAGIC, VERSION, 0, len(header)), header] + blocks)
+
+
+def encode_chart_data(result: Dict[str, Any]) -> bytes:
+    """Encode a query_chart_data result (with unix timestamps)."""
+    meta = {k: v for k, v in result.items() if k not in ("timestamps", "data")}
+    return encode(meta, [{"timestamps": result["timestamps"], "data": result["data"]}])
+
+
+def encode_chart_batch(result: Dict[str, Any]) -> bytes:
+    """Encode a query_chart_batch result (with unix timestamps)."""
+    meta = {k: v for k, v in result.items() if k != "panels"}
+    series = [dict(panel, id=panel_id) for panel_id, panel in result["panels"].items()]
+    return encode(meta, series)
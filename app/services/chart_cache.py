@@ -0,0 +1,114 @@
+"""Versioned in-process LRU cache for chart query results.
+
+Entries are stored together with a data version and are only served while
+the database still has that version. Appending captures moves the version
+of open-ended ranges only; any other change to the database (updates,
+deletes, a replaced file) moves the version of every range.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+class DataVersion(NamedTuple):
+    """Snapshot of what a cached result may depend on."""
+
+    identity: Tuple[str, int, int]  # (path, st_dev, st_ino)
+    generation: int  # Bumped on non-append changes
+    max_rowid: int
+    newest_ts: Optional[float]
+
+
+class VersionedLRUCache:
+    """Thread-safe LRU mapping keys to (version, value) pairs."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Return the cached value if it was stored under this version."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_local = threading.local()
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def get_data_version(conn: sqlite3.Connection, db_path: Path) -> DataVersion:
+    """
+    Work out the current data version of a captures database.
+
+    PRAGMA data_version changes whenever another connection commits. If it
+    changed but MAX(rowid) did not grow, the commit touched existing rows,
+    so the shared generation for the file is bumped.
+    """
+    stat = os.stat(db_path)
+    key = str(db_path)
+    identity = (key, stat.st_dev, stat.st_ino)
+
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    # Both are single index seeks (rowid and the unix_timestamp index)
+    row = conn.execute(
+        "SELECT (SELECT MAX(rowid) FROM captures), "
+        "(SELECT MAX(unix_timestamp) FROM captures)"
+    ).fetchone()
+    max_rowid, newest_ts = row[0] or 0, row[1]
+
+    seen = getattr(_local, "seen", None)
+    if seen is None:
+        seen = _local.seen = {}
+
+    previous = seen.get(key)
+    if previous is not None:
+        prev_identity, prev_data_version, prev_max_rowid = previous
+        if prev_identity == identity and prev_data_version != data_version:
+            if max_rowid <= prev_max_rowid:
+                with _generations_lock:
+                    _generations[key] = _generations.get(key, 0) + 1
+    seen[key] = (identity, data_version, max_rowid)
+
+    return DataVersion(identity, _generations.get(key, 0), max_rowid, newest_ts)
+
+
+def version_for_range(version: DataVersion, end_ts: Optional[float]) -> Hashable:
+    """
+    Reduce a data version to what a result for a range depends on.
+
+    Ranges that end before the newest capture are closed: appended rows
+    can't change them, so their version ignores MAX(rowid).
+    """
+    if end_ts is not None and version.newest_ts is not None:
+        if end_ts < version.newest_ts:
+            return (version.identity, version.generation)
+    return (version.identity, version.generation, version.max_rowid)
@@ -1,9 +1,26 @@
 """Charts service for querying timelapse data and LTTB downsampling."""
 
+import json
+import math
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+from array import array
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Any, Union
+
+from app.services import (
+    chart_cache,
+    db_pool,
+    query_budget,
+    rollup_service,
+    snapshot_service,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
 
 # Database path
 DATABASE_PATH = Path("/home/pi/raspilapse/data/timelapse.db")
@@ -42,38 +59,186 @@ AVAILABLE_METRICS = {
     "system_load_15min": "system_load_15min",
 }
 
+# Metrics stored as text; they can't be averaged or used as min/max extremes
+NON_NUMERIC_METRICS = {"mode"}
+
+# Columns kept in the rollup tables
+ROLLUP_COLUMNS = [
+    col for m, col in AVAILABLE_METRICS.items() if m not in NON_NUMERIC_METRICS
+]
+
+# Supported downsampling modes for query_chart_data
+DOWNSAMPLE_MODES = ("lttb", "m4")
+
+# Maximum rows returned by a delta query before the client must reload
+DELTA_LIMIT = 2000
+
+# Range edges are snapped to 1/RANGE_STEPS of the span for cache sharing
+RANGE_STEPS = 1000
+
+# Timestamp formats for JSON responses: local ISO strings, or epoch
+# milliseconds that clients can use without parsing. Results are kept in
+# unix seconds ("unix") until the response is built.
+TS_FORMATS = ("iso", "epoch_ms", "unix")
+
+# Rows fetched per round trip when streaming raw chart data
+STREAM_CHUNK_ROWS = 1000
+
+# Rows decoded per round trip when reading chart columns (also the size
+# columns start at before they grow)
+DECODE_CHUNK_ROWS = 5000
+
+# A capture gap is a delta longer than this many capture intervals
+GAP_FACTOR = 3.0
+
+# Error returned when a newer request with the same page token took over
+SUPERSEDED_ERROR = "Superseded by a newer request"
+
+# Shared result cache for chart queries, versioned by the database contents
+_cache = chart_cache.VersionedLRUCache(max_entries=128)
+
+
+class _RangeSummary(NamedTuple):
+    """Earliest/latest/number of captures up to max_rowid."""
+
+    identity: Tuple[str, int, int]
+    generation: int
+    max_rowid: int
+    earliest: Optional[str]
+    latest: Optional[str]
+    rows: int
+
+
+_range_summaries: Dict[str, _RangeSummary] = {}
+_range_lock = threading.Lock()
+
+
+def _to_unix(value: str) -> float:
+    """Convert an ISO timestamp to unix time (naive values are local time)."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value).timestamp()
+
+
+def resolve_range(start: Optional[str], end: Optional[str]) -> Tuple[float, float]:
+    """
+    Convert an ISO start/end pair to a unix_timestamp range.
+
+    Defaults to the last 24 hours. Queries filter on the numeric
+    unix_timestamp column so the captures index can serve both the range
+    filter and the ORDER BY.
+
+    Raises:
+        ValueError: if start or end is not a valid ISO timestamp
+    """
+    end_ts = _to_unix(end) if end else datetime.now().timestamp()
+    start_ts = _to_unix(start) if start else end_ts - 24 * 3600
+    return start_ts, end_ts
+
 
 def get_db_connection() -> sqlite3.Connection:
-    """Create a database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Get this thread's pooled read-only database connection.
+
+    Reads go to the local snapshot of timelapse.db when snapshots are
+    enabled (see snapshot_service).
+    """
+    return db_pool.get_connection(snapshot_service.get_read_path(DATABASE_PATH))
 
 
-def get_data_range() -> Dict[str, Optional[str]]:
-    """Get the earliest and latest timestamps in the database."""
+def normalize_range(start_ts: float, end_ts: float) -> Tuple[float, float]:
+    """
+    Snap a range outwards to whole multiples of 1/RANGE_STEPS of its span.
+
+    Requests for "the last 24h" made a few seconds apart then share one
+    cache key, at the cost of widening each edge by at most one step.
+    """
+    quantum = max(1, int((end_ts - start_ts) / RANGE_STEPS))
+    return (
+        math.floor(start_ts / quantum) * quantum,
+        math.ceil(end_ts / quantum) * quantum,
+    )
+
+
+def get_data_range() -> Dict[str, Any]:
+    """
+    Get the earliest and latest timestamps in the database.
+
+    Backed by a per-process summary that only scans rows added since the
+    previous call, so the cost doesn't grow with the size of captures.
+    """
     if not DATABASE_PATH.exists():
         return {"earliest": None, "latest": None, "count": 0}
 
     conn = get_db_connection()
-    try:
-        cursor = conn.execute(
-            """
-            SELECT
-                MIN(timestamp) as earliest,
-                MAX(timestamp) as latest,
-                COUNT(*) as count
-            FROM captures
+    summary = _update_range_summary(
+        conn, chart_cache.get_data_version(conn, DATABASE_PATH)
+    )
+    return {
+        "earliest": summary.earliest,
+        "latest": summary.latest,
+        "count": summary.rows,
+    }
+
+
+def _update_range_summary(
+    conn: sqlite3.Connection, version: chart_cache.DataVersion
+) -> "_RangeSummary":
+    """
+    Bring the range summary for a database up to version.
+
+    Appended rows are folded in from the last summarized rowid. Any other
+    change (new generation or file) rebuilds the summary with one full scan.
+    """
+    key = version.identity[0]
+    with _range_lock:
+        summary = _range_summaries.get(key)
+
+    if (
+        summary is None
+        or summary.identity != version.identity
+        or summary.generation != version.generation
+        or summary.max_rowid > version.max_rowid
+    ):
+        summary = _RangeSummary(version.identity, version.generation, 0, None, None, 0)
+    if summary.max_rowid == version.max_rowid:
+        return summary
+
+    # Bounded above so rows committed after the version was read are left
+    # for the next call instead of being counted twice
+    row = conn.execute(
         """
-        )
-        row = cursor.fetchone()
-        return {
-            "earliest": row["earliest"],
-            "latest": row["latest"],
-            "count": row["count"],
-        }
-    finally:
-        conn.close()
+        SELECT
+            MIN(timestamp) as earliest,
+            MAX(timestamp) as latest,
+            COUNT(*) as count
+        FROM captures
+        WHERE rowid > ? AND rowid <= ?
+    """,
+        (summary.max_rowid, version.max_rowid),
+    ).fetchone()
+
+    earliest = [t for t in (summary.earliest, row["earliest"]) if t is not None]
+    latest = [t for t in (summary.latest, row["latest"]) if t is not None]
+    summary = _RangeSummary(
+        version.identity,
+        version.generation,
+        version.max_rowid,
+        min(earliest) if earliest else None,
+        max(latest) if latest else None,
+        summary.rows + row["count"],
+    )
+
+    with _range_lock:
+        current = _range_summaries.get(key)
+        if (
+            current is None
+            or current.identity != summary.identity
+            or current.generation != summary.generation
+            or current.max_rowid < summary.max_rowid
+        ):
+            _range_summaries[key] = summary
+    return summary
 
 
 def query_chart_data(
@@ -81,15 +246,32 @@ def query_chart_data(
     end: Optional[str] = None,
     metrics: Optional[List[str]] = None,
     downsample: int = 500,
+    mode: str = "lttb",
+    resolution: str = "auto",
+    ts_format: str = "iso",
+    token: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Query chart data from the database.
 
+    The SQL runs under query_budget.QUERY_BUDGET. A query that runs out
+    of budget is answered from a rollup level instead and flagged
+    "partial"; one superseded by a newer request with the same token is
+    abandoned.
+
     Args:
         start: ISO timestamp for start of range (default: 24h ago)
         end: ISO timestamp for end of range (default: now)
         metrics: List of metric names to include
         downsample: Maximum number of points per metric
+        mode: "lttb" to downsample in Python, or "m4" to reduce inside
+            SQLite to the first/last rows and the min/max rows of every
+            numeric metric in equal-width buckets
+        resolution: "auto" to read long ranges from the coarsest rollup
+            level that still yields downsample points, or "raw" to always
+            read captures
+        ts_format: One of TS_FORMATS
+        token: Page token for query_budget.limit
 
     Returns:
         Dict with timestamps and metric data arrays
@@ -98,10 +280,10 @@ def query_chart_data(
         return {"timestamps": [], "data": {}, "error": "Database not found"}
 
     # Default time range: last 24 hours
-    if not end:
-        end = datetime.now().isoformat()
-    if not start:
-        start = (datetime.now() - timedelta(hours=24)).isoformat()
+    try:
+        start_ts, end_ts = resolve_range(start, end)
+    except ValueError:
+        return {"timestamps": [], "data": {}, "error": "Invalid time range"}
 
     # Validate and filter metrics
     if not metrics:
@@ -111,53 +293,774 @@ def query_chart_data(
     if not valid_metrics:
         return {"timestamps": [], "data": {}, "error": "No valid metrics specified"}
 
-    # Build column list
-    columns = ["unix_timestamp", "timestamp"] + [
-        AVAILABLE_METRICS[m] for m in valid_metrics
-    ]
-    columns_str = ", ".join(columns)
+    start_ts, end_ts = normalize_range(start_ts, end_ts)
 
     conn = get_db_connection()
+    # Read the version (and delta cursor) first so a later delta can't skip rows
+    data_version = chart_cache.get_data_version(conn, DATABASE_PATH)
+    version = chart_cache.version_for_range(data_version, end_ts)
+    key = ("data", start_ts, end_ts, tuple(valid_metrics), downsample, mode, resolution)
+
+    result = _cache.get(key, version)
+    if result is None:
+        try:
+            with query_budget.limit(conn, token=token):
+                if mode == "lttb" and resolution == "auto":
+                    result = _query_rollups(start_ts, end_ts, valid_metrics, downsample)
+                if result is None and mode == "m4":
+                    result = _query_m4(
+                        conn, start_ts, end_ts, valid_metrics, downsample
+                    )
+                if result is None:
+                    result = _query_raw(
+                        conn, start_ts, end_ts, valid_metrics, downsample
+                    )
+        except query_budget.QueryInterrupted as interrupted:
+            if interrupted.reason == "superseded":
+                return {"timestamps": [], "data": {}, "error": SUPERSEDED_ERROR}
+            result = _partial_series(start_ts, end_ts, valid_metrics, downsample)
+        else:
+            if not _rollups_lag_range(conn, result, end_ts):
+                _cache.set(key, version, result)
+
+    cursor = _result_cursor(result, data_version.max_rowid)
+    return _format_timestamps(dict(result, cursor=cursor), ts_format)
+
+
+def _result_cursor(result: Dict[str, Any], max_rowid: int) -> int:
+    """
+    Get the delta cursor for a query result.
+
+    Series read from rollups are only complete up to the rollups' own
+    cursor, which may lag max_rowid; the client's next delta starts there.
+    """
+    return min(result.get("cursor", max_rowid), max_rowid)
+
+
+def _rollups_lag_range(
+    conn: sqlite3.Connection, result: Dict[str, Any], end_ts: float
+) -> bool:
+    """
+    Check whether a rollup-backed result is missing captures in its range.
+
+    Closed ranges are cached regardless of appends, so a result read from
+    rollups that hadn't caught up yet must not be cached while captures
+    past the rollups' cursor fall inside the range. Those rows are the
+    few appended since the last refresh, found with a rowid seek.
+    """
+    if "cursor" not in result:
+        return False
+    row = conn.execute(
+        "SELECT MIN(unix_timestamp) FROM captures WHERE rowid > ?",
+        (result["cursor"],),
+    ).fetchone()
+    return row[0] is not None and row[0] <= end_ts
+
+
+def stream_chart_data(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    metrics: Optional[List[str]] = None,
+) -> Union[Dict[str, Any], Iterator[str]]:
+    """
+    Stream every capture in a range as a JSON document, without downsampling.
+
+    Rows are pulled with fetchmany and serialized chunk by chunk, so memory
+    stays bounded by STREAM_CHUNK_ROWS however long the range is. The
+    document is row-oriented so it can be written incrementally:
+    {"columns": ["timestamp", ...], "cursor": N, "rows": [[...], ...],
+    "count": N}.
+
+    Returns:
+        An iterator of JSON text chunks, or an error dict shaped like
+        query_chart_data's when the request can't be served
+    """
+    if not DATABASE_PATH.exists():
+        return {"timestamps": [], "data": {}, "error": "Database not found"}
+
     try:
-        cursor = conn.execute(
-            f"""
-            SELECT {columns_str}
-            FROM captures
-            WHERE timestamp >= ? AND timestamp <= ?
-            ORDER BY unix_timestamp ASC
-        """,
-            (start, end),
+        start_ts, end_ts = resolve_range(start, end)
+    except ValueError:
+        return {"timestamps": [], "data": {}, "error": "Invalid time range"}
+
+    if not metrics:
+        metrics = ["lux", "brightness_mean", "exposure_time_us", "weather_temperature"]
+    valid_metrics = [m for m in metrics if m in AVAILABLE_METRICS]
+
+    if not valid_metrics:
+        return {"timestamps": [], "data": {}, "error": "No valid metrics specified"}
+
+    conn = get_db_connection()
+    cursor_rowid = _get_cursor(conn)
+    columns_str = ", ".join(AVAILABLE_METRICS[m] for m in valid_metrics)
+    cursor = conn.execute(
+        f"""
+        SELECT unix_timestamp, {columns_str}
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ? AND rowid <= ?
+        ORDER BY unix_timestamp ASC
+    """,
+        (start_ts, end_ts, cursor_rowid),
+    )
+
+    def generate() -> Iterator[str]:
+        header = json.dumps(["timestamp"] + valid_metrics)
+        yield f'{{"columns": {header}, "cursor": {cursor_rowid}, "rows": ['
+        count = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                chunk = ",".join(
+                    json.dumps(
+                        [datetime.fromtimestamp(row[0]).isoformat()] + list(row[1:])
+                    )
+                    for row in rows
+                )
+                yield ("," if count else "") + chunk
+                count += len(rows)
+        finally:
+            cursor.close()
+        yield f'], "count": {count}}}'
+
+    return generate()
+
+
+def query_chart_batch(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    panels: Optional[List[Dict[str, Any]]] = None,
+    include_modes: bool = True,
+    resolution: str = "auto",
+    ts_format: str = "iso",
+    token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Query the series of several chart panels from a single range scan.
+
+    The union of all panel metrics is read once (from captures, or from
+    one rollup level for long ranges), then each panel is downsampled on
+    its own metrics. On the captures path the mode zones come from the
+    same scan. The time budget applies as in query_chart_data; a
+    partial batch has rollup panels and no zones.
+
+    Args:
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        panels: List of {"id", "metrics", "downsample"} panel specs
+        include_modes: Also return mode zones for background shading
+        resolution: "auto" to allow rollups for long ranges, or "raw"
+        ts_format: One of TS_FORMATS
+        token: Page token for query_budget.limit
+
+    Returns:
+        Dict with per-panel series keyed by panel id, zones and cursor
+    """
+    if not DATABASE_PATH.exists():
+        return {"panels": {}, "zones": [], "error": "Database not found"}
+
+    try:
+        start_ts, end_ts = resolve_range(start, end)
+    except ValueError:
+        return {"panels": {}, "zones": [], "error": "Invalid time range"}
+
+    specs = _batch_specs(panels or [])
+    if not specs:
+        return {"panels": {}, "zones": [], "error": "No valid metrics specified"}
+
+    start_ts, end_ts = normalize_range(start_ts, end_ts)
+
+    conn = get_db_connection()
+    data_version = chart_cache.get_data_version(conn, DATABASE_PATH)
+    version = chart_cache.version_for_range(data_version, end_ts)
+    key = (
+        "batch",
+        start_ts,
+        end_ts,
+        tuple((panel_id, tuple(metrics), ds) for panel_id, metrics, ds in specs),
+        include_modes,
+        resolution,
+    )
+
+    result = _cache.get(key, version)
+    if result is None:
+        try:
+            with query_budget.limit(conn, token=token):
+                result = _query_batch(
+                    conn, start_ts, end_ts, specs, include_modes, resolution
+                )
+        except query_budget.QueryInterrupted as interrupted:
+            if interrupted.reason == "superseded":
+                return {"panels": {}, "zones": [], "error": SUPERSEDED_ERROR}
+            panels_partial = {
+                panel_id: _partial_series(start_ts, end_ts, metrics, downsample)
+                for panel_id, metrics, downsample in specs
+            }
+            result = {"panels": panels_partial, "zones": [], "partial": True}
+        else:
+            if not _rollups_lag_range(conn, result, end_ts):
+                _cache.set(key, version, result)
+
+    return _format_batch(result, data_version.max_rowid, ts_format)
+
+
+def _batch_specs(panels: List[Dict[str, Any]]) -> List[Tuple[str, List[str], int]]:
+    """Turn panel specs into (id, valid metrics, downsample), skipping empty ones."""
+    specs = []
+    for panel in panels:
+        metrics = [m for m in panel.get("metrics", []) if m in AVAILABLE_METRICS]
+        if metrics:
+            specs.append((str(panel["id"]), metrics, panel.get("downsample", 500)))
+    return specs
+
+
+def _format_batch(
+    result: Dict[str, Any], max_rowid: int, ts_format: str
+) -> Dict[str, Any]:
+    """Set a batch result's delta cursor and format its panels' timestamps."""
+    # Partial panels may each come from rollups: resume from the oldest
+    cursor = min(
+        _result_cursor(series, max_rowid)
+        for series in [result, *result["panels"].values()]
+    )
+    panels_out = {
+        panel_id: _format_timestamps(
+            {k: v for k, v in series.items() if k != "cursor"}, ts_format
+        )
+        for panel_id, series in result["panels"].items()
+    }
+    return dict(result, panels=panels_out, cursor=cursor)
+
+
+def _query_batch(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    specs: List[Tuple[str, List[str], int]],
+    include_modes: bool,
+    resolution: str,
+) -> Dict[str, Any]:
+    """Read the union of the panel metrics once and build every panel."""
+    all_metrics = list(dict.fromkeys(m for _, metrics, _ in specs for m in metrics))
+    max_downsample = max(downsample for _, _, downsample in specs)
+
+    rollup = None
+    if resolution == "auto":
+        rollup = _read_rollups(start_ts, end_ts, all_metrics, max_downsample)
+
+    cursor = None
+    if rollup is not None:
+        level, rows, cursor = rollup
+        timestamps = [row["t"] for row in rows]
+        original_count = sum(row["count"] for row in rows)
+        values = {m: [row[AVAILABLE_METRICS[m]] for row in rows] for m in all_metrics}
+        zones = _query_mode_zones(conn, start_ts, end_ts) if include_modes else []
+    else:
+        # Zones come from the same captures scan as the panel metrics
+        level = None
+        zones = []
+        timestamps, values = _read_columns(
+            conn, start_ts, end_ts, all_metrics, zones if include_modes else None
+        )
+        original_count = len(timestamps)
+
+    results = {}
+    for panel_id, metrics, downsample in specs:
+        series = _build_series(
+            timestamps, {m: values[m] for m in metrics}, downsample, original_count
+        )
+        if level is not None:
+            series["resolution"] = level
+        results[panel_id] = series
+
+    result: Dict[str, Any] = {"panels": results, "zones": zones}
+    if cursor is not None:
+        result["cursor"] = cursor
+    return result
+
+
+def query_chart_delta(
+    cursor: Optional[int] = None,
+    since: Optional[float] = None,
+    metrics: Optional[List[str]] = None,
+    ts_format: str = "iso",
+) -> Dict[str, Any]:
+    """
+    Query only the captures appended after a cursor.
+
+    Used by the charts auto-refresh so a refresh costs the handful of new
+    rows instead of a full-range query. Rows are returned without
+    downsampling.
+
+    Args:
+        cursor: Return rows with a rowid greater than this value
+        since: Return rows with a unix_timestamp greater than this value
+        metrics: List of metric names to include
+        ts_format: One of TS_FORMATS
+
+    Returns:
+        Dict with timestamps, metric data arrays and the new cursor. When
+        more than DELTA_LIMIT rows are pending, "truncated" is set and the
+        client should reload the full range instead.
+    """
+    if not DATABASE_PATH.exists():
+        return {"timestamps": [], "data": {}, "error": "Database not found"}
+
+    if cursor is None and since is None:
+        return {"timestamps": [], "data": {}, "error": "No cursor specified"}
+
+    if not metrics:
+        metrics = ["lux", "brightness_mean", "exposure_time_us", "weather_temperature"]
+    valid_metrics = [m for m in metrics if m in AVAILABLE_METRICS]
+
+    if not valid_metrics:
+        return {"timestamps": [], "data": {}, "error": "No valid metrics specified"}
+
+    conditions = []
+    params: List[Any] = []
+    if cursor is not None:
+        conditions.append("rowid > ?")
+        params.append(cursor)
+    if since is not None:
+        conditions.append("unix_timestamp > ?")
+        params.append(since)
+
+    columns_str = ", ".join(
+        ["rowid AS rid", "unix_timestamp"]
+        + [AVAILABLE_METRICS[m] for m in valid_metrics]
+    )
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        f"""
+        SELECT {columns_str}
+        FROM captures
+        WHERE {" AND ".join(conditions)}
+        ORDER BY rowid ASC
+        LIMIT ?
+    """,
+        params + [DELTA_LIMIT + 1],
+    ).fetchall()
+
+    if len(rows) > DELTA_LIMIT:
+        return {
+            "timestamps": [],
+            "data": {m: [] for m in valid_metrics},
+            "cursor": cursor,
+            "truncated": True,
+        }
+
+    new_cursor = rows[-1]["rid"] if rows else cursor
+    if new_cursor is None:
+        new_cursor = _get_cursor(conn)
+
+    rows = sorted(rows, key=lambda row: row["unix_timestamp"])
+    result = {
+        "timestamps": [row["unix_timestamp"] for row in rows],
+        "data": {m: [row[AVAILABLE_METRICS[m]] for row in rows] for m in valid_metrics},
+        "point_count": len(rows),
+        "cursor": new_cursor,
+        "delta": True,
+    }
+    return _format_timestamps(result, ts_format)
+
+
+def _get_cursor(conn: sqlite3.Connection) -> int:
+    """Get the current delta cursor (the highest rowid in captures)."""
+    row = conn.execute("SELECT MAX(rowid) AS cursor FROM captures").fetchone()
+    return row["cursor"] or 0
+
+
+def _query_raw(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    valid_metrics: List[str],
+    downsample: int,
+) -> Dict[str, Any]:
+    """Read every capture in the range and LTTB-downsample it in Python."""
+    timestamps, data = _read_columns(conn, start_ts, end_ts, valid_metrics)
+
+    if not len(timestamps):
+        return {"timestamps": [], "data": {m: [] for m in valid_metrics}}
+
+    return _build_series(timestamps, data, downsample, len(timestamps))
+
+
+def _alloc_column(size: int):
+    """Allocate a float64 column (NumPy array, or array('d') without NumPy)."""
+    if np is not None:
+        return np.empty(size, dtype=np.float64)
+    return array("d", bytes(8 * size))
+
+
+def _fill_column(column, offset: int, values: tuple) -> None:
+    """Write a chunk of values into a column, with NaN for NULL."""
+    if np is not None:
+        # NumPy converts None to NaN for float64
+        column[offset : offset + len(values)] = values
+    else:
+        column[offset : offset + len(values)] = array(
+            "d", [math.nan if v is None else v for v in values]
         )
 
-        rows = cursor.fetchall()
 
+def _resize_column(column, size: int):
+    """Grow or shrink a column allocated by _alloc_column."""
+    if len(column) >= size:
+        return column[:size]
+    if np is not None:
+        return np.concatenate((column, np.empty(size - len(column))))
+    column.extend(array("d", bytes(8 * (size - len(column)))))
+    return column
+
+
+def _read_columns(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    valid_metrics: List[str],
+    zones: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Read a range of captures straight into columns in a single scan.
+
+    Plain cursor tuples are decoded chunk by chunk into float64 columns,
+    grown geometrically and trimmed at the end, with NaN for NULL, so no
+    sqlite3.Row objects or per-value list slots are kept. Text metrics
+    stay lists.
+
+    Args:
+        zones: When given, the range's mode zones (as _query_mode_zones
+            returns them) are collected into this list from the same scan
+
+    Returns:
+        Timestamps column and a dict of metric name -> column
+    """
+    names = ["unix_timestamp"] + valid_metrics
+    selected = ["unix_timestamp"] + [AVAILABLE_METRICS[m] for m in valid_metrics]
+    if zones is not None:
+        selected += ["timestamp", "mode"]
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"""
+        SELECT {", ".join(selected)}
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        ORDER BY unix_timestamp ASC
+    """,
+        (start_ts, end_ts),
+    )
+
+    columns = {
+        name: [] if name in NON_NUMERIC_METRICS else _alloc_column(DECODE_CHUNK_ROWS)
+        for name in names
+    }
+    filled = 0
+    last_stamp = None
+    while True:
+        rows = cursor.fetchmany(DECODE_CHUNK_ROWS)
         if not rows:
-            return {"timestamps": [], "data": {m: [] for m in valid_metrics}}
+            break
+        decoded = list(zip(*rows))
+        _fill_columns(columns, dict(zip(names, decoded)), filled)
+        if zones is not None:
+            _collect_zones(zones, decoded[-2], decoded[-1])
+            last_stamp = decoded[-2][-1]
+        filled += len(rows)
+    cursor.close()
+
+    if zones:
+        zones[-1]["end"] = last_stamp
+    for name, column in columns.items():
+        if not isinstance(column, list):
+            columns[name] = _resize_column(column, filled)
+
+    timestamps = columns.pop("unix_timestamp")
+    return timestamps, columns
+
+
+def _fill_columns(
+    columns: Dict[str, Any], chunk: Dict[str, tuple], offset: int
+) -> None:
+    """Append a decoded chunk to the columns, growing them as needed."""
+    for name, values in chunk.items():
+        column = columns[name]
+        if isinstance(column, list):
+            column.extend(values)
+            continue
+        size = offset + len(values)
+        if size > len(column):
+            column = columns[name] = _resize_column(column, max(size, 2 * len(column)))
+        _fill_column(column, offset, values)
+
+
+def _collect_zones(zones: List[Dict[str, Any]], stamps: tuple, modes: tuple) -> None:
+    """Extend zones with a chunk of time-ordered (timestamp, mode) values."""
+    for stamp, mode in zip(stamps, modes):
+        if not zones or mode != zones[-1]["mode"]:
+            if zones:
+                zones[-1]["end"] = stamp
+            zones.append({"start": stamp, "end": None, "mode": mode})
+
+
+def _to_json_list(values) -> List:
+    """Turn a decoded column back into a list with None for NULL."""
+    if isinstance(values, list):
+        return values
+    if np is not None and isinstance(values, np.ndarray):
+        out = values.astype(object)
+        out[np.isnan(values)] = None
+        return out.tolist()
+    return [None if v != v else v for v in values]
+
 
-        # Convert to lists for downsampling
-        timestamps = [row["unix_timestamp"] for row in rows]
-        data = {m: [row[AVAILABLE_METRICS[m]] for row in rows] for m in valid_metrics}
+def _format_timestamps(series: Dict[str, Any], ts_format: str) -> Dict[str, Any]:
+    """Convert a series' unix timestamps to the requested format."""
+    if ts_format == "unix":
+        return series
+    if ts_format == "epoch_ms":
+        return dict(series, timestamps=_to_epoch_ms(series["timestamps"]))
+    return dict(
+        series,
+        timestamps=[
+            datetime.fromtimestamp(ts).isoformat() for ts in series["timestamps"]
+        ],
+    )
 
-        # Apply LTTB downsampling if needed
-        if len(timestamps) > downsample:
-            timestamps, data = downsample_data(timestamps, data, downsample)
 
-        # Convert unix timestamps to ISO strings for JSON
-        iso_timestamps = [datetime.fromtimestamp(ts).isoformat() for ts in timestamps]
+def _to_epoch_ms(timestamps: List[float]) -> List[int]:
+    """Convert unix seconds to integer epoch milliseconds in one pass."""
+    if np is not None and timestamps:
+        millis = np.rint(np.asarray(timestamps, dtype=np.float64) * 1000.0)
+        return millis.astype(np.int64).tolist()
+    return [round(ts * 1000.0) for ts in timestamps]
+
+
+def _build_series(
+    timestamps: List[float],
+    data: Dict[str, List],
+    downsample: int,
+    original_count: int,
+) -> Dict[str, Any]:
+    """
+    LTTB-downsample a series if needed.
+
+    Timestamps stay unix seconds; _format_timestamps converts them for the
+    response.
+    """
+    # Apply LTTB downsampling if needed
+    if len(timestamps) > downsample:
+        timestamps, data = downsample_data(timestamps, data, downsample)
+
+    return {
+        "timestamps": _to_json_list(timestamps),
+        "data": {m: _to_json_list(values) for m, values in data.items()},
+        "point_count": len(timestamps),
+        "original_count": original_count,
+    }
+
+
+def _query_rollups(
+    start_ts: float,
+    end_ts: float,
+    valid_metrics: List[str],
+    downsample: int,
+    level: Optional[str] = None,
+    refresh: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer a chart query from the rollup tables.
 
+    Returns None when no rollup level fits the range or the rollups are
+    unavailable, in which case the caller falls back to raw captures.
+    """
+    rollup = _read_rollups(
+        start_ts, end_ts, valid_metrics, downsample, level, refresh=refresh
+    )
+    if rollup is None:
+        return None
+
+    level, rows, cursor = rollup
+    if not rows:
         return {
-            "timestamps": iso_timestamps,
-            "data": data,
-            "point_count": len(timestamps),
-            "original_count": len(rows),
+            "timestamps": [],
+            "data": {m: [] for m in valid_metrics},
+            "cursor": cursor,
         }
 
-    finally:
-        conn.close()
+    timestamps = [row["t"] for row in rows]
+    data = {m: [row[AVAILABLE_METRICS[m]] for row in rows] for m in valid_metrics}
+
+    result = _build_series(
+        timestamps, data, downsample, sum(row["count"] for row in rows)
+    )
+    result["resolution"] = level
+    result["cursor"] = cursor
+    return result
+
+
+def _partial_series(
+    start_ts: float, end_ts: float, valid_metrics: List[str], downsample: int
+) -> Dict[str, Any]:
+    """
+    Stand in for a series whose query ran out of time budget.
+
+    Served from the rollup level that fits the range, or the finest one
+    when the range is too short for any, and flagged "partial". Only
+    rollups that already exist are read, with no refresh and no budget
+    (the budget is spent). Empty when the rollups can't serve the metrics.
+    """
+    level = rollup_service.choose_level(end_ts - start_ts, downsample)
+    if level is None:
+        level = rollup_service.ROLLUP_LEVELS[-1][0]
+
+    result = _query_rollups(
+        start_ts, end_ts, valid_metrics, downsample, level, refresh=False
+    )
+    if result is None:
+        result = _build_series([], {m: [] for m in valid_metrics}, downsample, 0)
+    result["partial"] = True
+    return result
+
+
+def _read_rollups(
+    start_ts: float,
+    end_ts: float,
+    valid_metrics: List[str],
+    downsample: int,
+    level: Optional[str] = None,
+    refresh: bool = True,
+) -> Optional[Tuple[str, List[sqlite3.Row], int]]:
+    """
+    Read bucket averages for a range from the best-fitting rollup level.
+
+    Returns (level, rows, cursor), cursor being the newest rowid the rows
+    include, or None when the metrics can't be served from
+    rollups, no level fits the range, or the rollups are unavailable. A
+    background refresh is requested first unless refresh is False; until
+    the rollups have been built, chart queries read raw captures.
+
+    Raises:
+        query_budget.QueryInterrupted: when run inside query_budget.limit()
+            and the budget ran out
+    """
+    if any(m in NON_NUMERIC_METRICS for m in valid_metrics):
+        return None
+
+    if level is None:
+        level = rollup_service.choose_level(end_ts - start_ts, downsample)
+    if level is None:
+        return None
+
+    if refresh:
+        rollup_service.request_refresh(DATABASE_PATH, ROLLUP_COLUMNS)
+    try:
+        rollup = rollup_service.query_rollup(
+            DATABASE_PATH,
+            level,
+            start_ts,
+            end_ts,
+            [AVAILABLE_METRICS[m] for m in valid_metrics],
+        )
+    except (sqlite3.Error, OSError):
+        return None
+
+    if rollup is None:
+        return None
+    rows, cursor = rollup
+    return level, rows, cursor
+
+
+def _query_m4(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    valid_metrics: List[str],
+    downsample: int,
+) -> Dict[str, Any]:
+    """
+    M4 downsampling pushed into SQLite.
+
+    The range is split into equal-width unix_timestamp buckets. For each
+    bucket only the first and last rows, plus the rows holding the min and
+    max of every numeric metric, leave SQLite; there are as many buckets as
+    fit downsample such rows, so at most downsample points are returned.
+    """
+    bounds = conn.execute(
+        """
+        SELECT MIN(unix_timestamp) AS t0, MAX(unix_timestamp) AS t1, COUNT(*) AS n
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+    """,
+        (start_ts, end_ts),
+    ).fetchone()
+
+    if not bounds["n"]:
+        return {
+            "timestamps": [],
+            "data": {m: [] for m in valid_metrics},
+            "mode": "m4",
+        }
+
+    # One "SELECT rid, MIN(x) ... GROUP BY bucket" per extreme: SQLite fills
+    # the bare rid column from the row that holds the min/max value.
+    extremes = [("MIN", "t"), ("MAX", "t")]
+    for m in valid_metrics:
+        if m not in NON_NUMERIC_METRICS:
+            extremes.append(("MIN", AVAILABLE_METRICS[m]))
+            extremes.append(("MAX", AVAILABLE_METRICS[m]))
+    buckets = max(1, downsample // len(extremes))
+    width = (bounds["t1"] - bounds["t0"]) / buckets or 1.0
+
+    picks = "\n            UNION\n            ".join(
+        f"SELECT rid FROM (SELECT rid, {fn}({col}) FROM bucketed GROUP BY bucket)"
+        for fn, col in extremes
+    )
+
+    metric_columns = [AVAILABLE_METRICS[m] for m in valid_metrics]
+    columns_str = ", ".join(["unix_timestamp"] + metric_columns)
+    cursor = conn.execute(
+        f"""
+        WITH bucketed AS (
+            SELECT
+                rowid AS rid,
+                unix_timestamp AS t,
+                MIN(CAST((unix_timestamp - ?) / ? AS INTEGER), ?) AS bucket,
+                {", ".join(metric_columns)}
+            FROM captures
+            WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        )
+        SELECT {columns_str}
+        FROM captures
+        WHERE rowid IN (
+            {picks}
+        )
+        ORDER BY unix_timestamp ASC
+    """,
+        (bounds["t0"], width, buckets - 1, start_ts, end_ts),
+    )
+    rows = cursor.fetchall()
+
+    timestamps = [row["unix_timestamp"] for row in rows]
+    data = {m: [row[AVAILABLE_METRICS[m]] for row in rows] for m in valid_metrics}
+
+    return {
+        "timestamps": timestamps,
+        "data": data,
+        "point_count": len(timestamps),
+        "original_count": bounds["n"],
+        "mode": "m4",
+    }
 
 
 def downsample_data(
-    timestamps: List[float], data: Dict[str, List], target: int
+    timestamps: List[float],
+    data: Dict[str, List],
+    target: int,
+    engine: Optional[str] = None,
 ) -> Tuple[List[float], Dict[str, List]]:
     """
     Apply Largest-Triangle-Three-Buckets (LTTB) downsampling.
@@ -166,9 +1069,11 @@ def downsample_data(
     have the largest triangular area with their neighbors.
 
     Args:
-        timestamps: List of unix timestamps
-        data: Dict of metric name -> values
+        timestamps: Unix timestamps (list, array('d') or NumPy array)
+        data: Dict of metric name -> values, as lists or float64 columns
+            with NaN for NULL
         target: Target number of points
+        engine: "numpy" or "python" (default: numpy when installed)
 
     Returns:
         Downsampled timestamps and data
@@ -181,23 +1086,55 @@ def downsample_data(
     # We'll pick the first numeric metric
     reference_metric = None
     for metric, values in data.items():
-        if any(v is not None for v in values):
+        if _has_numbers(values):
             reference_metric = metric
             break
 
     if reference_metric is None:
         # No valid data, just do uniform sampling
         indices = [int(i * (n - 1) / (target - 1)) for i in range(target)]
-        return (
-            [timestamps[i] for i in indices],
-            {m: [vals[i] for i in indices] for m, vals in data.items()},
-        )
+    else:
+        if engine is None:
+            engine = "numpy" if np is not None else "python"
+        if engine == "numpy":
+            indices = _lttb_indices_numpy(timestamps, data[reference_metric], target)
+        else:
+            indices = _lttb_indices_python(timestamps, data[reference_metric], target)
+
+    # Extract selected points
+    new_timestamps = _take(timestamps, indices)
+    new_data = {m: _take(vals, indices) for m, vals in data.items()}
+
+    return new_timestamps, new_data
+
 
-    # LTTB algorithm
-    reference_values = data[reference_metric]
+def _has_numbers(values) -> bool:
+    """Check a column holds at least one number (NaN and None don't count)."""
+    if np is not None and isinstance(values, np.ndarray):
+        return values.dtype.kind == "f" and not np.isnan(values).all()
+    return any(
+        isinstance(v, (int, float)) and not isinstance(v, bool) and v == v
+        for v in values
+    )
+
+
+def _take(values, indices: List[int]):
+    """Select positions from a list, array('d') or NumPy column."""
+    if np is not None and isinstance(values, np.ndarray):
+        return values[indices]
+    if isinstance(values, array):
+        return array(values.typecode, [values[i] for i in indices])
+    return [values[i] for i in indices]
+
+
+def _lttb_indices_python(
+    timestamps: List[float], reference_values: List, target: int
+) -> List[int]:
+    """Select LTTB indices with plain Python loops (fallback engine)."""
+    n = len(timestamps)
 
-    # Replace None with 0 for calculation purposes
-    ref_clean = [v if v is not None else 0 for v in reference_values]
+    # Replace None (and NaN from decoded columns) with 0 for calculation purposes
+    ref_clean = [v if v is not None and v == v else 0 for v in reference_values]
 
     # Always keep first and last points
     selected_indices = [0]
@@ -257,11 +1194,60 @@ def downsample_data(
     # Add last point
     selected_indices.append(n - 1)
 
-    # Extract selected points
-    new_timestamps = [timestamps[i] for i in selected_indices]
-    new_data = {m: [vals[i] for i in selected_indices] for m, vals in data.items()}
+    return selected_indices
 
-    return new_timestamps, new_data
+
+def _lttb_indices_numpy(timestamps, reference_values, target: int) -> List[int]:
+    """
+    Select LTTB indices using NumPy arrays.
+
+    Bucket bounds and next-bucket averages are computed for all buckets at
+    once; the triangle areas of each bucket are then evaluated as one array
+    operation. Picks the same indices as _lttb_indices_python.
+    """
+    x = np.ascontiguousarray(timestamps, dtype=np.float64)
+    # None becomes NaN on conversion; treat it as 0 like the Python engine
+    y = np.nan_to_num(np.asarray(reference_values, dtype=np.float64), nan=0.0)
+    n = len(x)
+
+    bucket_size = (n - 2) / (target - 2)
+    steps = np.arange(target - 2, dtype=np.float64)
+    bucket_starts = ((steps + 1) * bucket_size).astype(np.int64) + 1
+    bucket_ends = np.minimum(((steps + 2) * bucket_size).astype(np.int64) + 1, n - 1)
+    next_ends = np.minimum(((steps + 3) * bucket_size).astype(np.int64) + 1, n)
+
+    # Next-bucket averages for every bucket in one pass
+    counts = next_ends - bucket_ends
+    bounds = np.column_stack((bucket_ends, next_ends)).ravel()
+    x_pad = np.append(x, 0.0)
+    y_pad = np.append(y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_x = np.add.reduceat(x_pad, bounds)[::2] / counts
+        avg_y = np.add.reduceat(y_pad, bounds)[::2] / counts
+    empty = counts <= 0
+    avg_x[empty] = x[-1]
+    avg_y[empty] = y[-1]
+
+    selected_indices = [0]
+    a = 0
+    for i in range(target - 2):
+        start = int(bucket_starts[i])
+        end = int(bucket_ends[i])
+        if end > start:
+            point_a_x = x[a]
+            point_a_y = y[a]
+            areas = np.abs(
+                (point_a_x - avg_x[i]) * (y[start:end] - point_a_y)
+                - (point_a_x - x[start:end]) * (avg_y[i] - point_a_y)
+            )
+            a = start + int(np.argmax(areas))
+        else:
+            a = start
+        selected_indices.append(a)
+
+    selected_indices.append(n - 1)
+
+    return selected_indices
 
 
 def get_mode_zones(
@@ -276,48 +1262,203 @@ def get_mode_zones(
         return []
 
     # Default time range: last 24 hours
-    if not end:
-        end = datetime.now().isoformat()
-    if not start:
-        start = (datetime.now() - timedelta(hours=24)).isoformat()
+    try:
+        start_ts, end_ts = resolve_range(start, end)
+    except ValueError:
+        return []
+
+    start_ts, end_ts = normalize_range(start_ts, end_ts)
 
     conn = get_db_connection()
-    try:
-        cursor = conn.execute(
-            """
-            SELECT timestamp, mode
-            FROM captures
-            WHERE timestamp >= ? AND timestamp <= ?
-            ORDER BY unix_timestamp ASC
-        """,
-            (start, end),
-        )
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, DATABASE_PATH), end_ts
+    )
+    key = ("modes", start_ts, end_ts)
 
-        rows = cursor.fetchall()
-        if not rows:
-            return []
+    zones = _cache.get(key, version)
+    if zones is None:
+        zones = _query_mode_zones(conn, start_ts, end_ts)
+        _cache.set(key, version, zones)
+    return zones
 
-        zones = []
-        current_mode = rows[0]["mode"]
-        zone_start = rows[0]["timestamp"]
 
-        for row in rows[1:]:
-            if row["mode"] != current_mode:
-                zones.append(
-                    {"start": zone_start, "end": row["timestamp"], "mode": current_mode}
-                )
-                current_mode = row["mode"]
-                zone_start = row["timestamp"]
+def _query_mode_zones(
+    conn: sqlite3.Connection, start_ts: float, end_ts: float
+) -> List[Dict[str, Any]]:
+    """
+    Find mode zones for a range with a LAG() window query.
 
-        # Add final zone
+    Only the first row and the rows where the mode changes leave SQLite,
+    plus the last row to close the final zone, so the Python side costs
+    the number of transitions rather than the number of captures.
+    """
+    boundaries = conn.execute(
+        """
+        SELECT timestamp, mode
+        FROM (
+            SELECT
+                timestamp,
+                mode,
+                unix_timestamp,
+                LAG(mode) OVER (ORDER BY unix_timestamp) AS prev_mode,
+                ROW_NUMBER() OVER (ORDER BY unix_timestamp) AS row_num
+            FROM captures
+            WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        )
+        WHERE row_num = 1 OR mode IS NOT prev_mode
+        ORDER BY unix_timestamp ASC
+    """,
+        (start_ts, end_ts),
+    ).fetchall()
+    if not boundaries:
+        return []
+
+    last = conn.execute(
+        """
+        SELECT timestamp
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        ORDER BY unix_timestamp DESC
+        LIMIT 1
+    """,
+        (start_ts, end_ts),
+    ).fetchone()
+
+    zones = []
+    for row, following in zip(boundaries, boundaries[1:]):
         zones.append(
-            {"start": zone_start, "end": rows[-1]["timestamp"], "mode": current_mode}
+            {
+                "start": row["timestamp"],
+                "end": following["timestamp"],
+                "mode": row["mode"],
+            }
         )
+    zones.append(
+        {
+            "start": boundaries[-1]["timestamp"],
+            "end": last["timestamp"],
+            "mode": boundaries[-1]["mode"],
+        }
+    )
+    return zones
+
 
-        return zones
+def get_capture_gaps(
+    interval: float,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    factor: float = GAP_FACTOR,
+) -> Dict[str, Any]:
+    """
+    Find stretches where capturing stalled.
+
+    A gap is a pair of consecutive captures further apart than
+    factor * interval. Deltas come from one LAG() pass over the
+    unix_timestamp index; the range is widened to the neighbouring
+    captures so gaps crossing its edges are reported in full. If the
+    newest capture is followed by nothing, the time since it (up to the
+    end of the range, or now) is reported as an ongoing gap.
+
+    Args:
+        interval: Configured seconds between captures
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        factor: Multiple of interval a delta must exceed
+
+    Returns:
+        Dict with "gaps" as {start, end, duration, ongoing} and the
+        "threshold" used, in seconds
+    """
+    if not DATABASE_PATH.exists():
+        return {"gaps": [], "error": "Database not found"}
+
+    try:
+        start_ts, end_ts = resolve_range(start, end)
+    except ValueError:
+        return {"gaps": [], "error": "Invalid time range"}
+
+    start_ts, end_ts = normalize_range(start_ts, end_ts)
+    threshold = interval * factor
+
+    conn = get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, DATABASE_PATH), end_ts
+    )
+    key = ("gaps", start_ts, end_ts, threshold)
+
+    cached = _cache.get(key, version)
+    if cached is None:
+        cached = _query_gaps(conn, start_ts, end_ts, threshold)
+        _cache.set(key, version, cached)
+    gaps, newest = cached
+
+    gaps = [(gap_start, gap_end, False) for gap_start, gap_end in gaps]
+    # Nothing captured since the newest row: the camera may be stalled now.
+    # Worked out per call since it grows while no new captures arrive.
+    if newest is not None:
+        until = min(end_ts, datetime.now().timestamp())
+        if until - newest > threshold:
+            gaps.append((newest, until, True))
+
+    return {
+        "gaps": [
+            {
+                "start": datetime.fromtimestamp(gap_start).isoformat(),
+                "end": datetime.fromtimestamp(gap_end).isoformat(),
+                "duration": gap_end - gap_start,
+                "ongoing": ongoing,
+            }
+            for gap_start, gap_end, ongoing in gaps
+        ],
+        "threshold": threshold,
+    }
+
+
+def _query_gaps(
+    conn: sqlite3.Connection, start_ts: float, end_ts: float, threshold: float
+) -> Tuple[List[Tuple[float, float]], Optional[float]]:
+    """
+    Run the LAG() gap query.
+
+    Returns:
+        (start, end) unix times of each gap, and the newest capture when
+        no capture follows the range (else None)
+    """
+    edges = conn.execute(
+        """
+        SELECT
+            (SELECT MAX(unix_timestamp) FROM captures WHERE unix_timestamp < ?),
+            (SELECT MIN(unix_timestamp) FROM captures WHERE unix_timestamp > ?),
+            (SELECT MAX(unix_timestamp) FROM captures
+             WHERE unix_timestamp >= ? AND unix_timestamp <= ?)
+    """,
+        (start_ts, end_ts, start_ts, end_ts),
+    ).fetchone()
+    before, after, last = edges[0], edges[1], edges[2]
+    low = before if before is not None else start_ts
+    high = after if after is not None else end_ts
+
+    rows = conn.execute(
+        """
+        SELECT prev_ts, unix_timestamp
+        FROM (
+            SELECT
+                unix_timestamp,
+                LAG(unix_timestamp) OVER (ORDER BY unix_timestamp) AS prev_ts
+            FROM captures
+            WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        )
+        WHERE unix_timestamp - prev_ts > ?
+        ORDER BY unix_timestamp ASC
+    """,
+        (low, high, threshold),
+    ).fetchall()
 
-    finally:
-        conn.close()
+    gaps = [(row["prev_ts"], row["unix_timestamp"]) for row in rows]
+    newest = None
+    if after is None:
+        newest = last if last is not None else before
+    return gaps, newest
 
 
 def get_available_metrics() -> List[Dict[str, str]]:
@@ -0,0 +1,80 @@
+"""Per-thread pool of read-only, tuned SQLite connections.
+
+Gunicorn gthread workers serve requests from a small fixed set of threads,
+so keeping one connection per thread and database file lets requests reuse
+an open connection and its warm page cache instead of reconnecting.
+
+Under the gevent worker that serves live streams, threading.local is per
+greenlet, so every stream has its own connections; live_service closes
+them when the stream ends.
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import quote
+
+# Pragmas applied to every pooled connection
+READ_PRAGMAS = (
+    ("query_only", "ON"),
+    ("mmap_size", 64 * 1024 * 1024),
+    ("cache_size", -8192),  # Negative means KiB, so 8 MiB per connection
+    ("temp_store", "MEMORY"),
+)
+
+_local = threading.local()
+
+
+def _pool() -> Dict[str, Tuple[sqlite3.Connection, Tuple[int, int]]]:
+    """Get this thread's connection map."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    return connections
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
+    """Open a read-only connection with the tuned pragmas applied."""
+    conn = sqlite3.connect(f"file:{quote(str(db_path))}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    for name, value in READ_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection(db_path: Path) -> sqlite3.Connection:
+    """
+    Get this thread's read-only connection to a database file.
+
+    The connection is reused across calls and requests. It is reopened
+    when the file at db_path has been replaced (new inode), e.g. after a
+    restore from backup.
+
+    Raises:
+        FileNotFoundError: if db_path does not exist
+    """
+    stat = os.stat(db_path)
+    identity = (stat.st_dev, stat.st_ino)
+    key = str(db_path)
+    connections = _pool()
+
+    entry = connections.get(key)
+    if entry is not None:
+        conn, conn_identity = entry
+        if conn_identity == identity:
+            return conn
+        conn.close()
+
+    conn = _open(db_path)
+    connections[key] = (conn, identity)
+    return conn
+
+
+def close_connections() -> None:
+    """Close all pooled connections owned by the calling thread."""
+    connections = _pool()
+    for conn, _ in connections.values():
+        conn.close()
+    connections.clear()
@@ -0,0 +1,172 @@
+"""Streaming export of captures ranges for offline analysis.
+
+Rows are read with fetchmany and encoded chunk by chunk, so an export of
+any length needs neither a temp file nor the whole range in memory, and
+never touches timelapse.db except through a read-only connection.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app.services import charts_service
+from app.services.charts_service import AVAILABLE_METRICS, NON_NUMERIC_METRICS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+# Rows read and encoded per chunk
+EXPORT_CHUNK_ROWS = 5000
+
+# Export formats and their MIME types
+EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def get_export_formats() -> List[str]:
+    """List the export formats usable in this installation."""
+    return [fmt for fmt in EXPORT_MIME_TYPES if fmt != "parquet" or pq is not None]
+
+
+def export_captures(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    metrics: Optional[List[str]] = None,
+    fmt: str = "csv",
+) -> Union[Dict[str, Any], Iterator[bytes]]:
+    """
+    Stream captures in a range as CSV or Parquet.
+
+    Args:
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        metrics: Metric names to include (default: every known metric
+            present in the database)
+        fmt: One of get_export_formats()
+
+    Returns:
+        An iterator of encoded byte chunks, or an error dict when the
+        export can't be served
+    """
+    if fmt not in get_export_formats():
+        return {"error": f"Unsupported export format: {fmt}"}
+
+    if not charts_service.DATABASE_PATH.exists():
+        return {"error": "Database not found"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"error": "Invalid time range"}
+
+    conn = charts_service.get_db_connection()
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(captures)")}
+    if not metrics:
+        metrics = list(AVAILABLE_METRICS)
+    valid_metrics = [
+        m
+        for m in metrics
+        if m in AVAILABLE_METRICS and AVAILABLE_METRICS[m] in existing
+    ]
+
+    if not valid_metrics:
+        return {"error": "No valid metrics specified"}
+
+    columns = ["timestamp", "unix_timestamp"] + valid_metrics
+    columns_str = ", ".join(
+        ["timestamp", "unix_timestamp"] + [AVAILABLE_METRICS[m] for m in valid_metrics]
+    )
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"""
+        SELECT {columns_str}
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        ORDER BY unix_timestamp ASC
+    """,
+        (start_ts, end_ts),
+    )
+
+    if fmt == "parquet":
+        return _parquet_chunks(cursor, columns)
+    return _csv_chunks(cursor, columns)
+
+
+def _fetch_chunks(cursor) -> Iterator[List[tuple]]:
+    """Yield lists of rows until the cursor is exhausted, then close it."""
+    try:
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _csv_chunks(cursor, columns: List[str]) -> Iterator[bytes]:
+    """Encode rows as CSV, one chunk per fetchmany batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+
+    for rows in _fetch_chunks(cursor):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the caller."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_chunks(cursor, columns: List[str]) -> Iterator[bytes]:
+    """Encode rows as Parquet, one row group per fetchmany batch."""
+    text_columns = {"timestamp"} | NON_NUMERIC_METRICS
+    schema = pa.schema(
+        [(c, pa.string() if c in text_columns else pa.float64()) for c in columns]
+    )
+
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in _fetch_chunks(cursor):
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    # Footer; an empty range still yields a valid file holding the schema
+    yield sink.drain()
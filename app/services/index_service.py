@@ -0,0 +1,153 @@
+"""Index verification and provisioning for the charts queries on captures."""
+
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import quote
+
+# Indexes the charts queries rely on: (name, indexed columns)
+RECOMMENDED_INDEXES = [
+    ("idx_captures_unix_timestamp_mode", "unix_timestamp, mode"),
+]
+
+# Representative shapes of the charts queries: (name, sql, params)
+QUERY_SHAPES: List[Tuple[str, str, Tuple[Any, ...]]] = [
+    (
+        "chart_data",
+        """
+        SELECT unix_timestamp, timestamp, lux
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        ORDER BY unix_timestamp ASC
+        """,
+        (0, 1),
+    ),
+    (
+        "m4_bounds",
+        """
+        SELECT MIN(unix_timestamp), MAX(unix_timestamp), COUNT(*)
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        """,
+        (0, 1),
+    ),
+    (
+        "mode_zones",
+        """
+        SELECT timestamp, mode, LAG(mode) OVER (ORDER BY unix_timestamp)
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        """,
+        (0, 1),
+    ),
+    (
+        "capture_gaps",
+        """
+        SELECT unix_timestamp,
+               LAG(unix_timestamp) OVER (ORDER BY unix_timestamp)
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        """,
+        (0, 1),
+    ),
+    (
+        "delta_cursor",
+        """
+        SELECT rowid, unix_timestamp, lux
+        FROM captures
+        WHERE rowid > ?
+        ORDER BY rowid ASC
+        """,
+        (0,),
+    ),
+]
+
+
+def _connect(db_path: Path, readonly: bool = True) -> sqlite3.Connection:
+    """Open a dedicated (non-pooled) connection to the captures database."""
+    mode = "ro" if readonly else "rw"
+    return sqlite3.connect(
+        f"file:{quote(str(db_path))}?mode={mode}", uri=True, timeout=30
+    )
+
+
+def check_query_plans(db_path: Path) -> List[Dict[str, Any]]:
+    """
+    Run EXPLAIN QUERY PLAN on each charts query shape.
+
+    Returns one report per shape with the plan lines and whether it needs
+    a full table scan or a temporary B-tree sort. A shape is "covered" when
+    neither happens.
+    """
+    conn = _connect(db_path)
+    try:
+        reports = []
+        for name, sql, params in QUERY_SHAPES:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            full_scan = any(
+                line.startswith("SCAN captures") and "INDEX" not in line
+                for line in plan
+            )
+            temp_sort = any("USE TEMP B-TREE" in line for line in plan)
+            reports.append(
+                {
+                    "query": name,
+                    "plan": plan,
+                    "full_scan": full_scan,
+                    "temp_sort": temp_sort,
+                    "covered": not (full_scan or temp_sort),
+                }
+            )
+        return reports
+    finally:
+        conn.close()
+
+
+def get_missing_indexes(db_path: Path) -> List[Tuple[str, str]]:
+    """
+    List recommended indexes that captures doesn't have yet.
+
+    An existing index counts when its leading columns match the
+    recommended ones, whatever it is called.
+    """
+    conn = _connect(db_path)
+    try:
+        existing = []
+        for index in conn.execute("PRAGMA index_list(captures)").fetchall():
+            info = conn.execute(f"PRAGMA index_info('{index[1]}')").fetchall()
+            existing.append([row[2] for row in sorted(info)])
+
+        missing = []
+        for name, columns in RECOMMENDED_INDEXES:
+            wanted = [c.strip() for c in columns.split(",")]
+            if not any(cols[: len(wanted)] == wanted for cols in existing):
+                missing.append((name, columns))
+        return missing
+    finally:
+        conn.close()
+
+
+def ensure_indexes(db_path: Path) -> List[str]:
+    """
+    Create any missing recommended indexes.
+
+    This writes to the raspilapse database and holds its write lock while
+    the index is built, so it is meant for maintenance windows rather than
+    request handling.
+
+    Returns:
+        Names of the indexes that were created
+    """
+    missing = get_missing_indexes(db_path)
+    if not missing:
+        return []
+
+    conn = _connect(db_path, readonly=False)
+    try:
+        for name, columns in missing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON captures ({columns})")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return [name for name, _ in missing]
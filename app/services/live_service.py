@@ -0,0 +1,255 @@
+"""Live feed of new captures for the charts page, as Server-Sent Events.
+
+One broadcaster thread per process watches timelapse.db and wakes the
+subscribed streams when captures are appended. While nothing changes the
+only database work is a PRAGMA data_version check every POLL_INTERVAL
+seconds, however many pages are open; each stream then reads just the new
+rows for its own metrics.
+
+In production the streams are served by their own gunicorn service with a
+gevent worker (systemd/raspilapse-dashboard-live.service, proxied by
+Apache), where an open stream is a greenlet parked on the broadcaster
+rather than a thread. The gthread service that serves everything else
+allows no streams (see configure()), so streams never hold its request
+threads. When a process reaches MAX_SUBSCRIBERS the page falls back to
+polling.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app.services import charts_service, db_pool
+
+# Seconds between PRAGMA data_version checks while anyone is subscribed
+POLL_INTERVAL = 2.0
+
+# Seconds of silence after which a stream sends an SSE comment, so proxies
+# keep the connection open and dead clients are noticed
+KEEPALIVE_INTERVAL = 15.0
+
+# Seconds a stream stays open before asking the browser to reconnect
+STREAM_LIFETIME = 600.0
+
+# Milliseconds the browser waits before reconnecting
+RETRY_MS = 3000
+
+# Open streams allowed per process (threaded servers like the dev server
+# spend a thread per stream; see configure())
+MAX_SUBSCRIBERS = 2
+
+
+def configure(max_subscribers: Optional[int]) -> None:
+    """Set the open streams allowed per process (None keeps the default)."""
+    global MAX_SUBSCRIBERS
+    if max_subscribers is not None:
+        MAX_SUBSCRIBERS = max(0, max_subscribers)
+
+
+class CaptureBroadcaster:
+    """Polls the captures database for appends on behalf of all streams."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._subscribers = 0
+        self._cursor: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def subscribers(self) -> int:
+        """Number of open streams."""
+        return self._subscribers
+
+    def subscribe(self, limit: Optional[int] = None) -> bool:
+        """
+        Take a subscriber slot, starting the polling thread if needed.
+
+        Returns:
+            False when limit (default: MAX_SUBSCRIBERS) streams are already
+            open
+        """
+        if limit is None:
+            limit = MAX_SUBSCRIBERS
+        with self._condition:
+            if self._subscribers >= limit:
+                return False
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="capture-broadcaster", daemon=True
+                )
+                self._thread.start()
+            return True
+
+    def unsubscribe(self) -> None:
+        """Give a slot back; the thread exits once nobody is subscribed."""
+        with self._condition:
+            self._subscribers = max(0, self._subscribers - 1)
+            self._condition.notify_all()
+
+    def wait(self, cursor: Optional[int], timeout: float) -> Optional[int]:
+        """
+        Block until captures past cursor exist or timeout passes.
+
+        Returns:
+            The newest rowid seen by the broadcaster (None before its first
+            poll)
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                latest = self._cursor
+                if latest is not None and (cursor is None or latest > cursor):
+                    return latest
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return latest
+                self._condition.wait(remaining)
+
+    def _run(self) -> None:
+        """Poll until the last subscriber leaves."""
+        data_version = None
+        try:
+            while True:
+                with self._condition:
+                    if not self._subscribers:
+                        self._thread = None
+                        self._cursor = None
+                        return
+
+                try:
+                    data_version = self._poll(data_version)
+                except Exception:
+                    # Missing or replaced file; try again on the next tick
+                    data_version = None
+
+                with self._condition:
+                    self._condition.wait(self.poll_interval)
+        finally:
+            db_pool.close_connections()
+
+    def _poll(self, data_version: Optional[int]) -> int:
+        """Publish MAX(rowid) if another connection committed since last time."""
+        conn = db_pool.get_connection(charts_service.DATABASE_PATH)
+        current = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current != data_version:
+            cursor = conn.execute("SELECT MAX(rowid) FROM captures").fetchone()[0] or 0
+            with self._condition:
+                if cursor != self._cursor:
+                    self._cursor = cursor
+                    self._condition.notify_all()
+        return current
+
+
+broadcaster = CaptureBroadcaster()
+
+
+class LiveFeed:
+    """One subscriber's SSE stream; iterate for event text, close() to leave."""
+
+    def __init__(
+        self,
+        metrics: List[str],
+        cursor: Optional[int],
+        ts_format: str,
+        source: CaptureBroadcaster,
+    ):
+        self.metrics = metrics
+        self.cursor = cursor
+        self.ts_format = ts_format
+        self._source = source
+        self._seen = cursor
+        self._closed = False
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            deadline = time.monotonic() + STREAM_LIFETIME
+            while time.monotonic() < deadline:
+                latest = self._source.wait(self._seen, KEEPALIVE_INTERVAL)
+                if latest is None or (self._seen is not None and latest <= self._seen):
+                    yield ": keepalive\n\n"
+                    continue
+
+                # Wait for the next change even if this one yields no rows
+                self._seen = latest
+                if self.cursor is None:
+                    # New subscriber without a cursor: start from now
+                    self.cursor = latest
+                    continue
+
+                delta = charts_service.query_chart_delta(
+                    cursor=self.cursor, metrics=self.metrics, ts_format=self.ts_format
+                )
+                if "error" in delta:
+                    yield _event("error", {"error": delta["error"]})
+                    return
+                if delta.get("truncated"):
+                    # Too far behind for a delta: resume from the newest row
+                    self.cursor = latest
+                    yield _event("reload", {"cursor": latest}, latest)
+                    continue
+
+                self.cursor = delta["cursor"]
+                if delta["timestamps"]:
+                    yield _event("captures", delta, self.cursor)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Release the subscriber slot and the stream's pooled connections.
+
+        Safe to call more than once. The server closes a response in the
+        greenlet or thread that served it, which is the one whose pooled
+        connections the stream's delta reads opened.
+        """
+        if not self._closed:
+            self._closed = True
+            self._source.unsubscribe()
+            db_pool.close_connections()
+
+
+def _event(name: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Format one SSE message."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def open_live_feed(
+    metrics: Optional[List[str]] = None,
+    cursor: Optional[int] = None,
+    ts_format: str = "iso",
+    source: Optional[CaptureBroadcaster] = None,
+) -> Union[Dict[str, Any], LiveFeed]:
+    """
+    Subscribe to captures appended after a cursor.
+
+    Args:
+        metrics: Metric names to push (default: the delta query's default)
+        cursor: Push rows with a rowid greater than this value (default:
+            only rows appended from now on)
+        ts_format: One of charts_service.TS_FORMATS
+        source: Broadcaster to subscribe to (default: the process-wide one)
+
+    Returns:
+        A LiveFeed yielding SSE messages, or an error dict. A "busy" key in
+        the error means MAX_SUBSCRIBERS streams are already open.
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"error": "Database not found"}
+
+    metrics = metrics or None
+    if metrics is not None:
+        metrics = [m for m in metrics if m in charts_service.AVAILABLE_METRICS]
+        if not metrics:
+            return {"error": "No valid metrics specified"}
+
+    source = source or broadcaster
+    if not source.subscribe():
+        return {"error": "Too many live subscribers", "busy": True}
+    return LiveFeed(metrics, cursor, ts_format, source)
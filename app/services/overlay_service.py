@@ -0,0 +1,298 @@
+"""Day-over-day overlays and heatmaps of chart metrics by time of day.
+
+Each selected local day is joined against the captures index in a single
+query that also averages the rows into buckets of one shared time-of-day
+axis, so comparing N days costs one round trip and N index range reads.
+Heatmaps ("metric keograms") group a whole range by local day and
+time-of-day bin in one pass, so only the day x bin matrix leaves SQLite.
+"""
+
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services import chart_cache, charts_service
+from app.services.charts_service import AVAILABLE_METRICS, NON_NUMERIC_METRICS
+
+# Most days one overlay may compare
+MAX_OVERLAY_DAYS = 31
+
+SECONDS_PER_DAY = 86400
+
+# Heatmap cell aggregates and their SQL (SQLite has no median aggregate)
+HEATMAP_AGGREGATES = {
+    "avg": "AVG",
+    "min": "MIN",
+    "max": "MAX",
+    "count": "COUNT",
+}
+
+# Days covered by a heatmap when no start is given
+HEATMAP_DEFAULT_DAYS = 30
+
+_cache = chart_cache.VersionedLRUCache(max_entries=32)
+
+
+def parse_day(value: str, today: Optional[date] = None) -> date:
+    """
+    Parse a day as an ISO date or as a number of days before today.
+
+    Raises:
+        ValueError: if value is neither
+    """
+    value = value.strip()
+    today = today or date.today()
+    if value.lstrip("-").isdigit():
+        return today - timedelta(days=abs(int(value)))
+    return date.fromisoformat(value)
+
+
+def parse_time_of_day(value: str) -> int:
+    """
+    Parse "HH:MM" (or "24:00") as seconds since midnight.
+
+    Raises:
+        ValueError: if value is not a valid time of day
+    """
+    if value.strip() == "24:00":
+        return SECONDS_PER_DAY
+    parsed = time.fromisoformat(value.strip())
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def _local_midnight(day: date) -> float:
+    """Unix time of local midnight at the start of a day."""
+    return datetime(day.year, day.month, day.day).timestamp()
+
+
+def query_overlay(
+    days: Optional[List[str]] = None,
+    metrics: Optional[List[str]] = None,
+    downsample: int = 500,
+    from_time: int = 0,
+    to_time: int = SECONDS_PER_DAY,
+) -> Dict[str, Any]:
+    """
+    Overlay metrics of several days on one time-of-day axis.
+
+    Rows are aligned by seconds since local midnight of their day, then
+    averaged into downsample equal buckets over [from_time, to_time).
+
+    Args:
+        days: Local days as ISO dates or days before today (default:
+            today and yesterday)
+        metrics: List of numeric metric names to include
+        downsample: Number of buckets on the shared axis
+        from_time: Start of the time-of-day window, seconds since midnight
+        to_time: End of the time-of-day window, seconds since midnight
+
+    Returns:
+        Dict with "time_of_day" (bucket centres, seconds since midnight),
+        "bucket_seconds" and a "days" list of {"day", "count", "data"}
+        with one value (or None) per bucket and metric
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"days": [], "error": "Database not found"}
+
+    try:
+        selected = list(dict.fromkeys(parse_day(d) for d in days or ["0", "1"]))
+    except ValueError:
+        return {"days": [], "error": "Invalid day"}
+
+    if len(selected) > MAX_OVERLAY_DAYS:
+        return {"days": [], "error": f"At most {MAX_OVERLAY_DAYS} days allowed"}
+
+    if not 0 <= from_time < to_time <= SECONDS_PER_DAY:
+        return {"days": [], "error": "Invalid time of day window"}
+
+    if not metrics:
+        metrics = ["lux", "brightness_mean", "exposure_time_us", "weather_temperature"]
+    valid_metrics = [
+        m for m in metrics if m in AVAILABLE_METRICS and m not in NON_NUMERIC_METRICS
+    ]
+
+    if not valid_metrics:
+        return {"days": [], "error": "No valid metrics specified"}
+
+    # (day, window start, window end) in unix time; the end is capped at the
+    # next local midnight so DST days still end where the day does
+    windows = []
+    for day in selected:
+        midnight = _local_midnight(day)
+        next_midnight = _local_midnight(day + timedelta(days=1))
+        windows.append(
+            (
+                day.isoformat(),
+                midnight + from_time,
+                min(midnight + to_time, next_midnight),
+            )
+        )
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH),
+        max(window[2] for window in windows),
+    )
+    key = ("overlay", tuple(windows), tuple(valid_metrics), downsample)
+
+    result = _cache.get(key, version)
+    if result is None:
+        width = (to_time - from_time) / downsample
+        result = _query_overlay(conn, windows, valid_metrics, downsample, width)
+        result["time_of_day"] = [
+            from_time + (i + 0.5) * width for i in range(downsample)
+        ]
+        result["bucket_seconds"] = width
+        _cache.set(key, version, result)
+    return result
+
+
+def _query_overlay(
+    conn: sqlite3.Connection,
+    windows: List[Tuple[str, float, float]],
+    metrics: List[str],
+    buckets: int,
+    width: float,
+) -> Dict[str, Any]:
+    """Run the grouped overlay query and spread the averages per day."""
+    columns = [AVAILABLE_METRICS[m] for m in metrics]
+    averages = "".join(f", AVG(c.{col})" for col in columns)
+    values_sql = ", ".join("(?, ?, ?)" for _ in windows)
+    params: List[Any] = [value for window in windows for value in window]
+
+    # Nested loop: one unix_timestamp index range read per day
+    rows = conn.execute(
+        f"""
+        WITH days(day, lo, hi) AS (VALUES {values_sql})
+        SELECT
+            days.day,
+            CAST((c.unix_timestamp - days.lo) / ? AS INTEGER) AS bucket,
+            COUNT(*){averages}
+        FROM days
+        JOIN captures AS c
+            ON c.unix_timestamp >= days.lo AND c.unix_timestamp < days.hi
+        GROUP BY days.day, bucket
+    """,
+        params + [width],
+    ).fetchall()
+
+    per_day: Dict[str, Dict[str, Any]] = {
+        day: {"day": day, "count": 0, "data": {m: [None] * buckets for m in metrics}}
+        for day, _, _ in windows
+    }
+    for row in rows:
+        entry = per_day[row[0]]
+        bucket = min(row[1], buckets - 1)
+        entry["count"] += row[2]
+        for i, m in enumerate(metrics):
+            entry["data"][m][bucket] = row[3 + i]
+
+    return {"days": [per_day[day] for day, _, _ in windows], "metrics": metrics}
+
+
+def query_heatmap(
+    metric: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bins: int = 144,
+    agg: str = "avg",
+) -> Dict[str, Any]:
+    """
+    Aggregate a metric per local day and time-of-day bin.
+
+    Args:
+        metric: Numeric metric name
+        start: ISO timestamp for start of range (default:
+            HEATMAP_DEFAULT_DAYS before end)
+        end: ISO timestamp for end of range (default: now)
+        bins: Time-of-day bins per day (144 gives 10-minute slots)
+        agg: One of HEATMAP_AGGREGATES
+
+    Returns:
+        Dict with "days" (local ISO dates that have captures), "bins",
+        "bin_seconds" and "values", one row per day with one value (or
+        None) per bin
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"days": [], "values": [], "error": "Database not found"}
+
+    if agg not in HEATMAP_AGGREGATES:
+        return {"days": [], "values": [], "error": f"Unknown aggregate: {agg}"}
+
+    if metric not in AVAILABLE_METRICS or metric in NON_NUMERIC_METRICS:
+        return {"days": [], "values": [], "error": f"Unknown metric: {metric}"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"days": [], "values": [], "error": "Invalid time range"}
+    if not start:
+        start_ts = end_ts - HEATMAP_DEFAULT_DAYS * SECONDS_PER_DAY
+
+    start_ts, end_ts = charts_service.normalize_range(start_ts, end_ts)
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH), end_ts
+    )
+    key = ("heatmap", start_ts, end_ts, metric, bins, agg)
+
+    result = _cache.get(key, version)
+    if result is None:
+        result = _query_heatmap(conn, start_ts, end_ts, metric, bins, agg)
+        _cache.set(key, version, result)
+    return result
+
+
+def _query_heatmap(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    metric: str,
+    bins: int,
+    agg: str,
+) -> Dict[str, Any]:
+    """Run the grouped heatmap query and lay the cells out per day."""
+    column = AVAILABLE_METRICS[metric]
+    width = SECONDS_PER_DAY / bins
+
+    # Local wall-clock time as seconds since 1970-01-01 local, so integer
+    # division gives the local day and the remainder the time of day
+    rows = conn.execute(
+        f"""
+        SELECT
+            local / {SECONDS_PER_DAY} AS day,
+            CAST((local % {SECONDS_PER_DAY}) / ? AS INTEGER) AS bin,
+            {HEATMAP_AGGREGATES[agg]}({column})
+        FROM (
+            SELECT
+                CAST(strftime('%s', unix_timestamp, 'unixepoch', 'localtime')
+                     AS INTEGER) AS local,
+                {column}
+            FROM captures
+            WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        )
+        GROUP BY day, bin
+        ORDER BY day, bin
+    """,
+        (width, start_ts, end_ts),
+    ).fetchall()
+
+    days: List[str] = []
+    values: List[List[Any]] = []
+    current = None
+    for day, bin_index, value in rows:
+        if day != current:
+            current = day
+            days.append((date(1970, 1, 1) + timedelta(days=day)).isoformat())
+            values.append([None] * bins)
+        values[-1][min(bin_index, bins - 1)] = value
+
+    return {
+        "metric": metric,
+        "agg": agg,
+        "days": days,
+        "bins": bins,
+        "bin_seconds": width,
+        "values": values,
+    }
@@ -0,0 +1,132 @@
+"""Time budgets and cancellation for chart queries.
+
+A progress handler on the pooled connection aborts a statement once the
+request has used up its budget, or once a newer request carrying the same
+page token has arrived (the page moved on, e.g. to another range). Tokens
+are tracked per process, so a newer request served by another gunicorn
+worker only bounds the older one by its budget. Queries on other
+connections (e.g. the rollup file) join the budget with extend().
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+# Seconds of SQL a chart request may spend before it is interrupted
+QUERY_BUDGET = 8.0
+
+# SQLite VM instructions between two budget checks
+PROGRESS_STEPS = 20000
+
+# Page tokens remembered per process
+MAX_TOKENS = 256
+
+
+class QueryInterrupted(Exception):
+    """A query ran out of budget ("timeout") or was "superseded"."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Query {reason}")
+        self.reason = reason
+
+
+_generations: "OrderedDict[str, int]" = OrderedDict()
+_tokens_lock = threading.Lock()
+
+# The innermost limit() block of each thread: (check, reasons)
+_local = threading.local()
+
+
+def _claim(token: str) -> int:
+    """Register a new request for a token, superseding older ones."""
+    with _tokens_lock:
+        generation = _generations.pop(token, 0) + 1
+        _generations[token] = generation
+        while len(_generations) > MAX_TOKENS:
+            _generations.popitem(last=False)
+        return generation
+
+
+def is_current(token: str, generation: int) -> bool:
+    """Check no newer request has claimed the token."""
+    return _generations.get(token, generation) == generation
+
+
+@contextmanager
+def limit(
+    conn: sqlite3.Connection,
+    seconds: Optional[float] = None,
+    token: Optional[str] = None,
+) -> Iterator[None]:
+    """
+    Interrupt statements run on conn inside the block when over budget.
+
+    Args:
+        conn: Connection the queries run on
+        seconds: Budget for the whole block (default: QUERY_BUDGET)
+        token: Page token; a later limit() with the same token supersedes
+            this one
+
+    Raises:
+        QueryInterrupted: when a statement was aborted by the budget or by
+            a newer request
+    """
+    deadline = time.monotonic() + (QUERY_BUDGET if seconds is None else seconds)
+    generation = _claim(token) if token else None
+    reason = []
+
+    def check() -> int:
+        if generation is not None and not is_current(token, generation):
+            reason.append("superseded")
+            return 1
+        if time.monotonic() > deadline:
+            reason.append("timeout")
+            return 1
+        return 0
+
+    previous = getattr(_local, "active", None)
+    _local.active = (check, reason)
+    try:
+        with _guard(conn, check, reason):
+            yield
+    finally:
+        _local.active = previous
+
+
+@contextmanager
+def extend(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    Apply the budget of this thread's enclosing limit() block to conn.
+
+    Outside a limit() block statements on conn run unbounded.
+
+    Raises:
+        QueryInterrupted: as limit()
+    """
+    active = getattr(_local, "active", None)
+    if active is None:
+        yield
+        return
+    with _guard(conn, *active):
+        yield
+
+
+@contextmanager
+def _guard(
+    conn: sqlite3.Connection,
+    check: Callable[[], int],
+    reason: List[str],
+) -> Iterator[None]:
+    """Install check as conn's progress handler for the block."""
+    conn.set_progress_handler(check, PROGRESS_STEPS)
+    try:
+        yield
+    except sqlite3.OperationalError:
+        if reason:
+            raise QueryInterrupted(reason[0]) from None
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
@@ -0,0 +1,352 @@
+"""Incrementally maintained rollup tables for long-range chart queries.
+
+Rollups live in a dashboard-owned SQLite file next to timelapse.db so the
+raspilapse database itself is only ever read. Each level keeps one row per
+time bucket with the count and the avg/min/max of every numeric metric.
+When snapshots are enabled the rollups are built from the local snapshot
+(see snapshot_service), so they never read timelapse.db at all.
+
+Chart requests never build rollups themselves: request_refresh() hands the
+work to a background thread and requests read raw captures until the first
+build has finished. Each transaction of a build aggregates at most
+REFRESH_CHUNK_SECONDS of captures, so neither database is held for long.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+from app.services import db_pool, query_budget, snapshot_service
+
+# Rollup levels and their bucket width in seconds, coarsest first
+ROLLUP_LEVELS = (("day", 86400), ("hour", 3600), ("minute", 60))
+
+# Minimum seconds between two refreshes of the same rollup file
+REFRESH_INTERVAL = 30
+
+# Seconds of captures aggregated per transaction (a multiple of every width)
+REFRESH_CHUNK_SECONDS = 7 * 86400
+
+_last_refresh: Dict[str, float] = {}
+_refresh_lock = threading.Lock()
+_refreshing: Set[str] = set()
+
+
+def get_rollup_path(db_path: Path) -> Path:
+    """Get the rollup database path for a captures database."""
+    return db_path.with_suffix(".rollups.db")
+
+
+def choose_level(span_seconds: float, target: int) -> Optional[str]:
+    """
+    Pick the coarsest rollup level that still yields target points.
+
+    Returns None when even per-minute buckets are too coarse for the span.
+    """
+    for level, width in ROLLUP_LEVELS:
+        if span_seconds / width >= target:
+            return level
+    return None
+
+
+def _source_path(db_path: Path) -> Optional[Path]:
+    """
+    Get the database rollups are built from.
+
+    That is the snapshot when snapshots are enabled, or timelapse.db. None
+    while the snapshot isn't ready: switching between the two could make
+    the captures look like they went backwards and force a full rebuild.
+    """
+    source = snapshot_service.get_read_path(db_path)
+    if snapshot_service.MAX_STALENESS is not None and source == db_path:
+        return None
+    return source
+
+
+def _connect(db_path: Path, source_path: Path) -> sqlite3.Connection:
+    """Open the rollup database for writing, with the captures attached as src."""
+    rollup_path = get_rollup_path(db_path)
+    conn = sqlite3.connect(
+        f"file:{quote(str(rollup_path))}", uri=True, timeout=10, isolation_level=None
+    )
+    conn.row_factory = sqlite3.Row
+    # WAL so chart requests keep reading while a refresh commits
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(
+        "ATTACH DATABASE ? AS src", (f"file:{quote(str(source_path))}?mode=ro",)
+    )
+    return conn
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """Run the block as one write transaction on the rollup database."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _source_columns(conn: sqlite3.Connection, columns: Sequence[str]) -> List[str]:
+    """Filter columns down to those present in src.captures."""
+    existing = {row["name"] for row in conn.execute("PRAGMA src.table_info(captures)")}
+    return [c for c in columns if c in existing]
+
+
+def _create_tables(
+    conn: sqlite3.Connection, columns: List[str], source_id: str
+) -> None:
+    """(Re)create rollup tables when the source file or column set changes."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    signature = f"{source_id}:{','.join(columns)}"
+    row = conn.execute(
+        "SELECT value FROM rollup_meta WHERE key = 'signature'"
+    ).fetchone()
+    if row is not None and row["value"] == signature:
+        return
+
+    metric_defs = ", ".join(
+        f"{c}_avg REAL, {c}_min REAL, {c}_max REAL" for c in columns
+    )
+    for level, _ in ROLLUP_LEVELS:
+        conn.execute(f"DROP TABLE IF EXISTS rollup_{level}")
+        conn.execute(
+            f"""
+            CREATE TABLE rollup_{level} (
+                bucket INTEGER PRIMARY KEY,
+                t REAL NOT NULL,
+                count INTEGER NOT NULL{", " + metric_defs if metric_defs else ""}
+            )
+        """
+        )
+    conn.execute("DROP TABLE IF EXISTS rollup_state")
+    conn.execute(
+        "CREATE TABLE rollup_state (level TEXT PRIMARY KEY, last_unix_timestamp REAL)"
+    )
+    conn.execute("DELETE FROM rollup_meta WHERE key = 'cursor'")
+    conn.execute(
+        "INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('signature', ?)",
+        (signature,),
+    )
+
+
+def request_refresh(db_path: Path, columns: Sequence[str]) -> None:
+    """
+    Refresh the rollups in a background thread.
+
+    Does nothing while a refresh of the same file is running or if the
+    last one (successful or not) started less than REFRESH_INTERVAL ago.
+    """
+    key = str(db_path)
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        if time.monotonic() - _last_refresh.get(key, float("-inf")) < REFRESH_INTERVAL:
+            return
+        _refreshing.add(key)
+
+    def run() -> None:
+        try:
+            source_path = _source_path(db_path)
+            if source_path is None:
+                # Retry once the snapshot is ready
+                _last_refresh[key] = time.monotonic()
+                return
+            refresh_rollups(db_path, columns, force=True, source_path=source_path)
+        except (sqlite3.Error, OSError):
+            # Back off for REFRESH_INTERVAL before trying again
+            _last_refresh[key] = time.monotonic()
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name="rollup-refresh", daemon=True).start()
+
+
+def refresh_rollups(
+    db_path: Path,
+    columns: Sequence[str],
+    force: bool = False,
+    source_path: Optional[Path] = None,
+) -> None:
+    """
+    Bring all rollup levels up to date with the captures table.
+
+    Only buckets from the last processed unix_timestamp onwards are
+    recomputed, so a refresh costs roughly the rows added since the
+    previous one. The first build (and a rebuild after captures were
+    deleted) walks the whole table, REFRESH_CHUNK_SECONDS per transaction.
+    Refreshes are throttled to REFRESH_INTERVAL per process.
+
+    Args:
+        db_path: timelapse.db; names the rollup file and identifies the data
+        columns: Metric columns to roll up
+        force: Refresh even within REFRESH_INTERVAL of the last refresh
+        source_path: Copy of timelapse.db to read captures from (default:
+            db_path)
+    """
+    key = str(db_path)
+    now = time.monotonic()
+    if not force and now - _last_refresh.get(key, float("-inf")) < REFRESH_INTERVAL:
+        return
+
+    conn = _connect(db_path, source_path or db_path)
+    try:
+        with _transaction(conn):
+            stat = os.stat(db_path)
+            tracked = _source_columns(conn, columns)
+            _create_tables(conn, tracked, f"{stat.st_dev}-{stat.st_ino}")
+            # One statement, so the cursor matches newest: every row up to
+            # it is at or before newest and ends up in the rollups
+            span = conn.execute(
+                """
+                SELECT
+                    MIN(unix_timestamp) AS oldest,
+                    MAX(unix_timestamp) AS newest,
+                    MAX(rowid) AS cursor
+                FROM src.captures
+            """
+            ).fetchone()
+
+        if span["newest"] is not None:
+            for level, width in ROLLUP_LEVELS:
+                _refresh_level(
+                    conn, level, width, tracked, span["oldest"], span["newest"]
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_meta (key, value) VALUES ('cursor', ?)",
+                (span["cursor"],),
+            )
+    finally:
+        conn.close()
+
+    _last_refresh[key] = now
+
+
+def _refresh_level(
+    conn: sqlite3.Connection,
+    level: str,
+    width: int,
+    columns: List[str],
+    oldest: float,
+    newest: float,
+) -> None:
+    """Recompute one level from the bucket holding its last processed row."""
+    row = conn.execute(
+        "SELECT last_unix_timestamp FROM rollup_state WHERE level = ?", (level,)
+    ).fetchone()
+    last = row["last_unix_timestamp"] if row is not None else None
+    if last == newest:
+        return
+
+    if last is not None and last < newest:
+        # The last bucket may have been partial; rebuild it from its start
+        lo = int(last // width) * width
+    else:
+        # First build, or captures went backwards (rows deleted): start over,
+        # hidden from readers until the whole refresh is done
+        with _transaction(conn):
+            conn.execute(f"DELETE FROM rollup_{level}")
+            conn.execute("DELETE FROM rollup_meta WHERE key = 'cursor'")
+        lo = int(oldest // width) * width
+
+    aggregates = "".join(f", AVG({c}), MIN({c}), MAX({c})" for c in columns)
+    while lo <= newest:
+        hi = lo + REFRESH_CHUNK_SECONDS
+        with _transaction(conn):
+            conn.execute(
+                f"DELETE FROM rollup_{level} WHERE bucket >= ? AND bucket < ?",
+                (lo, hi),
+            )
+            conn.execute(
+                f"""
+                INSERT INTO rollup_{level}
+                SELECT
+                    CAST(unix_timestamp / {width} AS INTEGER) * {width} AS bucket,
+                    AVG(unix_timestamp),
+                    COUNT(*){aggregates}
+                FROM src.captures
+                WHERE unix_timestamp >= ? AND unix_timestamp < ?
+                    AND unix_timestamp <= ?
+                GROUP BY bucket
+            """,
+                (lo, hi, newest),
+            )
+            # Progress is kept per chunk, so an interrupted build resumes
+            conn.execute(
+                "INSERT OR REPLACE INTO rollup_state (level, last_unix_timestamp) "
+                "VALUES (?, ?)",
+                (level, min(hi, newest)),
+            )
+        lo = hi
+
+
+def query_rollup(
+    db_path: Path,
+    level: str,
+    start_ts: float,
+    end_ts: float,
+    columns: Sequence[str],
+) -> Optional[Tuple[List[sqlite3.Row], int]]:
+    """
+    Read per-bucket averages for a range from one rollup level.
+
+    Each row has t (mean unix_timestamp of the bucket), count and one
+    column per requested metric column holding the bucket average. The
+    rows are returned with the delta cursor they are complete up to: the
+    highest captures rowid the last refresh saw. Returns None until the
+    rollups have been built, or when a requested column is not tracked by
+    the rollups. Inside query_budget.limit() the reads count against the
+    request's budget.
+
+    Raises:
+        query_budget.QueryInterrupted: when the budget ran out
+    """
+    rollup_path = get_rollup_path(db_path)
+    if not rollup_path.exists():
+        return None
+
+    width = dict(ROLLUP_LEVELS)[level]
+    conn = db_pool.get_connection(rollup_path)
+    with query_budget.extend(conn):
+        # A file without rollup_meta is still being created
+        has_meta = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_meta'"
+        ).fetchone()
+        if has_meta is None:
+            return None
+        # Read before the rows: a refresh committed in between then only
+        # makes the rows newer than the cursor, never older
+        complete = conn.execute(
+            "SELECT value FROM rollup_meta WHERE key = 'cursor'"
+        ).fetchone()
+        if complete is None:
+            return None
+
+        tracked = {
+            row["name"] for row in conn.execute(f"PRAGMA table_info(rollup_{level})")
+        }
+        if any(f"{c}_avg" not in tracked for c in columns):
+            return None
+
+        averages = "".join(f", {c}_avg AS {c}" for c in columns)
+        cursor = conn.execute(
+            f"""
+            SELECT t, count{averages}
+            FROM rollup_{level}
+            WHERE bucket >= ? AND bucket <= ?
+            ORDER BY bucket ASC
+        """,
+            (int(start_ts // width) * width, end_ts),
+        )
+        return cursor.fetchall(), int(complete["value"])
@@ -0,0 +1,292 @@
+"""Local read snapshot of timelapse.db for dashboard queries.
+
+Long chart scans on timelapse.db hold a shared lock that the capture
+process has to wait out before it can commit (outside WAL mode). Instead
+the dashboard reads a dashboard-owned mirror of the captures table next to
+it, kept in WAL mode so its own refreshes never block readers either.
+
+The mirror is filled by rowid in chunks of MIRROR_CHUNK_ROWS, each its own
+short read of timelapse.db, and is topped up with the appended rows once
+it is older than MAX_STALENESS seconds. Captures are append-only; the
+mirror is rebuilt from scratch only when it has drifted: timelapse.db was
+replaced, its captures schema changed, its oldest row is not the
+mirror's, its newest rowid fell below the mirror's, or (checked every
+VERIFY_INTERVAL seconds) its row count up to the mirror's last rowid
+differs. A rebuild rewrites the whole mirror and sends reads to
+timelapse.db while it runs, so rows edited in place are only picked up
+by the optional periodic REBUILD_INTERVAL.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from app.services import index_service
+
+# Seconds a snapshot may lag timelapse.db; None reads timelapse.db directly
+MAX_STALENESS: Optional[float] = None
+
+# Rows copied per read of timelapse.db
+MIRROR_CHUNK_ROWS = 5000
+
+# Seconds between row count comparisons of the mirror and timelapse.db
+VERIFY_INTERVAL = 3600
+
+# Seconds after which the mirror is rebuilt from scratch anyway, to pick up
+# rows edited in place; None rebuilds only on drift
+REBUILD_INTERVAL: Optional[float] = None
+
+_last_refresh: Dict[str, float] = {}
+_refresh_lock = threading.Lock()
+_rebuilding: Set[str] = set()
+
+
+def configure(max_staleness: Optional[float]) -> None:
+    """Enable snapshot reads with a staleness bound (None or <= 0 disables)."""
+    global MAX_STALENESS
+    MAX_STALENESS = max_staleness if max_staleness and max_staleness > 0 else None
+
+
+def expire(db_path: Path) -> None:
+    """Make the next read top the snapshot up, e.g. after a new capture."""
+    _last_refresh.pop(str(db_path), None)
+
+
+def get_snapshot_path(db_path: Path) -> Path:
+    """Get the snapshot database path for a captures database."""
+    return db_path.with_suffix(".snapshot.db")
+
+
+def get_read_path(db_path: Path) -> Path:
+    """
+    Get the database file dashboard queries should read.
+
+    Tops the snapshot up first when it is older than MAX_STALENESS. While
+    the snapshot is being built (in a background thread), or when it
+    can't be refreshed, timelapse.db itself is returned.
+    """
+    if MAX_STALENESS is None:
+        return db_path
+
+    key = str(db_path)
+    snapshot_path = get_snapshot_path(db_path)
+    if key in _rebuilding or not snapshot_path.exists():
+        _start_rebuild(db_path)
+        return db_path
+
+    if time.monotonic() - _last_refresh.get(key, float("-inf")) < MAX_STALENESS:
+        return snapshot_path
+
+    # Another thread is already topping it up: its result is fresh enough
+    if not _refresh_lock.acquire(blocking=False):
+        return snapshot_path
+    try:
+        if not refresh(db_path):
+            _start_rebuild(db_path)
+            return db_path
+    except (sqlite3.Error, OSError):
+        return db_path
+    finally:
+        _refresh_lock.release()
+    return snapshot_path
+
+
+def refresh(db_path: Path) -> bool:
+    """
+    Append rows added to timelapse.db since the last refresh.
+
+    Returns:
+        False when the snapshot can't be topped up and needs a rebuild
+    """
+    conn = _connect(db_path)
+    try:
+        meta = _read_meta(conn)
+        if meta is None or meta["source"] != _source_id(db_path):
+            return False
+        if meta["schema"] != _source_schema(conn)[0]:
+            return False
+        if REBUILD_INTERVAL is not None:
+            if time.time() - float(meta["built_at"]) > REBUILD_INTERVAL:
+                return False
+        if _drifted(conn, float(meta.get("verified_at", meta["built_at"]))):
+            return False
+        _copy_rows(conn, "captures")
+    finally:
+        conn.close()
+
+    _last_refresh[str(db_path)] = time.monotonic()
+    return True
+
+
+def rebuild(db_path: Path) -> None:
+    """
+    Mirror timelapse.db from scratch.
+
+    Rows are copied into a side table that replaces the old mirror in one
+    transaction, so readers see either snapshot in full. The recommended
+    charts indexes are created on the mirror whether or not timelapse.db
+    has them.
+    """
+    conn = _connect(db_path)
+    try:
+        source_id = _source_id(db_path)
+        schema, indexes = _source_schema(conn)
+        conn.execute("DROP TABLE IF EXISTS main.captures_rebuild")
+        conn.execute(
+            "CREATE TABLE main.captures_rebuild AS SELECT * FROM src.captures WHERE 0"
+        )
+        _copy_rows(conn, "captures_rebuild")
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS main.captures")
+            conn.execute("ALTER TABLE main.captures_rebuild RENAME TO captures")
+            for sql in indexes:
+                conn.execute(sql)
+            for name, columns in index_service.RECOMMENDED_INDEXES:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS main.{name} ON captures ({columns})"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS main.snapshot_meta "
+                "(key TEXT PRIMARY KEY, value TEXT)"
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO main.snapshot_meta (key, value) VALUES (?, ?)",
+                [("source", source_id), ("schema", schema), ("built_at", time.time())],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    _last_refresh[str(db_path)] = time.monotonic()
+
+
+def _drifted(conn: sqlite3.Connection, verified_at: float) -> bool:
+    """
+    Check whether the mirror no longer matches timelapse.db up to its end.
+
+    The rowid bounds are index seeks and are compared on every refresh.
+    Rows deleted from the middle only show in a COUNT(*) of both sides,
+    which runs once per VERIFY_INTERVAL and is recorded as verified_at.
+    """
+    first, last = conn.execute(
+        "SELECT MIN(rowid), MAX(rowid) FROM main.captures"
+    ).fetchone()
+    source_first, source_last = conn.execute(
+        "SELECT MIN(rowid), MAX(rowid) FROM src.captures"
+    ).fetchone()
+    if last is None:
+        return False
+    if (source_last or 0) < last or source_first != first:
+        return True
+
+    if time.time() - verified_at < VERIFY_INTERVAL:
+        return False
+    mirrored = conn.execute("SELECT COUNT(*) FROM main.captures").fetchone()[0]
+    source = conn.execute(
+        "SELECT COUNT(*) FROM src.captures WHERE rowid <= ?", (last,)
+    ).fetchone()[0]
+    if source != mirrored:
+        return True
+    conn.execute(
+        "INSERT OR REPLACE INTO main.snapshot_meta (key, value) "
+        "VALUES ('verified_at', ?)",
+        (time.time(),),
+    )
+    return False
+
+
+def _start_rebuild(db_path: Path) -> None:
+    """Rebuild the snapshot in a background thread unless one is running."""
+    key = str(db_path)
+    with _refresh_lock:
+        if key in _rebuilding:
+            return
+        _rebuilding.add(key)
+
+    def run() -> None:
+        try:
+            rebuild(db_path)
+        except (sqlite3.Error, OSError):
+            pass
+        finally:
+            with _refresh_lock:
+                _rebuilding.discard(key)
+
+    threading.Thread(target=run, name="snapshot-rebuild", daemon=True).start()
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    """Open the snapshot with timelapse.db attached read-only as src."""
+    snapshot_path = get_snapshot_path(db_path)
+    conn = sqlite3.connect(
+        f"file:{quote(str(snapshot_path))}", uri=True, timeout=30, isolation_level=None
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("ATTACH DATABASE ? AS src", (f"file:{quote(str(db_path))}?mode=ro",))
+    return conn
+
+
+def _source_id(db_path: Path) -> str:
+    """Identify the timelapse.db file (replaced files get a new id)."""
+    stat = os.stat(db_path)
+    return f"{stat.st_dev}-{stat.st_ino}"
+
+
+def _source_schema(conn: sqlite3.Connection) -> Tuple[str, List[str]]:
+    """Get the CREATE statements of src.captures and its indexes."""
+    rows = conn.execute(
+        """
+        SELECT type, sql FROM src.sqlite_master
+        WHERE tbl_name = 'captures' AND sql IS NOT NULL
+        ORDER BY type = 'index', name
+    """
+    ).fetchall()
+    tables = [row["sql"] for row in rows if row["type"] == "table"]
+    if not tables:
+        raise sqlite3.OperationalError("no such table: captures")
+    return tables[0], [row["sql"] for row in rows if row["type"] == "index"]
+
+
+def _read_meta(conn: sqlite3.Connection) -> Optional[Dict[str, str]]:
+    """Read the snapshot's bookkeeping, or None for an unknown file."""
+    try:
+        rows = conn.execute("SELECT key, value FROM main.snapshot_meta").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return {row["key"]: row["value"] for row in rows}
+
+
+def _copy_rows(conn: sqlite3.Connection, table: str) -> None:
+    """
+    Copy src.captures rows past the end of a mirror table.
+
+    Each chunk is its own statement, so timelapse.db is only ever read in
+    short transactions. Rows another process copied first are skipped.
+    """
+    columns = ", ".join(
+        f'"{row["name"]}"' for row in conn.execute("PRAGMA src.table_info(captures)")
+    )
+    while True:
+        after = conn.execute(f"SELECT MAX(rowid) FROM main.{table}").fetchone()[0]
+        cursor = conn.execute(
+            f"""
+            INSERT OR IGNORE INTO main.{table} (rowid, {columns})
+            SELECT rowid, {columns} FROM src.captures
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """,
+            (after or 0, MIRROR_CHUNK_ROWS),
+        )
+        if cursor.rowcount < MIRROR_CHUNK_ROWS:
+            return
@@ -0,0 +1,692 @@
+"""Summary statistics and distributions over captures.
+
+Only aggregates leave this module: summary stats come from one SQLite pass
+for count/min/max/mean and the sum of squares plus one small histogram per
+metric, histograms are binned by a GROUP BY inside SQLite, capture
+cadence is counted from one LAG() pass, and correlations are 2D
+histograms binned chunk by chunk.
+"""
+
+import math
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, TypeVar
+
+from app.services import chart_cache, charts_service
+from app.services.charts_service import AVAILABLE_METRICS, NON_NUMERIC_METRICS
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# Percentiles reported for every metric
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Histogram resolution used to approximate percentiles
+HISTOGRAM_BINS = 256
+
+# Bucket sizes for per-bucket stats, as local-time strftime labels
+STATS_BUCKETS = {
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%d",
+}
+
+# Axis scales for correlation histograms
+AXIS_SCALES = ("linear", "log")
+
+# Rows binned per fetchmany round trip for correlation histograms
+CORRELATION_CHUNK_ROWS = 10000
+
+# Percentiles reported for capture deltas
+CADENCE_PERCENTILES = (50, 95, 99)
+
+# Decimal places capture deltas are rounded to before counting
+CADENCE_DECIMALS = 1
+
+# Multiple of the capture interval a delta must exceed to count as overrun
+CADENCE_OVERRUN = 1.1
+
+_cache = chart_cache.VersionedLRUCache(max_entries=32)
+
+
+def query_stats(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    metrics: Optional[List[str]] = None,
+    bucket: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Get min/max/mean/stddev and approximate percentiles per metric.
+
+    Args:
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        metrics: List of numeric metric names to include
+        bucket: Optional key of STATS_BUCKETS to also break the stats
+            down per local hour or day
+
+    Returns:
+        Dict with "stats" per metric over the whole range and, when
+        bucket is set, a "buckets" list of {"start", "stats"}
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"stats": {}, "error": "Database not found"}
+
+    if bucket is not None and bucket not in STATS_BUCKETS:
+        return {"stats": {}, "error": f"Unknown bucket: {bucket}"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"stats": {}, "error": "Invalid time range"}
+
+    if not metrics:
+        metrics = ["lux", "brightness_mean", "exposure_time_us", "weather_temperature"]
+    valid_metrics = [
+        m for m in metrics if m in AVAILABLE_METRICS and m not in NON_NUMERIC_METRICS
+    ]
+
+    if not valid_metrics:
+        return {"stats": {}, "error": "No valid metrics specified"}
+
+    start_ts, end_ts = charts_service.normalize_range(start_ts, end_ts)
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH), end_ts
+    )
+    key = ("stats", start_ts, end_ts, tuple(valid_metrics), bucket)
+
+    result = _cache.get(key, version)
+    if result is None:
+        result = _compute_stats(conn, start_ts, end_ts, valid_metrics, bucket)
+        _cache.set(key, version, result)
+    return result
+
+
+def _bucket_expr(bucket: Optional[str]) -> str:
+    """SQL expression labelling a row with its local-time bucket."""
+    if bucket is None:
+        return "NULL"
+    return (
+        f"strftime('{STATS_BUCKETS[bucket]}', unix_timestamp, 'unixepoch', 'localtime')"
+    )
+
+
+def _compute_stats(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    metrics: List[str],
+    bucket: Optional[str],
+) -> Dict[str, Any]:
+    """Run the aggregate and histogram queries and assemble the stats."""
+    columns = [AVAILABLE_METRICS[m] for m in metrics]
+    aggregates = ", ".join(
+        f"COUNT({c}), MIN({c}), MAX({c}), AVG({c}), AVG({c} * {c})" for c in columns
+    )
+    rows = conn.execute(
+        f"""
+        SELECT {_bucket_expr(bucket)} AS bucket, {aggregates}
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        GROUP BY bucket
+        ORDER BY bucket ASC
+    """,
+        (start_ts, end_ts),
+    ).fetchall()
+
+    # moments[bucket][metric] = (count, min, max, mean, mean of squares)
+    moments: Dict[Any, Dict[str, tuple]] = {}
+    for row in rows:
+        moments[row[0]] = {
+            m: tuple(row[1 + 5 * i : 6 + 5 * i]) for i, m in enumerate(metrics)
+        }
+
+    overall = {m: _merge_moments([b[m] for b in moments.values()]) for m in metrics}
+
+    histograms = {
+        m: _histogram(conn, start_ts, end_ts, m, overall[m], bucket) for m in metrics
+    }
+
+    result: Dict[str, Any] = {
+        "stats": {
+            m: _summarize(
+                overall[m], _sum_histograms(histograms[m].values()), overall[m]
+            )
+            for m in metrics
+        },
+        "bucket": bucket,
+    }
+    if bucket is not None:
+        result["buckets"] = [
+            {
+                "start": label,
+                "stats": {
+                    m: _summarize(
+                        moments[label][m], histograms[m].get(label, {}), overall[m]
+                    )
+                    for m in metrics
+                },
+            }
+            for label in moments
+        ]
+    return result
+
+
+def _merge_moments(parts: List[tuple]) -> tuple:
+    """Combine per-bucket (count, min, max, mean, mean_sq) into one."""
+    parts = [p for p in parts if p[0]]
+    count = sum(p[0] for p in parts)
+    if not count:
+        return (0, None, None, None, None)
+    return (
+        count,
+        min(p[1] for p in parts),
+        max(p[2] for p in parts),
+        sum(p[0] * p[3] for p in parts) / count,
+        sum(p[0] * p[4] for p in parts) / count,
+    )
+
+
+def _bin_width(low: float, high: float) -> float:
+    """Width of one histogram bin over [low, high]."""
+    return (high - low) / HISTOGRAM_BINS or 1.0
+
+
+def _histogram(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    metric: str,
+    overall: tuple,
+    bucket: Optional[str],
+) -> Dict[Any, Dict[int, int]]:
+    """Count values per (bucket, bin) over the metric's overall min..max."""
+    count, low, high = overall[:3]
+    if not count:
+        return {}
+
+    column = AVAILABLE_METRICS[metric]
+    cursor = conn.execute(
+        f"""
+        SELECT
+            {_bucket_expr(bucket)} AS bucket,
+            MIN(CAST(({column} - ?) / ? AS INTEGER), ?) AS bin,
+            COUNT(*)
+        FROM captures
+        WHERE unix_timestamp >= ? AND unix_timestamp <= ? AND {column} IS NOT NULL
+        GROUP BY bucket, bin
+    """,
+        (low, _bin_width(low, high), HISTOGRAM_BINS - 1, start_ts, end_ts),
+    )
+
+    histograms: Dict[Any, Dict[int, int]] = {}
+    for label, bin_index, n in cursor:
+        histograms.setdefault(label, {})[bin_index] = n
+    return histograms
+
+
+# Histogram bin key: a bin index, or a rounded delta for cadence
+_Bin = TypeVar("_Bin", int, float)
+
+
+def _sum_histograms(histograms: Iterable[Dict[_Bin, int]]) -> Dict[_Bin, int]:
+    """Add up per-bucket histograms that share the same bins."""
+    total: Dict[_Bin, int] = {}
+    for histogram in histograms:
+        for bin_index, n in histogram.items():
+            total[bin_index] = total.get(bin_index, 0) + n
+    return total
+
+
+def _percentile(
+    histogram: Dict[int, int], count: int, pct: float, low: float, width: float
+) -> float:
+    """Interpolate a percentile within the histogram bin that holds it."""
+    rank = pct / 100.0 * count
+    seen = 0
+    for bin_index in sorted(histogram):
+        n = histogram[bin_index]
+        if seen + n >= rank:
+            return low + width * (bin_index + (rank - seen) / n)
+        seen += n
+    return low + width * HISTOGRAM_BINS
+
+
+def _summarize(moments: tuple, histogram: Dict[int, int], overall: tuple) -> Dict:
+    """Build the stats dict for one metric from its moments and histogram."""
+    count, low, high, mean, mean_sq = moments
+    stats: Dict[str, Any] = {"count": count, "min": low, "max": high, "mean": mean}
+    if not count:
+        stats["stddev"] = None
+        stats.update({f"p{p}": None for p in PERCENTILES})
+        return stats
+
+    # Population stddev from E[x^2] - E[x]^2, clamped against rounding
+    stats["stddev"] = math.sqrt(max(0.0, mean_sq - mean * mean))
+
+    # Bins span the overall range; clamp to this bucket's own extremes
+    bins_low = overall[1]
+    width = _bin_width(bins_low, overall[2])
+    for p in PERCENTILES:
+        value = _percentile(histogram, count, p, bins_low, width)
+        stats[f"p{p}"] = min(max(value, low), high)
+    return stats
+
+
+def query_histogram(
+    metric: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bins: int = 50,
+    scale: str = "linear",
+) -> Dict[str, Any]:
+    """
+    Count a metric's values in equal-width bins over its range.
+
+    Bins span the metric's min..max in the range, on a log10 axis when
+    scale is "log" (non-positive values are then left out). Binning and
+    counting happen in SQLite; only the counts are returned.
+
+    Args:
+        metric: Numeric metric name
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        bins: Number of bins
+        scale: "linear" or "log" bin spacing
+
+    Returns:
+        Dict with "metric", "scale", bin "edges" in metric units, "counts"
+        per bin and the total "count"
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"counts": [], "error": "Database not found"}
+
+    if metric not in AVAILABLE_METRICS or metric in NON_NUMERIC_METRICS:
+        return {"counts": [], "error": f"Invalid metric: {metric}"}
+    if scale not in AXIS_SCALES:
+        return {"counts": [], "error": f"Unknown scale: {scale}"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"counts": [], "error": "Invalid time range"}
+
+    start_ts, end_ts = charts_service.normalize_range(start_ts, end_ts)
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH), end_ts
+    )
+    key = ("histogram", start_ts, end_ts, metric, bins, scale)
+
+    result = _cache.get(key, version)
+    if result is None:
+        result = _compute_histogram(conn, start_ts, end_ts, metric, bins, scale)
+        _cache.set(key, version, result)
+    return result
+
+
+def _ensure_log10(conn: sqlite3.Connection) -> None:
+    """Register log10() on builds of SQLite without the math functions."""
+    try:
+        conn.execute("SELECT log10(1)")
+    except sqlite3.OperationalError:
+        conn.create_function("log10", 1, math.log10, deterministic=True)
+
+
+def _compute_histogram(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    metric: str,
+    bins: int,
+    scale: str,
+) -> Dict[str, Any]:
+    """Find the bounds, then count rows per bin with one GROUP BY."""
+    column = AVAILABLE_METRICS[metric]
+    conditions = [f"{column} IS NOT NULL"]
+    value = column
+    if scale == "log":
+        _ensure_log10(conn)
+        conditions.append(f"{column} > 0")
+        value = f"log10({column})"
+    where = " AND ".join(["unix_timestamp >= ? AND unix_timestamp <= ?"] + conditions)
+
+    count, low, high = conn.execute(
+        f"SELECT COUNT(*), MIN({value}), MAX({value}) FROM captures WHERE {where}",
+        (start_ts, end_ts),
+    ).fetchone()
+
+    result = dict(_axis_info((metric, scale, low, high), bins, count), count=count)
+    result["counts"] = [0] * bins if count else []
+    if not count:
+        return result
+
+    # The maximum lands on index bins, so clamp it into the last bin
+    rows = conn.execute(
+        f"""
+        SELECT MIN(CAST(({value} - ?) / ? AS INTEGER), ?) AS bin, COUNT(*)
+        FROM captures
+        WHERE {where}
+        GROUP BY bin
+    """,
+        (low, _axis_width(low, high, bins), bins - 1, start_ts, end_ts),
+    ).fetchall()
+    for index, n in rows:
+        result["counts"][index] += n
+    return result
+
+
+def query_cadence(
+    interval: float,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Summarize the spacing of consecutive captures per hour and per mode.
+
+    Deltas come from one LAG() pass over the unix_timestamp index, counted
+    per local hour, mode and rounded delta inside SQLite; the
+    percentiles are read off those counts. A delta belongs to the later
+    capture, so a long night exposure that overran shows up under its own
+    hour and mode. Deltas over GAP_FACTOR * interval are stalls (see
+    charts_service.get_capture_gaps) and only counted as "stalls".
+
+    Args:
+        interval: Configured seconds between captures
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+
+    Returns:
+        Dict with the "overrun_threshold" and "stall_threshold" used,
+        "overall" stats, "hours" as stats plus "hour" and per-mode "modes",
+        and "modes" mapping mode to stats. Stats hold "count", "p50",
+        "p95", "p99", "max", "overruns" and "stalls"
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"hours": [], "error": "Database not found"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"hours": [], "error": "Invalid time range"}
+
+    start_ts, end_ts = charts_service.normalize_range(start_ts, end_ts)
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH), end_ts
+    )
+    key = ("cadence", start_ts, end_ts, interval)
+
+    result = _cache.get(key, version)
+    if result is None:
+        result = _compute_cadence(conn, start_ts, end_ts, interval)
+        _cache.set(key, version, result)
+    return result
+
+
+def _compute_cadence(
+    conn: sqlite3.Connection, start_ts: float, end_ts: float, interval: float
+) -> Dict[str, Any]:
+    """Count rounded deltas per hour and mode, then summarize each group."""
+    overrun = interval * CADENCE_OVERRUN
+    stall = interval * charts_service.GAP_FACTOR
+
+    rows = conn.execute(
+        f"""
+        SELECT
+            strftime('{STATS_BUCKETS["hour"]}', unix_timestamp, 'unixepoch',
+                     'localtime') AS hour,
+            COALESCE(mode, 'unknown') AS mode,
+            ROUND(delta, ?) AS step,
+            COUNT(*)
+        FROM (
+            SELECT
+                unix_timestamp,
+                mode,
+                unix_timestamp - LAG(unix_timestamp) OVER (
+                    ORDER BY unix_timestamp
+                ) AS delta
+            FROM captures
+            WHERE unix_timestamp >= ? AND unix_timestamp <= ?
+        )
+        WHERE delta IS NOT NULL
+        GROUP BY hour, mode, step
+    """,
+        (CADENCE_DECIMALS, start_ts, end_ts),
+    ).fetchall()
+
+    overall: Dict[float, int] = {}
+    per_hour: Dict[str, Dict[str, Dict[float, int]]] = {}
+    per_mode: Dict[str, Dict[float, int]] = {}
+    for hour, mode, step, n in rows:
+        for counts in (
+            overall,
+            per_hour.setdefault(hour, {}).setdefault(mode, {}),
+            per_mode.setdefault(mode, {}),
+        ):
+            counts[step] = counts.get(step, 0) + n
+
+    limits = (overrun, stall)
+    return {
+        "interval": interval,
+        "overrun_threshold": overrun,
+        "stall_threshold": stall,
+        "overall": _summarize_deltas(overall, *limits),
+        "hours": [
+            dict(
+                _summarize_deltas(_sum_histograms(modes.values()), *limits),
+                hour=hour,
+                modes={m: _summarize_deltas(c, *limits) for m, c in modes.items()},
+            )
+            for hour, modes in sorted(per_hour.items())
+        ],
+        "modes": {
+            m: _summarize_deltas(c, *limits) for m, c in sorted(per_mode.items())
+        },
+    }
+
+
+def _summarize_deltas(
+    counts: Dict[float, int], overrun: float, stall: float
+) -> Dict[str, Any]:
+    """Nearest-rank percentiles and overrun counts of one group's deltas."""
+    stalls = sum(n for step, n in counts.items() if step > stall)
+    steps = sorted((step, n) for step, n in counts.items() if step <= stall)
+    total = sum(n for _, n in steps)
+    stats: Dict[str, Any] = {
+        "count": total,
+        "overruns": sum(n for step, n in steps if step > overrun),
+        "stalls": stalls,
+        "max": steps[-1][0] if steps else None,
+    }
+    for p in CADENCE_PERCENTILES:
+        stats[f"p{p}"] = None
+        rank = math.ceil(p / 100.0 * total)
+        seen = 0
+        for step, n in steps:
+            seen += n
+            if seen >= rank:
+                stats[f"p{p}"] = step
+                break
+    return stats
+
+
+def query_correlation(
+    x: str,
+    y: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bins: int = 50,
+    x_scale: str = "linear",
+    y_scale: str = "linear",
+) -> Dict[str, Any]:
+    """
+    Bin a pair of metrics into a 2D histogram for scatter/heat views.
+
+    Rows where both metrics are set (and positive on a log axis) are
+    read in chunks of CORRELATION_CHUNK_ROWS and binned with NumPy when
+    it is available, so memory stays flat over long ranges. Only the
+    non-empty bins are returned.
+
+    Args:
+        x: Numeric metric for the x axis
+        y: Numeric metric for the y axis
+        start: ISO timestamp for start of range (default: 24h ago)
+        end: ISO timestamp for end of range (default: now)
+        bins: Number of bins per axis
+        x_scale: "linear" or "log" bin spacing on the x axis
+        y_scale: "linear" or "log" bin spacing on the y axis
+
+    Returns:
+        Dict with per-axis {"metric", "scale", "edges"}, "bins" as
+        [x_index, y_index, count] triples and the total "count"
+    """
+    if not charts_service.DATABASE_PATH.exists():
+        return {"bins": [], "error": "Database not found"}
+
+    for metric in (x, y):
+        if metric not in AVAILABLE_METRICS or metric in NON_NUMERIC_METRICS:
+            return {"bins": [], "error": f"Invalid metric: {metric}"}
+    for scale in (x_scale, y_scale):
+        if scale not in AXIS_SCALES:
+            return {"bins": [], "error": f"Unknown scale: {scale}"}
+
+    try:
+        start_ts, end_ts = charts_service.resolve_range(start, end)
+    except ValueError:
+        return {"bins": [], "error": "Invalid time range"}
+
+    start_ts, end_ts = charts_service.normalize_range(start_ts, end_ts)
+
+    conn = charts_service.get_db_connection()
+    version = chart_cache.version_for_range(
+        chart_cache.get_data_version(conn, charts_service.DATABASE_PATH), end_ts
+    )
+    key = ("correlation", start_ts, end_ts, x, y, bins, x_scale, y_scale)
+
+    result = _cache.get(key, version)
+    if result is None:
+        result = _compute_correlation(
+            conn, start_ts, end_ts, (x, x_scale), (y, y_scale), bins
+        )
+        _cache.set(key, version, result)
+    return result
+
+
+def _compute_correlation(
+    conn: sqlite3.Connection,
+    start_ts: float,
+    end_ts: float,
+    x_axis: tuple,
+    y_axis: tuple,
+    bins: int,
+) -> Dict[str, Any]:
+    """Find the axis bounds, then bin every matching row."""
+    x_col, y_col = AVAILABLE_METRICS[x_axis[0]], AVAILABLE_METRICS[y_axis[0]]
+    conditions = [f"{x_col} IS NOT NULL", f"{y_col} IS NOT NULL"]
+    for col, (_, scale) in ((x_col, x_axis), (y_col, y_axis)):
+        if scale == "log":
+            conditions.append(f"{col} > 0")
+    where = " AND ".join(["unix_timestamp >= ? AND unix_timestamp <= ?"] + conditions)
+
+    bounds = conn.execute(
+        f"""
+        SELECT COUNT(*), MIN({x_col}), MAX({x_col}), MIN({y_col}), MAX({y_col})
+        FROM captures
+        WHERE {where}
+    """,
+        (start_ts, end_ts),
+    ).fetchone()
+    count = bounds[0]
+
+    axes = []
+    for (metric, scale), low, high in (
+        (x_axis, bounds[1], bounds[2]),
+        (y_axis, bounds[3], bounds[4]),
+    ):
+        if count and scale == "log":
+            low, high = math.log10(low), math.log10(high)
+        axes.append((metric, scale, low, high))
+
+    result: Dict[str, Any] = {
+        "x": _axis_info(axes[0], bins, count),
+        "y": _axis_info(axes[1], bins, count),
+        "bins": [],
+        "count": count,
+    }
+    if not count:
+        return result
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"SELECT {x_col}, {y_col} FROM captures WHERE {where}", (start_ts, end_ts)
+    )
+    binner = _bin_chunk_numpy if np is not None else _bin_chunk_python
+    totals: Dict[int, int] = {}
+    while True:
+        rows = cursor.fetchmany(CORRELATION_CHUNK_ROWS)
+        if not rows:
+            break
+        for cell, n in binner(rows, axes, bins):
+            totals[cell] = totals.get(cell, 0) + n
+    cursor.close()
+
+    result["bins"] = [
+        [cell // bins, cell % bins, n] for cell, n in sorted(totals.items())
+    ]
+    return result
+
+
+def _axis_info(axis: tuple, bins: int, count: int) -> Dict[str, Any]:
+    """Describe an axis and its bin edges in metric units."""
+    metric, scale, low, high = axis
+    info: Dict[str, Any] = {"metric": metric, "scale": scale, "edges": []}
+    if count:
+        width = _axis_width(low, high, bins)
+        edges = [low + width * i for i in range(bins + 1)]
+        info["edges"] = [10**e for e in edges] if scale == "log" else edges
+    return info
+
+
+def _axis_width(low: float, high: float, bins: int) -> float:
+    """Width of one bin in (possibly log-transformed) axis units."""
+    return (high - low) / bins or 1.0
+
+
+def _bin_chunk_numpy(rows: List[tuple], axes: List[tuple], bins: int):
+    """Bin one chunk of (x, y) rows with NumPy; yields (cell, count)."""
+    values = np.array(rows, dtype=np.float64)
+    cells = np.zeros(len(values), dtype=np.int64)
+    for i, (_, scale, low, high) in enumerate(axes):
+        column = values[:, i]
+        if scale == "log":
+            column = np.log10(column)
+        index = np.floor((column - low) / _axis_width(low, high, bins))
+        index = np.clip(index, 0, bins - 1).astype(np.int64)
+        cells = cells * bins + index
+    counts = np.bincount(cells, minlength=bins * bins)
+    nonzero = np.flatnonzero(counts)
+    return zip(nonzero.tolist(), counts[nonzero].tolist())
+
+
+def _bin_chunk_python(rows: List[tuple], axes: List[tuple], bins: int):
+    """Pure-Python fallback for _bin_chunk_numpy."""
+    transforms = []
+    for _, scale, low, high in axes:
+        transforms.append(
+            (math.log10 if scale == "log" else float, low, _axis_width(low, high, bins))
+        )
+
+    counts: Dict[int, int] = {}
+    for row in rows:
+        cell = 0
+        for value, (transform, low, width) in zip(row, transforms):
+            index = math.floor((transform(value) - low) / width)
+            cell = cell * bins + min(max(index, 0), bins - 1)
+        counts[cell] = counts.get(cell, 0) + 1
+    return counts.items()
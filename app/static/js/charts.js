@@ -6,8 +6,16 @@
 // Global state
 const ChartsApp = {
     charts: {},
+    deltaState: {},
+    modeZones: [],
+    gaps: [],
     currentRange: '24h',
     autoRefreshInterval: null,
+    liveSource: null,
+    batchController: null,
+    cadenceUpdatedAt: 0,
+    // Lets the server cancel SQL for requests this page has superseded
+    pageId: Math.random().toString(36).slice(2),
     isLoading: false
 };
 
@@ -25,8 +33,16 @@ const CHART_COLORS = {
         wind: '#22c55e',
         cpu_temp: '#f97316',
         load: '#a855f7',
+        cadence_p50: '#14b8a6',
+        cadence_p95: '#f43f5e',
+        overruns: 'rgba(244, 63, 94, 0.25)',
         grid: '#e5e7eb',
-        text: '#374151'
+        text: '#374151',
+        modes: {
+            night: 'rgba(79, 70, 229, 0.08)',
+            transition: 'rgba(245, 158, 11, 0.08)'
+        },
+        gaps: 'rgba(239, 68, 68, 0.12)'
     },
     dark: {
         lux: '#fbbf24',
@@ -40,8 +56,55 @@ const CHART_COLORS = {
         wind: '#4ade80',
         cpu_temp: '#fb923c',
         load: '#c084fc',
+        cadence_p50: '#2dd4bf',
+        cadence_p95: '#fb7185',
+        overruns: 'rgba(251, 113, 133, 0.3)',
         grid: '#374151',
-        text: '#9ca3af'
+        text: '#9ca3af',
+        modes: {
+            night: 'rgba(129, 140, 248, 0.10)',
+            transition: 'rgba(251, 191, 36, 0.08)'
+        },
+        gaps: 'rgba(248, 113, 113, 0.15)'
+    }
+};
+
+// Panels loaded with one /charts/api/batch request
+const CHART_PANELS = {
+    light: ['lux', 'sun_elevation'],
+    brightness: ['brightness_mean', 'brightness_p5', 'brightness_p95'],
+    exposure: ['exposure_time_us', 'analogue_gain'],
+    weather: ['weather_temperature', 'weather_humidity', 'weather_wind_speed'],
+    system: ['system_cpu_temp', 'system_load_1min']
+};
+
+/**
+ * Chart.js plugin shading the background by capture mode and capture gaps
+ */
+const modeShadingPlugin = {
+    id: 'modeShading',
+    beforeDatasetsDraw(chart) {
+        const xScale = chart.scales.x;
+        if (!xScale) return;
+
+        const { ctx, chartArea } = chart;
+        const colors = getThemeColors();
+        const shade = (start, end, fill) => {
+            const left = Math.max(xScale.getPixelForValue(new Date(start).getTime()), chartArea.left);
+            const right = Math.min(xScale.getPixelForValue(new Date(end).getTime()), chartArea.right);
+            if (right > left) {
+                ctx.fillStyle = fill;
+                ctx.fillRect(left, chartArea.top, right - left, chartArea.bottom - chartArea.top);
+            }
+        };
+
+        ctx.save();
+        (ChartsApp.modeZones || []).forEach(zone => {
+            const fill = colors.modes[zone.mode];
+            if (fill) shade(zone.start, zone.end, fill);
+        });
+        (ChartsApp.gaps || []).forEach(gap => shade(gap.start, gap.end, colors.gaps));
+        ctx.restore();
     }
 };
 
@@ -165,14 +228,94 @@ function getTimeRange(preset) {
 }
 
 /**
- * Fetch chart data from API
+ * Fetch all chart panels and mode zones in one request
+ */
+async function fetchChartBatch(start, end, signal) {
+    const panels = Object.entries(CHART_PANELS).map(([id, metrics]) => ({
+        id: id,
+        metrics: metrics,
+        downsample: 500
+    }));
+
+    const response = await fetch('/charts/api/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            start: start,
+            end: end,
+            panels: panels,
+            modes: true,
+            format: 'binary',
+            ts: 'epoch_ms',
+            page: ChartsApp.pageId
+        }),
+        signal: signal
+    });
+    if (!response.ok) {
+        throw new Error('Failed to fetch data');
+    }
+
+    // Errors still come back as JSON
+    const contentType = response.headers.get('Content-Type') || '';
+    if (contentType.startsWith('application/json')) {
+        return response.json();
+    }
+    return decodeChartBinary(await response.arrayBuffer());
+}
+
+/**
+ * Decode a binary chart payload (layout in app/services/chart_binary.py)
+ *
+ * Timestamps (epoch ms) and numeric metrics become typed-array views on
+ * the response buffer; nulls are NaN. Typed arrays use the host byte
+ * order, which is little-endian on every browser we target.
+ */
+function decodeChartBinary(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'RLCB' || view.getUint16(4, true) !== 1) {
+        throw new Error('Unsupported chart data format');
+    }
+
+    const headerLength = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLength)));
+    let offset = 12 + headerLength;
+
+    const series = header.series.map(meta => {
+        const count = meta.count;
+        const timestamps = new Float64Array(buffer, offset, count);
+        offset += count * 8;
+
+        const data = Object.assign({}, meta.text);
+        meta.metrics.forEach(metric => {
+            // Skip the validity bitmap: null values are already NaN
+            offset += Math.ceil(Math.ceil(count / 8) / 4) * 4;
+            data[metric] = new Float32Array(buffer, offset, count);
+            offset += count * 4;
+        });
+        offset = Math.ceil(offset / 8) * 8;
+
+        return Object.assign({}, meta, { timestamps: timestamps, data: data });
+    });
+
+    const result = Object.assign({}, header);
+    delete result.series;
+    if (series.length === 1 && series[0].id === undefined) {
+        return Object.assign(result, series[0]);
+    }
+    result.panels = {};
+    series.forEach(s => { result.panels[s.id] = s; });
+    return result;
+}
+
+/**
+ * Fetch rows appended after a cursor from API
  */
-async function fetchChartData(metrics, start, end) {
+async function fetchChartDelta(metrics, cursor) {
     const params = new URLSearchParams({
         metrics: metrics.join(','),
-        start: start,
-        end: end,
-        downsample: '500'
+        cursor: cursor,
+        ts: 'epoch_ms'
     });
 
     const response = await fetch(`/charts/api/data?${params}`);
@@ -182,6 +325,33 @@ async function fetchChartData(metrics, start, end) {
     return response.json();
 }
 
+/**
+ * Fetch stretches where capturing stalled (empty if no interval is configured)
+ */
+async function fetchCaptureGaps(start, end) {
+    const params = new URLSearchParams({ start: start, end: end });
+
+    const response = await fetch(`/charts/api/gaps?${params}`);
+    if (!response.ok) {
+        return [];
+    }
+    const data = await response.json();
+    return data.gaps || [];
+}
+
+/**
+ * Fetch capture cadence (delta percentiles per hour and mode)
+ */
+async function fetchCaptureCadence(start, end) {
+    const params = new URLSearchParams({ start: start, end: end });
+
+    const response = await fetch(`/charts/api/cadence?${params}`);
+    if (!response.ok) {
+        return null;
+    }
+    return await response.json();
+}
+
 /**
  * Convert API data to Chart.js format
  */
@@ -190,12 +360,84 @@ function formatChartData(apiData, metric) {
         return [];
     }
 
+    // Binary payloads: epoch-ms typed arrays with NaN for nulls
+    if (ArrayBuffer.isView(apiData.timestamps)) {
+        const timestamps = apiData.timestamps;
+        const values = apiData.data[metric];
+        const points = [];
+        for (let i = 0; i < timestamps.length; i++) {
+            if (!Number.isNaN(values[i])) {
+                points.push({ x: timestamps[i], y: values[i] });
+            }
+        }
+        return points;
+    }
+
+    // Epoch-ms numbers (ts=epoch_ms) are used as-is; ISO strings are parsed
     return apiData.timestamps.map((ts, i) => ({
-        x: new Date(ts),
+        x: typeof ts === 'number' ? ts : new Date(ts),
         y: apiData.data[metric][i]
     })).filter(point => point.y !== null);
 }
 
+/**
+ * Remember which metrics a chart shows so auto-refresh can fetch deltas
+ */
+function rememberChartState(chartKey, datasetMetrics, data) {
+    ChartsApp.deltaState[chartKey] = {
+        metrics: CHART_PANELS[chartKey],
+        datasetMetrics: datasetMetrics,
+        cursor: data.cursor
+    };
+}
+
+/**
+ * Append rows added since the last load to a chart
+ *
+ * Returns false when the chart needs a full reload instead.
+ */
+async function refreshChartDelta(chartKey, range) {
+    const state = ChartsApp.deltaState[chartKey];
+    if (!ChartsApp.charts[chartKey] || !state || state.cursor === undefined) return false;
+
+    const delta = await fetchChartDelta(state.metrics, state.cursor);
+    if (delta.error || delta.truncated) return false;
+
+    applyChartDelta(chartKey, delta, range);
+    return true;
+}
+
+/**
+ * Append the rows of a delta response to a chart and slide its window
+ */
+function applyChartDelta(chartKey, delta, range) {
+    const chart = ChartsApp.charts[chartKey];
+    const state = ChartsApp.deltaState[chartKey];
+    if (!chart || !state) return;
+
+    const rangeStart = new Date(range.start);
+    const rangeEnd = new Date(range.end);
+
+    state.datasetMetrics.forEach((metric, i) => {
+        const points = chart.data.datasets[i].data;
+        const last = points.length ? points[points.length - 1].x : null;
+
+        formatChartData(delta, metric).forEach(point => {
+            if ((!last || point.x > last) && point.x <= rangeEnd) {
+                points.push(point);
+            }
+        });
+
+        // Slide the window: drop points that fell out of the range
+        let drop = 0;
+        while (drop < points.length && points[drop].x < rangeStart) drop++;
+        if (drop) points.splice(0, drop);
+    });
+
+    state.cursor = delta.cursor;
+    chart.update('none');
+}
+
 /**
  * Show/hide loading indicator
  */
@@ -209,16 +451,13 @@ function setLoading(chartId, loading) {
 /**
  * Create Light Levels chart
  */
-async function createLightChart(start, end) {
+function createLightChart(data) {
     const ctx = document.getElementById('lightChart');
-    if (!ctx) return;
+    if (!ctx || !data) return;
 
-    setLoading('light', true);
     const colors = getThemeColors();
 
     try {
-        const data = await fetchChartData(['lux', 'sun_elevation'], start, end);
-
         if (ChartsApp.charts.light) {
             ChartsApp.charts.light.destroy();
         }
@@ -245,27 +484,23 @@ async function createLightChart(start, end) {
             options: options
         });
 
+        rememberChartState('light', ['lux'], data);
         updatePointInfo(data);
     } catch (error) {
         console.error('Error creating light chart:', error);
-    } finally {
-        setLoading('light', false);
     }
 }
 
 /**
  * Create Brightness chart with P5-P95 band
  */
-async function createBrightnessChart(start, end) {
+function createBrightnessChart(data) {
     const ctx = document.getElementById('brightnessChart');
-    if (!ctx) return;
+    if (!ctx || !data) return;
 
-    setLoading('brightness', true);
     const colors = getThemeColors();
 
     try {
-        const data = await fetchChartData(['brightness_mean', 'brightness_p5', 'brightness_p95'], start, end);
-
         if (ChartsApp.charts.brightness) {
             ChartsApp.charts.brightness.destroy();
         }
@@ -312,26 +547,23 @@ async function createBrightnessChart(start, end) {
             },
             options: options
         });
+
+        rememberChartState('brightness', ['brightness_p95', 'brightness_p5', 'brightness_mean'], data);
     } catch (error) {
         console.error('Error creating brightness chart:', error);
-    } finally {
-        setLoading('brightness', false);
     }
 }
 
 /**
  * Create Exposure & Gain chart with dual axis
  */
-async function createExposureChart(start, end) {
+function createExposureChart(data) {
     const ctx = document.getElementById('exposureChart');
-    if (!ctx) return;
+    if (!ctx || !data) return;
 
-    setLoading('exposure', true);
     const colors = getThemeColors();
 
     try {
-        const data = await fetchChartData(['exposure_time_us', 'analogue_gain'], start, end);
-
         if (ChartsApp.charts.exposure) {
             ChartsApp.charts.exposure.destroy();
         }
@@ -378,26 +610,23 @@ async function createExposureChart(start, end) {
             },
             options: options
         });
+
+        rememberChartState('exposure', ['exposure_time_us', 'analogue_gain'], data);
     } catch (error) {
         console.error('Error creating exposure chart:', error);
-    } finally {
-        setLoading('exposure', false);
     }
 }
 
 /**
  * Create Weather chart with multi-axis
  */
-async function createWeatherChart(start, end) {
+function createWeatherChart(data) {
     const ctx = document.getElementById('weatherChart');
-    if (!ctx) return;
+    if (!ctx || !data) return;
 
-    setLoading('weather', true);
     const colors = getThemeColors();
 
     try {
-        const data = await fetchChartData(['weather_temperature', 'weather_humidity', 'weather_wind_speed'], start, end);
-
         if (ChartsApp.charts.weather) {
             ChartsApp.charts.weather.destroy();
         }
@@ -455,26 +684,23 @@ async function createWeatherChart(start, end) {
             },
             options: options
         });
+
+        rememberChartState('weather', ['weather_temperature', 'weather_humidity', 'weather_wind_speed'], data);
     } catch (error) {
         console.error('Error creating weather chart:', error);
-    } finally {
-        setLoading('weather', false);
     }
 }
 
 /**
  * Create System Metrics chart
  */
-async function createSystemChart(start, end) {
+function createSystemChart(data) {
     const ctx = document.getElementById('systemChart');
-    if (!ctx) return;
+    if (!ctx || !data) return;
 
-    setLoading('system', true);
     const colors = getThemeColors();
 
     try {
-        const data = await fetchChartData(['system_cpu_temp', 'system_load_1min'], start, end);
-
         if (ChartsApp.charts.system) {
             ChartsApp.charts.system.destroy();
         }
@@ -521,10 +747,100 @@ async function createSystemChart(start, end) {
             },
             options: options
         });
+
+        rememberChartState('system', ['system_cpu_temp', 'system_load_1min'], data);
     } catch (error) {
         console.error('Error creating system chart:', error);
-    } finally {
-        setLoading('system', false);
+    }
+}
+
+/**
+ * Create Capture Cadence chart: hourly delta percentiles and overruns
+ */
+function createCadenceChart(data) {
+    const ctx = document.getElementById('cadenceChart');
+    const summaryEl = document.getElementById('cadenceSummary');
+    if (!ctx) return;
+
+    if (summaryEl) {
+        summaryEl.textContent = data && !data.error
+            ? Object.entries(data.modes || {})
+                .map(([mode, s]) => `${mode}: p95 ${s.p95 ?? '-'}s, ${s.overruns} overrun`)
+                .join(' | ')
+            : 'Capture interval not configured';
+    }
+    if (!data || data.error) return;
+
+    const colors = getThemeColors();
+    const hourly = (metric) => data.hours.map(h => ({ x: new Date(h.hour).getTime(), y: h[metric] }));
+
+    try {
+        if (ChartsApp.charts.cadence) {
+            ChartsApp.charts.cadence.destroy();
+        }
+
+        const options = getCommonOptions('Capture Cadence');
+        options.scales.y.position = 'left';
+        options.scales.y.title = { display: true, text: 'Seconds between captures', color: colors.text };
+        options.scales.y1 = {
+            type: 'linear',
+            position: 'right',
+            title: { display: true, text: 'Overruns', color: colors.text },
+            grid: { drawOnChartArea: false },
+            ticks: { color: colors.text, precision: 0 },
+            min: 0
+        };
+
+        ChartsApp.charts.cadence = new Chart(ctx, {
+            type: 'line',
+            data: {
+                datasets: [
+                    {
+                        label: 'P50',
+                        data: hourly('p50'),
+                        borderColor: colors.cadence_p50,
+                        backgroundColor: 'transparent',
+                        borderWidth: 2,
+                        pointRadius: 0,
+                        tension: 0.1,
+                        yAxisID: 'y'
+                    },
+                    {
+                        label: 'P95',
+                        data: hourly('p95'),
+                        borderColor: colors.cadence_p95,
+                        backgroundColor: 'transparent',
+                        borderWidth: 2,
+                        pointRadius: 0,
+                        tension: 0.1,
+                        yAxisID: 'y'
+                    },
+                    {
+                        label: `Interval (${data.interval}s)`,
+                        data: data.hours.length ? [
+                            { x: new Date(data.hours[0].hour).getTime(), y: data.interval },
+                            { x: new Date(data.hours[data.hours.length - 1].hour).getTime(), y: data.interval }
+                        ] : [],
+                        borderColor: colors.text,
+                        borderDash: [4, 4],
+                        borderWidth: 1,
+                        pointRadius: 0,
+                        fill: false,
+                        yAxisID: 'y'
+                    },
+                    {
+                        type: 'bar',
+                        label: 'Overruns',
+                        data: hourly('overruns'),
+                        backgroundColor: colors.overruns,
+                        yAxisID: 'y1'
+                    }
+                ]
+            },
+            options: options
+        });
+    } catch (error) {
+        console.error('Error creating cadence chart:', error);
     }
 }
 
@@ -534,43 +850,77 @@ async function createSystemChart(start, end) {
 function updatePointInfo(data) {
     const infoEl = document.getElementById('pointInfo');
     if (infoEl && data) {
-        infoEl.textContent = `Showing ${data.point_count || 0} points (downsampled from ${data.original_count || 0})`;
+        infoEl.textContent = `Showing ${data.point_count || 0} points (downsampled from ${data.original_count || 0})`
+            + (data.partial ? ' - partial, query took too long' : '');
     }
 }
 
 /**
- * Update all charts
+ * Get the selected time range (custom inputs take precedence over preset)
  */
-async function updateAllCharts() {
-    if (ChartsApp.isLoading) return;
-    ChartsApp.isLoading = true;
-
+function getCurrentRange() {
     const range = getTimeRange(ChartsApp.currentRange);
 
     // Check for custom range
     const startInput = document.getElementById('startDate');
     const endInput = document.getElementById('endDate');
 
-    let start = range.start;
-    let end = range.end;
-
     if (startInput?.value && endInput?.value) {
-        start = new Date(startInput.value).toISOString();
-        end = new Date(endInput.value).toISOString();
+        return {
+            start: new Date(startInput.value).toISOString(),
+            end: new Date(endInput.value).toISOString()
+        };
     }
+    return range;
+}
+
+/**
+ * Update all charts
+ */
+async function updateAllCharts() {
+    // A newer range wins: drop the response of the one still loading
+    if (ChartsApp.batchController) ChartsApp.batchController.abort();
+    const controller = new AbortController();
+    ChartsApp.batchController = controller;
+    ChartsApp.isLoading = true;
+
+    const { start, end } = getCurrentRange();
+    const creators = {
+        light: createLightChart,
+        brightness: createBrightnessChart,
+        exposure: createExposureChart,
+        weather: createWeatherChart,
+        system: createSystemChart
+    };
+
+    Object.keys(creators).forEach(key => setLoading(key, true));
+    setLoading('cadence', true);
 
     try {
-        await Promise.all([
-            createLightChart(start, end),
-            createBrightnessChart(start, end),
-            createExposureChart(start, end),
-            createWeatherChart(start, end),
-            createSystemChart(start, end)
+        const [batch, gaps, cadence] = await Promise.all([
+            fetchChartBatch(start, end, controller.signal),
+            fetchCaptureGaps(start, end).catch(() => []),
+            fetchCaptureCadence(start, end).catch(() => null)
         ]);
+        ChartsApp.modeZones = batch.zones || [];
+        ChartsApp.gaps = gaps;
+        createCadenceChart(cadence);
+        ChartsApp.cadenceUpdatedAt = Date.now();
+
+        Object.entries(creators).forEach(([key, create]) => {
+            const data = batch.panels?.[key];
+            if (data) data.cursor = batch.cursor;
+            create(data);
+        });
     } catch (error) {
-        console.error('Error updating charts:', error);
+        if (error.name !== 'AbortError') console.error('Error updating charts:', error);
     } finally {
-        ChartsApp.isLoading = false;
+        if (ChartsApp.batchController === controller) {
+            ChartsApp.batchController = null;
+            Object.keys(creators).forEach(key => setLoading(key, false));
+            setLoading('cadence', false);
+            ChartsApp.isLoading = false;
+        }
     }
 }
 
@@ -623,15 +973,115 @@ function handleApplyRange() {
     }
 }
 
+/**
+ * Auto-refresh: append new rows to each chart, reloading only if needed
+ */
+async function refreshAllCharts() {
+    if (ChartsApp.isLoading) return;
+    ChartsApp.isLoading = true;
+
+    let needsReload = false;
+    try {
+        const range = getCurrentRange();
+        // Only charts with delta state follow captures; cadence is redrawn whole
+        const results = await Promise.all(
+            Object.keys(ChartsApp.deltaState).map(key => refreshChartDelta(key, range))
+        );
+        needsReload = results.length === 0 || results.includes(false);
+        if (!needsReload) refreshCadence(range);
+    } catch (error) {
+        console.error('Error refreshing charts:', error);
+        needsReload = true;
+    } finally {
+        ChartsApp.isLoading = false;
+    }
+
+    if (needsReload) {
+        await updateAllCharts();
+    }
+}
+
+/**
+ * Redraw the cadence panel for a range (it has no delta updates)
+ */
+async function refreshCadence(range) {
+    ChartsApp.cadenceUpdatedAt = Date.now();
+    try {
+        createCadenceChart(await fetchCaptureCadence(range.start, range.end));
+    } catch (error) {
+        console.error('Error refreshing cadence:', error);
+    }
+}
+
+/**
+ * Follow new captures over /charts/api/live (Server-Sent Events)
+ *
+ * Falls back to polling every 60 s when the browser lacks EventSource or
+ * the server has no stream slot free.
+ */
+function startLiveUpdates() {
+    const states = Object.values(ChartsApp.deltaState).filter(s => s.cursor !== undefined);
+    if (!window.EventSource || !states.length) {
+        startPolling();
+        return;
+    }
+
+    const metrics = [...new Set(states.flatMap(s => s.metrics))];
+    const params = new URLSearchParams({
+        metrics: metrics.join(','),
+        cursor: Math.min(...states.map(s => s.cursor)),
+        ts: 'epoch_ms'
+    });
+
+    const source = new EventSource(`/charts/api/live?${params}`);
+    ChartsApp.liveSource = source;
+
+    source.addEventListener('captures', event => {
+        if (ChartsApp.isLoading) return;
+        const delta = JSON.parse(event.data);
+        const range = getCurrentRange();
+        Object.keys(ChartsApp.deltaState).forEach(key => applyChartDelta(key, delta, range));
+        if (Date.now() - ChartsApp.cadenceUpdatedAt >= 60000) refreshCadence(range);
+    });
+    source.addEventListener('reload', () => updateAllCharts());
+    source.addEventListener('error', () => {
+        // CLOSED means the server refused the stream; otherwise it reconnects
+        if (source.readyState === EventSource.CLOSED && ChartsApp.liveSource === source) {
+            ChartsApp.liveSource = null;
+            startPolling();
+        }
+    });
+}
+
+/**
+ * Poll for new captures every 60 s
+ */
+function startPolling() {
+    if (!ChartsApp.autoRefreshInterval) {
+        ChartsApp.autoRefreshInterval = setInterval(refreshAllCharts, 60000);
+    }
+}
+
+/**
+ * Stop live updates and polling
+ */
+function stopLiveUpdates() {
+    if (ChartsApp.liveSource) {
+        ChartsApp.liveSource.close();
+        ChartsApp.liveSource = null;
+    }
+    clearInterval(ChartsApp.autoRefreshInterval);
+    ChartsApp.autoRefreshInterval = null;
+}
+
 /**
  * Handle auto-refresh toggle
  */
 function handleAutoRefresh(event) {
     if (event.target.checked) {
-        ChartsApp.autoRefreshInterval = setInterval(updateAllCharts, 60000);
+        startLiveUpdates();
     } else {
-        clearInterval(ChartsApp.autoRefreshInterval);
-        ChartsApp.autoRefreshInterval = null;
+        stopLiveUpdates();
     }
 }
 
@@ -666,6 +1116,8 @@ function handleThemeChange() {
  * Initialize charts
  */
 function initializeCharts() {
+    Chart.register(modeShadingPlugin);
+
     // Set up event listeners
     document.querySelectorAll('.preset-btn[data-range]').forEach(btn => {
         btn.addEventListener('click', handlePresetClick);
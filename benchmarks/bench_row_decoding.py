@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Benchmark chart row decoding: sqlite3.Row + lists vs. decoded columns.
+
+Builds a synthetic captures database, then runs each decoder in a fresh
+subprocess so peak RSS is measured per variant. Reports time per 100k
+rows, peak RSS (ru_maxrss) and the tracemalloc peak of the decode step.
+
+Usage:
+    python benchmarks/bench_row_decoding.py [--rows 200000] [--repeat 3] [--no-numpy]
+"""
+
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import charts_service  # noqa: E402
+
+METRICS = ["lux", "brightness_mean", "exposure_time_us", "weather_temperature"]
+
+
+def build_database(path: Path, rows: int) -> None:
+    """Create a captures table with one row every 30 seconds."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE captures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            unix_timestamp REAL NOT NULL,
+            mode TEXT,
+            lux REAL,
+            brightness_mean REAL,
+            exposure_time_us INTEGER,
+            weather_temperature REAL
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX idx_captures_unix_timestamp_mode ON captures (unix_timestamp, mode)"
+    )
+    start = 1_700_000_000.0
+    conn.executemany(
+        "INSERT INTO captures (timestamp, unix_timestamp, mode, lux, brightness_mean, "
+        "exposure_time_us, weather_temperature) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                "",
+                start + 30 * i,
+                "day" if (i // 1440) % 2 else "night",
+                None if i % 50 == 0 else float(i % 10000),
+                128.0 + i % 64,
+                1000 + i % 20000,
+                None if i % 7 == 0 else 10.0 + (i % 300) / 10,
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def decode_rows(conn):
+    """The previous hot path: fetchall of sqlite3.Row, then one list per metric."""
+    conn.row_factory = sqlite3.Row
+    columns_str = ", ".join(["unix_timestamp", "timestamp"] + METRICS)
+    rows = conn.execute(
+        f"SELECT {columns_str} FROM captures "
+        "WHERE unix_timestamp >= ? AND unix_timestamp <= ? ORDER BY unix_timestamp ASC",
+        (0, 2e9),
+    ).fetchall()
+    timestamps = [row["unix_timestamp"] for row in rows]
+    data = {m: [row[m] for row in rows] for m in METRICS}
+    return timestamps, data
+
+
+def decode_columns(conn):
+    """The current hot path."""
+    conn.row_factory = sqlite3.Row
+    return charts_service._read_columns(conn, 0, 2e9, METRICS)
+
+
+def run_variant(db_path: str, variant: str, repeat: int) -> dict:
+    """Time one decoder (called in a subprocess)."""
+    decoder = decode_rows if variant == "rows" else decode_columns
+    conn = sqlite3.connect(db_path)
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        timestamps, data = decoder(conn)
+        charts_service.downsample_data(timestamps, data, 500)
+        best = min(best, time.perf_counter() - started)
+        count = len(timestamps)
+        del timestamps, data
+
+    tracemalloc.start()
+    timestamps, data = decoder(conn)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "variant": variant,
+        "rows": count,
+        "seconds_per_100k": best * 100_000 / count,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "decode_peak_mib": traced_peak / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--no-numpy", action="store_true", help="use the array('d') fallback"
+    )
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.no_numpy:
+        charts_service.np = None
+
+    if args.variant:
+        print(json.dumps(run_variant(args.db, args.variant, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        build_database(db_path, args.rows)
+
+        print(f"{args.rows} rows, NumPy {'on' if charts_service.np else 'off'}")
+        print(
+            f"{'decoder':<10}{'s/100k rows':>14}{'peak RSS MiB':>15}{'decode MiB':>13}"
+        )
+        for variant in ("rows", "columns"):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--variant",
+                    variant,
+                    "--db",
+                    str(db_path),
+                    "--repeat",
+                    str(args.repeat),
+                ]
+                + (["--no-numpy"] if args.no_numpy else []),
+                check=True,
+                capture_output=True,
+                text=True,
+                env=dict(os.environ),
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{variant:<10}{result['seconds_per_100k']:>14.3f}"
+                f"{result['peak_rss_mib']:>15.1f}{result['decode_peak_mib']:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
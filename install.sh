@@ -11,6 +11,10 @@ cd /home/pi/dashboard-raspilapse
 echo "Creating logs directory..."
 mkdir -p logs
 
+# NumPy wheels for the Pi link against OpenBLAS
+echo "Installing system libraries..."
+sudo apt-get install -y libopenblas0
+
 # Create virtual environment
 echo "Creating virtual environment..."
 python3 -m venv venv
@@ -19,7 +23,7 @@ python3 -m venv venv
 echo "Installing Python dependencies..."
 source venv/bin/activate
 pip install --upgrade pip
-pip install flask gunicorn pyyaml
+pip install flask gunicorn gevent numpy pyyaml
 
 # Make run.py executable
 chmod +x run.py
@@ -36,17 +40,18 @@ sudo cp apache/raspilapse-dashboard.conf /etc/apache2/sites-available/
 sudo a2dissite 000-default.conf 2>/dev/null || true
 sudo a2ensite raspilapse-dashboard.conf
 
-# Install systemd service
-echo "Installing systemd service..."
+# Install systemd services
+echo "Installing systemd services..."
 sudo cp systemd/raspilapse-dashboard.service /etc/systemd/system/
+sudo cp systemd/raspilapse-dashboard-live.service /etc/systemd/system/
 sudo systemctl daemon-reload
-sudo systemctl enable raspilapse-dashboard
+sudo systemctl enable raspilapse-dashboard raspilapse-dashboard-live
 
 echo ""
 echo "=== Installation Complete ==="
 echo ""
 echo "To start the dashboard:"
-echo "  sudo systemctl start raspilapse-dashboard"
+echo "  sudo systemctl start raspilapse-dashboard raspilapse-dashboard-live"
 echo "  sudo systemctl restart apache2"
 echo ""
 echo "Dashboard will be available at: http://$(hostname)/"
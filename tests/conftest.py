@@ -1,8 +1,12 @@
 """Pytest configuration and fixtures."""
 
 import pytest
+import sqlite3
 import tempfile
+import time
 import os
+from pathlib import Path
+from unittest.mock import patch
 
 # Add app to path
 import sys
@@ -10,6 +14,92 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from app import create_app
+from app.services import charts_service, db_pool, rollup_service
+
+# Columns of test captures tables after id, timestamp and unix_timestamp
+CAPTURE_COLUMNS = ("mode TEXT", "lux REAL", "exposure_time_us INTEGER")
+
+
+def _insert_captures(path, rows):
+    """Insert capture dicts; a "ts" datetime fills both timestamp columns."""
+    conn = sqlite3.connect(path)
+    for row in rows:
+        row = dict(row)
+        ts = row.pop("ts")
+        values = {"timestamp": ts.isoformat(), "unix_timestamp": ts.timestamp(), **row}
+        conn.execute(
+            f"INSERT INTO captures ({', '.join(values)}) "
+            f"VALUES ({', '.join('?' * len(values))})",
+            list(values.values()),
+        )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def rollup_cleanup():
+    """Wait for background rollup refreshes and remove the files they wrote."""
+    yield
+    deadline = time.monotonic() + 5
+    while rollup_service._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    db_pool.close_connections()
+    for key in list(rollup_service._last_refresh):
+        rollup_path = rollup_service.get_rollup_path(Path(key))
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{rollup_path}{suffix}").unlink(missing_ok=True)
+    rollup_service._last_refresh.clear()
+
+
+@pytest.fixture
+def insert_captures():
+    """Append capture dicts (as taken by captures_db) to a database file."""
+    return _insert_captures
+
+
+@pytest.fixture
+def captures_db(tmp_path):
+    """
+    Factory for temporary captures databases.
+
+    captures_db(rows, columns=CAPTURE_COLUMNS, indexes=None, patch_path=True)
+    creates a captures table with id, timestamp, unix_timestamp and the
+    given column definitions, inserts rows (dicts, see _insert_captures),
+    adds {name: columns} indexes, and returns the file's Path. Unless
+    patch_path is False, charts_service.DATABASE_PATH points at the file
+    for the rest of the test.
+    """
+    patches = []
+    paths = []
+
+    def make(rows=(), columns=CAPTURE_COLUMNS, indexes=None, patch_path=True):
+        path = tmp_path / f"timelapse{len(paths)}.db"
+        paths.append(path)
+        definitions = [
+            "id INTEGER PRIMARY KEY AUTOINCREMENT",
+            "timestamp TEXT NOT NULL",
+            "unix_timestamp REAL NOT NULL",
+            *columns,
+        ]
+        conn = sqlite3.connect(path)
+        conn.execute(f"CREATE TABLE captures ({', '.join(definitions)})")
+        for name, indexed in (indexes or {}).items():
+            conn.execute(f"CREATE INDEX {name} ON captures ({indexed})")
+        conn.commit()
+        conn.close()
+        _insert_captures(path, rows)
+
+        if patch_path:
+            patcher = patch.object(charts_service, "DATABASE_PATH", path)
+            patcher.start()
+            patches.append(patcher)
+        return path
+
+    yield make
+
+    for patcher in reversed(patches):
+        patcher.stop()
+    db_pool.close_connections()
 
 
 @pytest.fixture
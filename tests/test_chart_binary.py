@@ -0,0 +1,118 @@
+"""Test the binary columnar chart encoding."""
+
+import json
+import math
+import struct
+import os
+from array import array
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import chart_binary
+
+
+def decode(payload):
+    """Reference decoder following the layout in chart_binary's docstring."""
+    magic, version, _, header_length = struct.unpack_from("<4sHHI", payload)
+    assert magic == b"RLCB"
+    assert version == 1
+    header = json.loads(payload[12 : 12 + header_length])
+    offset = 12 + header_length
+    assert offset % 8 == 0
+
+    for series in header["series"]:
+        count = series["count"]
+        timestamps = array("d", payload[offset : offset + 8 * count])
+        offset += 8 * count
+        data = dict(series["text"])
+        for metric in series["metrics"]:
+            bitmap_length = (count + 7) // 8
+            bitmap = payload[offset : offset + bitmap_length]
+            offset += bitmap_length + (-bitmap_length % 4)
+            column = array("f", payload[offset : offset + 4 * count])
+            offset += 4 * count
+            data[metric] = [
+                column[i] if bitmap[i >> 3] & (1 << (i & 7)) else None
+                for i in range(count)
+            ]
+        offset += -offset % 8
+        series["timestamps"] = list(timestamps)
+        series["data"] = data
+
+    assert offset == len(payload)
+    return header
+
+
+class TestEncodeChartData:
+    """Test encoding single chart series."""
+
+    def test_round_trip(self):
+        """Test timestamps, values, nulls and text metrics survive encoding."""
+        result = {
+            "timestamps": [1700000000.25, 1700000060.0, 1700000120.5],
+            "data": {
+                "lux": [1.5, None, 300.0],
+                "exposure_time_us": [1000, 2000, None],
+                "mode": ["day", None, "night"],
+            },
+            "point_count": 3,
+            "original_count": 10,
+            "cursor": 42,
+        }
+
+        header = decode(chart_binary.encode_chart_data(result))
+
+        assert header["cursor"] == 42
+        assert header["original_count"] == 10
+        series = header["series"][0]
+        assert series["metrics"] == ["lux", "exposure_time_us"]
+        assert series["timestamps"] == [
+            1700000000250.0,
+            1700000060000.0,
+            1700000120500.0,
+        ]
+        assert series["data"]["lux"] == [1.5, None, 300.0]
+        assert series["data"]["exposure_time_us"] == [1000.0, 2000.0, None]
+        assert series["data"]["mode"] == ["day", None, "night"]
+
+    def test_nulls_are_nan(self):
+        """Test null slots hold NaN for decoders that skip the bitmap."""
+        payload = chart_binary.encode_chart_data(
+            {"timestamps": [1.0, 2.0], "data": {"lux": [None, 2.0]}}
+        )
+        # 16 bytes of timestamps, 4 of bitmap, 8 of values, 4 of padding
+        column = array("f", payload[-12:-4])
+        assert math.isnan(column[0])
+        assert column[1] == 2.0
+
+    def test_empty_series(self):
+        """Test an empty series encodes to a header only."""
+        header = decode(
+            chart_binary.encode_chart_data({"timestamps": [], "data": {"lux": []}})
+        )
+        assert header["series"][0]["count"] == 0
+
+
+class TestEncodeChartBatch:
+    """Test encoding batch panels."""
+
+    def test_panels_keep_ids_and_alignment(self):
+        """Test every panel block decodes at an aligned offset."""
+        result = {
+            "panels": {
+                "light": {"timestamps": [1.0, 2.0, 3.0], "data": {"lux": [1, 2, 3]}},
+                "system": {"timestamps": [1.0], "data": {"system_cpu_temp": [None]}},
+            },
+            "zones": [{"start": "a", "end": "b", "mode": "day"}],
+            "cursor": 7,
+        }
+
+        header = decode(chart_binary.encode_chart_batch(result))
+
+        assert [s["id"] for s in header["series"]] == ["light", "system"]
+        assert header["series"][0]["data"]["lux"] == [1.0, 2.0, 3.0]
+        assert header["series"][1]["data"]["system_cpu_temp"] == [None]
+        assert header["zones"] == result["zones"]
@@ -0,0 +1,184 @@
+"""Test the versioned chart result cache."""
+
+import pytest
+import sqlite3
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import chart_cache, charts_service, db_pool
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with 48 hourly captures."""
+    now = datetime.now()
+    return captures_db(
+        [
+            {"ts": now - timedelta(hours=i), "mode": "day", "lux": float(i)}
+            for i in range(48)
+        ],
+        columns=("mode TEXT", "lux REAL"),
+        patch_path=False,
+    )
+
+
+def _write(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def _append(path, ts):
+    _write(
+        path,
+        "INSERT INTO captures (timestamp, unix_timestamp, mode, lux) VALUES (?, ?, ?, ?)",
+        (ts.isoformat(), ts.timestamp(), "night", 99.0),
+    )
+
+
+class TestVersionedLRUCache:
+    """Test the LRU container."""
+
+    def test_get_returns_value_for_same_version(self):
+        """Test a value is served only under its version."""
+        cache = chart_cache.VersionedLRUCache()
+        cache.set("key", 1, "value")
+
+        assert cache.get("key", 1) == "value"
+        assert cache.get("key", 2) is None
+        # Stale entries are dropped
+        assert cache.get("key", 1) is None
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted when full."""
+        cache = chart_cache.VersionedLRUCache(max_entries=2)
+        cache.set("a", 0, 1)
+        cache.set("b", 0, 2)
+        cache.get("a", 0)
+        cache.set("c", 0, 3)
+
+        assert cache.get("a", 0) == 1
+        assert cache.get("b", 0) is None
+        assert len(cache) == 2
+
+
+class TestDataVersion:
+    """Test data version tracking."""
+
+    def test_append_grows_rowid_only(self, temp_db):
+        """Test appends move MAX(rowid) but keep the generation."""
+        conn = db_pool.get_connection(temp_db)
+        before = chart_cache.get_data_version(conn, temp_db)
+
+        _append(temp_db, datetime.now() + timedelta(minutes=1))
+        after = chart_cache.get_data_version(conn, temp_db)
+
+        assert after.max_rowid == before.max_rowid + 1
+        assert after.generation == before.generation
+
+    def test_update_bumps_generation(self, temp_db):
+        """Test in-place changes bump the generation."""
+        conn = db_pool.get_connection(temp_db)
+        before = chart_cache.get_data_version(conn, temp_db)
+
+        _write(temp_db, "UPDATE captures SET lux = 0 WHERE id = 10")
+        after = chart_cache.get_data_version(conn, temp_db)
+
+        assert after.generation == before.generation + 1
+
+    def test_closed_range_ignores_rowid(self, temp_db):
+        """Test ranges ending before the newest capture are closed."""
+        conn = db_pool.get_connection(temp_db)
+        version = chart_cache.get_data_version(conn, temp_db)
+
+        closed = chart_cache.version_for_range(version, version.newest_ts - 3600)
+        open_ended = chart_cache.version_for_range(version, version.newest_ts + 60)
+
+        assert len(closed) == 2
+        assert len(open_ended) == 3
+
+
+class TestCachedQueries:
+    """Test caching in the charts service."""
+
+    def test_repeated_query_served_from_cache(self, temp_db):
+        """Test identical queries compute once."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(
+                charts_service, "_query_raw", wraps=charts_service._query_raw
+            ) as raw:
+                first = charts_service.query_chart_data(
+                    metrics=["lux"], resolution="raw"
+                )
+                second = charts_service.query_chart_data(
+                    metrics=["lux"], resolution="raw"
+                )
+
+        assert raw.call_count == 1
+        assert first == second
+
+    def test_open_range_invalidated_by_new_capture(self, temp_db):
+        """Test an open-ended range is recomputed after an append."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            first = charts_service.query_chart_data(metrics=["lux"], resolution="raw")
+            _append(temp_db, datetime.now())
+            second = charts_service.query_chart_data(metrics=["lux"], resolution="raw")
+
+        assert second["original_count"] == first["original_count"] + 1
+        assert second["cursor"] == first["cursor"] + 1
+
+    def test_closed_range_survives_new_capture(self, temp_db):
+        """Test a historical range stays cached across appends."""
+        now = datetime.now()
+        start = (now - timedelta(hours=30)).isoformat()
+        end = (now - timedelta(hours=20)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(
+                charts_service, "_query_raw", wraps=charts_service._query_raw
+            ) as raw:
+                charts_service.query_chart_data(
+                    start=start, end=end, metrics=["lux"], resolution="raw"
+                )
+                _append(temp_db, now + timedelta(minutes=1))
+                result = charts_service.query_chart_data(
+                    start=start, end=end, metrics=["lux"], resolution="raw"
+                )
+
+        assert raw.call_count == 1
+        # The cursor still tracks the newest row
+        assert result["cursor"] == 49
+
+    def test_closed_range_invalidated_by_update(self, temp_db):
+        """Test a historical range is recomputed when old rows change."""
+        now = datetime.now()
+        start = (now - timedelta(hours=30)).isoformat()
+        end = (now - timedelta(hours=20)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            first = charts_service.query_chart_data(
+                start=start, end=end, metrics=["lux"], resolution="raw"
+            )
+            _write(temp_db, "UPDATE captures SET lux = -1")
+            second = charts_service.query_chart_data(
+                start=start, end=end, metrics=["lux"], resolution="raw"
+            )
+
+        assert set(first["data"]["lux"]) != {-1.0}
+        assert set(second["data"]["lux"]) == {-1.0}
+
+    def test_data_range_cached_until_append(self, temp_db):
+        """Test get_data_range follows appended captures."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            first = charts_service.get_data_range()
+            _append(temp_db, datetime.now() + timedelta(minutes=1))
+            second = charts_service.get_data_range()
+
+        assert second["count"] == first["count"] + 1
@@ -1,5 +1,6 @@
 """Test charts routes and API endpoints."""
 
+import json
 import pytest
 import sqlite3
 import tempfile
@@ -87,6 +88,11 @@ def temp_db_with_data():
 
     os.close(fd)
     os.unlink(path)
+    from app.services.rollup_service import get_rollup_path
+
+    rollup_path = get_rollup_path(Path(path))
+    if rollup_path.exists():
+        rollup_path.unlink()
 
 
 class TestChartsPage:
@@ -211,6 +217,475 @@ class TestChartsApiData:
         assert len(data.get("timestamps", [])) >= 0
 
 
+class TestChartsApiDataM4:
+    """Test /charts/api/data with mode=m4."""
+
+    def test_api_data_m4(self, client, temp_db_with_data):
+        """Test M4 mode returns reduced data."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/data?metrics=lux&downsample=50&mode=m4")
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["mode"] == "m4"
+        assert len(data["timestamps"]) <= 50
+
+    def test_api_data_invalid_mode(self, client):
+        """Test unknown mode is rejected."""
+        response = client.get("/charts/api/data?mode=bogus")
+        assert response.status_code == 400
+
+
+class TestChartsApiDataStream:
+    """Test /charts/api/data with stream=1."""
+
+    def test_api_data_stream(self, client, temp_db_with_data):
+        """Test streaming returns every row in the range."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/data?metrics=lux,mode&start={start}&stream=1"
+            )
+            data = json.loads(response.get_data(as_text=True))
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        assert data["columns"] == ["timestamp", "lux", "mode"]
+        assert data["count"] == 50
+        assert len(data["rows"]) == 50
+        assert data["cursor"] == 50
+
+    def test_api_data_stream_invalid_metrics(self, client, temp_db_with_data):
+        """Test stream errors come back as regular JSON."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/data?metrics=bogus&stream=1")
+
+        assert "error" in response.get_json()
+
+
+class TestChartsApiDataBinary:
+    """Test /charts/api/data and /charts/api/batch with format=binary."""
+
+    def test_api_data_binary(self, client, temp_db_with_data):
+        """Test the binary payload carries the same points as JSON."""
+        from app.services import charts_service
+        from tests.test_chart_binary import decode
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            json_data = client.get("/charts/api/data?metrics=lux").get_json()
+            response = client.get("/charts/api/data?metrics=lux&format=binary")
+
+        assert response.mimetype == "application/vnd.raspilapse.chart"
+        header = decode(response.get_data())
+        series = header["series"][0]
+        assert header["cursor"] == json_data["cursor"]
+        assert series["data"]["lux"] == json_data["data"]["lux"]
+        assert len(series["timestamps"]) == len(json_data["timestamps"])
+
+    def test_api_batch_binary(self, client, temp_db_with_data):
+        """Test batch panels can be requested as binary."""
+        from app.services import charts_service
+        from tests.test_chart_binary import decode
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.post(
+                "/charts/api/batch",
+                json={
+                    "panels": [{"id": "light", "metrics": ["lux"]}],
+                    "format": "binary",
+                },
+            )
+
+        header = decode(response.get_data())
+        assert header["series"][0]["id"] == "light"
+        assert "zones" in header
+
+    def test_api_data_epoch_ms(self, client, temp_db_with_data):
+        """Test ts=epoch_ms returns numeric timestamps."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/data?metrics=lux&ts=epoch_ms")
+
+        data = response.get_json()
+        assert data["timestamps"]
+        assert all(isinstance(ts, int) for ts in data["timestamps"])
+
+    def test_api_data_invalid_ts(self, client):
+        """Test unknown timestamp formats are rejected."""
+        response = client.get("/charts/api/data?ts=rfc822")
+        assert response.status_code == 400
+
+    def test_api_data_invalid_format(self, client):
+        """Test unknown formats are rejected."""
+        response = client.get("/charts/api/data?format=xml")
+        assert response.status_code == 400
+
+
+class TestChartsApiLive:
+    """Test /charts/api/live endpoint."""
+
+    def test_api_live_is_event_stream(self, client, temp_db_with_data):
+        """Test the live feed opens as an SSE stream."""
+        from app.services import charts_service, live_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/live?metrics=lux", buffered=False)
+            first = next(response.response)
+            response.close()
+
+        assert response.mimetype == "text/event-stream"
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert first.startswith(b"retry:")
+        assert live_service.broadcaster.subscribers == 0
+
+    def test_api_live_busy(self, client, temp_db_with_data):
+        """Test 503 once the stream limit is reached."""
+        from app.services import charts_service, live_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            with patch.object(live_service, "MAX_SUBSCRIBERS", 0):
+                response = client.get("/charts/api/live")
+
+        assert response.status_code == 503
+
+    def test_api_live_invalid_cursor(self, client):
+        """Test a non-numeric cursor is rejected."""
+        response = client.get("/charts/api/live?cursor=abc")
+        assert response.status_code == 400
+
+
+class TestChartsApiDataDelta:
+    """Test /charts/api/data delta queries."""
+
+    def test_api_data_cursor(self, client, temp_db_with_data):
+        """Test a cursor request returns only rows after it."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/data?metrics=lux&cursor=48")
+
+        data = response.get_json()
+        assert data["delta"] is True
+        assert len(data["data"]["lux"]) == 2
+        assert data["cursor"] == 50
+
+    def test_api_data_invalid_cursor(self, client):
+        """Test an invalid cursor is rejected."""
+        response = client.get("/charts/api/data?cursor=abc")
+        assert response.status_code == 400
+
+
+class TestChartsApiBatch:
+    """Test /charts/api/batch endpoint."""
+
+    def test_api_batch(self, client, temp_db_with_data):
+        """Test a batch request returns all panels and zones."""
+        from app.services import charts_service
+
+        body = {
+            "panels": [
+                {"id": "light", "metrics": ["lux"]},
+                {"id": "system", "metrics": "system_cpu_temp,system_load_1min"},
+            ]
+        }
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.post("/charts/api/batch", json=body)
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert set(data["panels"]) == {"light", "system"}
+        assert "system_load_1min" in data["panels"]["system"]["data"]
+        assert isinstance(data["zones"], list)
+        assert "cursor" in data
+
+    def test_api_batch_requires_panels(self, client):
+        """Test a request without panels is rejected."""
+        response = client.post("/charts/api/batch", json={})
+        assert response.status_code == 400
+
+    def test_api_batch_requires_panel_id(self, client):
+        """Test panels without an id are rejected."""
+        response = client.post(
+            "/charts/api/batch", json={"panels": [{"metrics": ["lux"]}]}
+        )
+        assert response.status_code == 400
+
+    def test_api_batch_panel_limit(self, client):
+        """Test the number of panels is capped."""
+        panels = [{"id": str(i), "metrics": ["lux"]} for i in range(11)]
+        response = client.post("/charts/api/batch", json={"panels": panels})
+        assert response.status_code == 400
+
+
+class TestChartsApiStats:
+    """Test /charts/api/stats endpoint."""
+
+    def test_api_stats(self, client, temp_db_with_data):
+        """Test stats are returned per metric and per bucket."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/stats?metrics=lux&bucket=day&start={start}"
+            )
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["stats"]["lux"]["count"] == 50
+        assert data["stats"]["lux"]["max"] == 5000.0
+        assert sum(b["stats"]["lux"]["count"] for b in data["buckets"]) == 50
+
+    def test_api_stats_invalid_bucket(self, client):
+        """Test unknown buckets are rejected."""
+        response = client.get("/charts/api/stats?bucket=fortnight")
+        assert response.status_code == 400
+
+
+class TestChartsApiHistogram:
+    """Test /charts/api/histogram endpoint."""
+
+    def test_api_histogram(self, client, temp_db_with_data):
+        """Test bin counts are returned for a metric."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/histogram?metric=lux&bins=10&scale=log&start={start}"
+            )
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert len(data["counts"]) == 10
+        assert len(data["edges"]) == 11
+        assert sum(data["counts"]) == data["count"] == 50
+
+    def test_api_histogram_requires_metric(self, client):
+        """Test the metric is required."""
+        response = client.get("/charts/api/histogram")
+        assert response.status_code == 400
+
+    def test_api_histogram_invalid_scale(self, client):
+        """Test unknown scales are rejected."""
+        response = client.get("/charts/api/histogram?metric=lux&scale=sqrt")
+        assert response.status_code == 400
+
+
+class TestChartsApiCorrelation:
+    """Test /charts/api/correlation endpoint."""
+
+    def test_api_correlation(self, client, temp_db_with_data):
+        """Test a 2D histogram is returned for a metric pair."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/correlation?x=lux&y=brightness_mean&bins=5&start={start}"
+            )
+
+        data = response.get_json()
+        assert data["count"] == 50
+        assert sum(n for _, _, n in data["bins"]) == 50
+        assert len(data["y"]["edges"]) == 6
+
+    def test_api_correlation_requires_axes(self, client):
+        """Test x and y are required."""
+        response = client.get("/charts/api/correlation?x=lux")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("axis", ["xscale", "yscale"])
+    def test_api_correlation_invalid_scale(self, client, axis):
+        """Test unknown axis scales are rejected."""
+        response = client.get(
+            f"/charts/api/correlation?x=lux&y=brightness_mean&{axis}=sqrt"
+        )
+        assert response.status_code == 400
+
+
+class TestChartsApiOverlay:
+    """Test /charts/api/overlay endpoint."""
+
+    def test_api_overlay(self, client, temp_db_with_data):
+        """Test days are returned on a shared time-of-day axis."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                "/charts/api/overlay?days=0,1&metrics=lux&downsample=50&from=06:00"
+            )
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert len(data["days"]) == 2
+        assert len(data["time_of_day"]) == 50
+        assert data["time_of_day"][0] > 6 * 3600
+        assert all(len(d["data"]["lux"]) == 50 for d in data["days"])
+
+    def test_api_overlay_invalid_time(self, client):
+        """Test malformed time-of-day windows are rejected."""
+        response = client.get("/charts/api/overlay?from=noon")
+        assert response.status_code == 400
+
+
+class TestChartsApiHeatmap:
+    """Test /charts/api/heatmap endpoint."""
+
+    def test_api_heatmap(self, client, temp_db_with_data):
+        """Test a day x bin matrix is returned."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/heatmap?metric=lux&bins=24&agg=count&start={start}"
+            )
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert len(data["values"]) == len(data["days"])
+        assert all(len(row) == 24 for row in data["values"])
+        assert sum(c or 0 for row in data["values"] for c in row) == 50
+
+    def test_api_heatmap_requires_metric(self, client):
+        """Test the metric is required."""
+        response = client.get("/charts/api/heatmap")
+        assert response.status_code == 400
+
+    def test_api_heatmap_invalid_aggregate(self, client):
+        """Test unknown aggregates are rejected."""
+        response = client.get("/charts/api/heatmap?metric=lux&agg=median")
+        assert response.status_code == 400
+
+
+class TestChartsApiExport:
+    """Test /charts/api/export endpoint."""
+
+    def test_api_export_csv(self, client, temp_db_with_data):
+        """Test CSV export is streamed as an attachment."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(f"/charts/api/export?metrics=lux&start={start}")
+            lines = response.get_data(as_text=True).splitlines()
+
+        assert response.mimetype == "text/csv"
+        assert "attachment" in response.headers["Content-Disposition"]
+        assert lines[0] == "timestamp,unix_timestamp,lux"
+        assert len(lines) == 51
+
+    def test_api_export_invalid_format(self, client):
+        """Test unknown formats are rejected."""
+        response = client.get("/charts/api/export?format=xlsx")
+        assert response.status_code == 400
+
+
+class TestChartsApiGaps:
+    """Test /charts/api/gaps endpoint."""
+
+    def test_api_gaps_uses_config_interval(
+        self, app, client, temp_config_file, temp_db_with_data
+    ):
+        """Test the interval defaults to timelapse.interval from the config."""
+        from app.services import charts_service
+
+        app.config["RASPILAPSE_CONFIG"] = temp_config_file
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get("/charts/api/gaps")
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["interval"] == 30
+        assert data["threshold"] == 90
+
+    def test_api_gaps_interval_param(self, client, temp_db_with_data):
+        """Test gaps are found with an explicit interval."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(
+                f"/charts/api/gaps?interval=600&factor=2&start={start}"
+            )
+
+        data = response.get_json()
+        assert data["threshold"] == 1200
+        assert len(data["gaps"]) > 0
+        for gap in data["gaps"]:
+            assert {"start", "end", "duration", "ongoing"} <= set(gap)
+
+    def test_api_gaps_without_interval(self, client):
+        """Test a missing capture interval is rejected."""
+        response = client.get("/charts/api/gaps")
+        assert response.status_code == 400
+
+    def test_api_gaps_invalid_factor(self, client):
+        """Test non-numeric factors are rejected."""
+        response = client.get("/charts/api/gaps?interval=30&factor=x")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize(
+        "query", ["interval=30&factor=nan", "interval=30&factor=inf", "interval=nan"]
+    )
+    def test_api_gaps_non_finite(self, client, temp_db_with_data, query):
+        """Test NaN and infinite factors or intervals are rejected."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(f"/charts/api/gaps?{query}")
+
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
+class TestChartsApiCadence:
+    """Test /charts/api/cadence endpoint."""
+
+    def test_api_cadence_interval_param(self, client, temp_db_with_data):
+        """Test the deltas of hourly captures are summarized."""
+        from app.services import charts_service
+
+        start = (datetime.now() - timedelta(hours=100)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(f"/charts/api/cadence?interval=3600&start={start}")
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["overall"]["count"] == 49
+        assert data["overall"]["p50"] == pytest.approx(3600)
+        assert {"hour", "modes", "p95", "overruns"} <= set(data["hours"][0])
+
+    def test_api_cadence_without_interval(self, client):
+        """Test a missing capture interval is rejected."""
+        response = client.get("/charts/api/cadence")
+        assert response.status_code == 400
+
+    def test_api_cadence_invalid_interval(self, client):
+        """Test non-numeric intervals are rejected."""
+        response = client.get("/charts/api/cadence?interval=x")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("interval", ["nan", "inf", "-inf"])
+    def test_api_cadence_non_finite_interval(self, client, temp_db_with_data, interval):
+        """Test NaN and infinite intervals are rejected."""
+        from app.services import charts_service
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db_with_data)):
+            response = client.get(f"/charts/api/cadence?interval={interval}")
+
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
 class TestChartsApiModes:
     """Test /charts/api/modes endpoint."""
 
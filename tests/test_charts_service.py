@@ -1,10 +1,11 @@
 """Test charts service functionality."""
 
+import json
 import pytest
 import sqlite3
 import tempfile
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import patch
 
@@ -15,6 +16,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from app.services import charts_service
 
+# charts_service falls back to pure Python when NumPy is missing or fails to
+# import (e.g. without OpenBLAS), so its own flag decides the engine tests
+requires_numpy = pytest.mark.skipif(
+    charts_service.np is None, reason="NumPy is not available"
+)
+
 
 @pytest.fixture
 def temp_db():
@@ -89,6 +96,9 @@ def temp_db():
 
     os.close(fd)
     os.unlink(path)
+    rollup_path = charts_service.rollup_service.get_rollup_path(Path(path))
+    if rollup_path.exists():
+        rollup_path.unlink()
 
 
 class TestGetDataRange:
@@ -103,6 +113,49 @@ class TestGetDataRange:
         assert result["latest"] is not None
         assert result["count"] == 100
 
+    def test_get_data_range_folds_in_appended_rows(self, temp_db):
+        """Test appended captures update the summary incrementally."""
+        latest = (datetime.now() + timedelta(hours=1)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            first = charts_service.get_data_range()
+
+            conn = sqlite3.connect(temp_db)
+            conn.execute(
+                "INSERT INTO captures (timestamp, unix_timestamp, camera_id, image_path) "
+                "VALUES (?, ?, 'test_cam', '/tmp/new.jpg')",
+                (latest, datetime.now().timestamp() + 3600),
+            )
+            conn.commit()
+            conn.close()
+
+            statements = []
+            charts_service.get_db_connection().set_trace_callback(statements.append)
+            try:
+                second = charts_service.get_data_range()
+            finally:
+                charts_service.get_db_connection().set_trace_callback(None)
+
+        assert second["count"] == first["count"] + 1
+        assert second["earliest"] == first["earliest"]
+        assert second["latest"] == latest
+        # Only rows past the previous summary were scanned
+        assert any("rowid > 100" in sql for sql in statements)
+
+    def test_get_data_range_rebuilds_after_delete(self, temp_db):
+        """Test deletes are picked up by rebuilding the summary."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            first = charts_service.get_data_range()
+
+            conn = sqlite3.connect(temp_db)
+            conn.execute("DELETE FROM captures WHERE id <= 10")
+            conn.commit()
+            conn.close()
+
+            second = charts_service.get_data_range()
+
+        assert second["count"] == 90
+        assert second["latest"] < first["latest"]
+
     def test_get_data_range_no_db(self):
         """Test getting data range when database doesn't exist."""
         with patch.object(
@@ -147,6 +200,33 @@ class TestQueryChartData:
         # Should have fewer than 100 points since we're limiting time range
         assert len(result["timestamps"]) <= 100
 
+    def test_query_with_utc_time_range(self, temp_db):
+        """Test UTC ISO timestamps select the same rows as local ones."""
+        now = datetime.now()
+        local_start = (now - timedelta(hours=12, minutes=30)).isoformat()
+        utc_start = (
+            datetime.fromtimestamp(
+                (now - timedelta(hours=12, minutes=30)).timestamp(), timezone.utc
+            )
+            .replace(tzinfo=None)
+            .isoformat()
+            + "Z"
+        )
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            local = charts_service.query_chart_data(start=local_start, metrics=["lux"])
+            utc = charts_service.query_chart_data(start=utc_start, metrics=["lux"])
+
+        assert local["original_count"] == 13
+        assert utc["original_count"] == 13
+
+    def test_query_invalid_time_range(self, temp_db):
+        """Test an unparseable time range is reported."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(start="yesterday")
+
+        assert result.get("error") == "Invalid time range"
+
     def test_query_with_downsampling(self, temp_db):
         """Test that downsampling reduces point count."""
         with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
@@ -173,6 +253,439 @@ class TestQueryChartData:
         assert result.get("error") == "Database not found"
 
 
+class TestQueryBudget:
+    """Test time budgets on chart queries."""
+
+    def test_timeout_returns_partial(self, temp_db):
+        """Test a query over budget falls back to rollups, flagged and uncached."""
+        charts_service.rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service.query_budget, "QUERY_BUDGET", 0):
+                with patch.object(charts_service.query_budget, "PROGRESS_STEPS", 1):
+                    partial = charts_service.query_chart_data(
+                        metrics=["lux"], resolution="raw"
+                    )
+            full = charts_service.query_chart_data(metrics=["lux"], resolution="raw")
+
+        assert partial["partial"] is True
+        assert partial["resolution"] == "minute"
+        assert "partial" not in full
+        assert full["point_count"] >= partial["point_count"]
+
+    def test_timeout_covers_rollup_reads(self, temp_db):
+        """Test rollup reads count against the budget too."""
+        charts_service.rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service.query_budget, "QUERY_BUDGET", 0):
+                with patch.object(charts_service.query_budget, "PROGRESS_STEPS", 1):
+                    result = charts_service.query_chart_data(
+                        start=start, metrics=["lux"]
+                    )
+
+        assert result["partial"] is True
+        assert result["resolution"] == "hour"
+
+    def test_timeout_fallback_does_not_refresh(self, temp_db):
+        """Test the fallback only reads rollups that already exist."""
+        rollup_service = charts_service.rollup_service
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service.query_budget, "QUERY_BUDGET", 0):
+                with patch.object(charts_service.query_budget, "PROGRESS_STEPS", 1):
+                    with patch.object(rollup_service, "request_refresh") as refresh:
+                        result = charts_service.query_chart_data(
+                            metrics=["lux"], resolution="raw"
+                        )
+
+        refresh.assert_not_called()
+        assert result["partial"] is True
+        assert result["timestamps"] == []
+
+    def test_timeout_without_rollups(self, temp_db):
+        """Test series the rollups can't serve come back empty and partial."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service.query_budget, "QUERY_BUDGET", 0):
+                with patch.object(charts_service.query_budget, "PROGRESS_STEPS", 1):
+                    result = charts_service.query_chart_batch(
+                        panels=[{"id": "modes", "metrics": ["mode"]}]
+                    )
+
+        assert result["partial"] is True
+        assert result["zones"] == []
+        assert result["panels"]["modes"]["timestamps"] == []
+
+    def test_superseded(self, temp_db):
+        """Test a superseded request is abandoned."""
+        token = "page:superseded"
+
+        def supersede(conn, *args):
+            # A newer request from the same page arrives mid-query
+            with charts_service.query_budget.limit(
+                sqlite3.connect(":memory:"), 1, token
+            ):
+                pass
+            conn.execute("SELECT COUNT(*) FROM captures").fetchone()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "_query_raw", side_effect=supersede):
+                with patch.object(charts_service.query_budget, "PROGRESS_STEPS", 1):
+                    result = charts_service.query_chart_data(
+                        metrics=["lux"], resolution="raw", token=token
+                    )
+
+        assert result["error"] == charts_service.SUPERSEDED_ERROR
+
+
+class TestQueryChartDataM4:
+    """Test SQL-side M4 downsampling."""
+
+    def test_m4_reduces_rows_in_sql(self, temp_db):
+        """Test M4 returns at most first/last/min/max rows per bucket."""
+        start = (datetime.now() - timedelta(hours=200)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start=start, metrics=["lux"], downsample=20, mode="m4"
+            )
+
+        assert result["mode"] == "m4"
+        assert result["original_count"] == 100
+        # 5 buckets, at most 4 distinct rows each
+        assert 0 < result["point_count"] <= 20
+        assert len(result["data"]["lux"]) == result["point_count"]
+
+    def test_m4_respects_downsample_with_several_metrics(self, temp_db):
+        """Test the rows picked for every metric still fit downsample."""
+        conn = sqlite3.connect(temp_db)
+        # Scatter the values so each metric peaks on different rows
+        conn.execute(
+            """
+            UPDATE captures SET
+                lux = (id * 37) % 101,
+                brightness_mean = (id * 53) % 97,
+                exposure_time_us = (id * 71) % 89,
+                weather_temperature = (id * 29) % 83
+        """
+        )
+        conn.commit()
+        conn.close()
+        start = (datetime.now() - timedelta(hours=200)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start=start, downsample=20, mode="m4"
+            )
+
+        assert len(result["data"]) == 4
+        assert 0 < result["point_count"] <= 20
+
+    def test_m4_keeps_extremes_and_endpoints(self, temp_db):
+        """Test M4 keeps the global min/max and the first/last rows."""
+        start = (datetime.now() - timedelta(hours=200)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            raw = charts_service.query_chart_data(
+                start=start, metrics=["lux"], downsample=1000
+            )
+            m4 = charts_service.query_chart_data(
+                start=start, metrics=["lux"], downsample=20, mode="m4"
+            )
+
+        assert min(m4["data"]["lux"]) == min(raw["data"]["lux"])
+        assert max(m4["data"]["lux"]) == max(raw["data"]["lux"])
+        assert m4["timestamps"][0] == raw["timestamps"][0]
+        assert m4["timestamps"][-1] == raw["timestamps"][-1]
+        assert m4["timestamps"] == sorted(m4["timestamps"])
+
+    def test_m4_with_text_metric(self, temp_db):
+        """Test M4 handles the non-numeric mode column."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                metrics=["lux", "mode"], downsample=8, mode="m4"
+            )
+
+        assert len(result["data"]["mode"]) == result["point_count"]
+
+    def test_m4_empty_range(self, temp_db):
+        """Test M4 on a range without rows."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start="2000-01-01T00:00:00",
+                end="2000-01-02T00:00:00",
+                metrics=["lux"],
+                mode="m4",
+            )
+
+        assert result["timestamps"] == []
+        assert result["data"] == {"lux": []}
+
+
+class TestTimestampFormats:
+    """Test ts_format handling."""
+
+    def test_epoch_ms_matches_iso(self, temp_db):
+        """Test epoch-ms timestamps denote the same instants as ISO ones."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            iso = charts_service.query_chart_data(metrics=["lux"], resolution="raw")
+            millis = charts_service.query_chart_data(
+                metrics=["lux"], resolution="raw", ts_format="epoch_ms"
+            )
+
+        assert all(isinstance(ts, int) for ts in millis["timestamps"])
+        assert millis["data"] == iso["data"]
+        for ms, text in zip(millis["timestamps"], iso["timestamps"]):
+            assert abs(ms / 1000 - datetime.fromisoformat(text).timestamp()) < 0.001
+
+    def test_epoch_ms_without_numpy(self):
+        """Test the pure-Python conversion matches the NumPy one."""
+        timestamps = [1700000000.0004, 1700000000.0006, 1.5]
+        with patch.object(charts_service, "np", None):
+            python = charts_service._to_epoch_ms(timestamps)
+
+        assert python == [1700000000000, 1700000000001, 1500]
+        if charts_service.np is not None:
+            assert charts_service._to_epoch_ms(timestamps) == python
+
+    def test_delta_epoch_ms(self, temp_db):
+        """Test delta queries honour ts_format."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_delta(
+                cursor=98, metrics=["lux"], ts_format="epoch_ms"
+            )
+
+        assert len(result["timestamps"]) == 2
+        assert all(isinstance(ts, int) for ts in result["timestamps"])
+
+
+class TestStreamChartData:
+    """Test stream_chart_data function."""
+
+    def test_stream_chunks_match_rows(self, temp_db):
+        """Test the streamed document holds every row, in time order."""
+        start = (datetime.now() - timedelta(hours=200)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "STREAM_CHUNK_ROWS", 7):
+                chunks = list(
+                    charts_service.stream_chart_data(
+                        start=start, metrics=["lux", "bogus"]
+                    )
+                )
+
+        # Header, one chunk per 7 rows, footer
+        assert len(chunks) == 2 + 15
+        data = json.loads("".join(chunks))
+        assert data["columns"] == ["timestamp", "lux"]
+        assert data["count"] == 100
+        timestamps = [row[0] for row in data["rows"]]
+        assert timestamps == sorted(timestamps)
+        assert data["rows"][-1][1] == 100.0
+
+    def test_stream_empty_range(self, temp_db):
+        """Test an empty range is still a valid document."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            chunks = charts_service.stream_chart_data(
+                start="2000-01-01T00:00:00", end="2000-01-02T00:00:00"
+            )
+            data = json.loads("".join(chunks))
+
+        assert data["rows"] == []
+        assert data["count"] == 0
+
+    def test_stream_invalid_range(self, temp_db):
+        """Test errors are returned before streaming starts."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.stream_chart_data(start="not a date")
+
+        assert result["error"] == "Invalid time range"
+
+
+class TestQueryChartBatch:
+    """Test multi-panel batch queries."""
+
+    PANELS = [
+        {"id": "light", "metrics": ["lux"], "downsample": 500},
+        {"id": "brightness", "metrics": ["brightness_mean", "brightness_p5"]},
+        {"id": "system", "metrics": ["system_cpu_temp"], "downsample": 10},
+    ]
+
+    def test_batch_returns_each_panel(self, temp_db):
+        """Test every panel gets its own series."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_batch(
+                panels=self.PANELS, resolution="raw"
+            )
+
+        assert set(result["panels"]) == {"light", "brightness", "system"}
+        assert list(result["panels"]["light"]["data"]) == ["lux"]
+        assert list(result["panels"]["brightness"]["data"]) == [
+            "brightness_mean",
+            "brightness_p5",
+        ]
+        assert result["panels"]["system"]["point_count"] <= 10
+        assert result["cursor"] == 100
+
+    def test_batch_matches_single_queries(self, temp_db):
+        """Test a batch panel equals the standalone chart query."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            batch = charts_service.query_chart_batch(
+                panels=self.PANELS, resolution="raw"
+            )
+            single = charts_service.query_chart_data(
+                metrics=["system_cpu_temp"], downsample=10, resolution="raw"
+            )
+
+        panel = batch["panels"]["system"]
+        assert panel["timestamps"] == single["timestamps"]
+        assert panel["data"] == single["data"]
+
+    def test_batch_mode_zones_match(self, temp_db):
+        """Test zones from the batch scan equal get_mode_zones."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            batch = charts_service.query_chart_batch(panels=self.PANELS)
+            zones = charts_service.get_mode_zones()
+
+        assert batch["zones"] == zones
+
+    def test_batch_zones_across_chunks(self, temp_db):
+        """Test zones collected chunk by chunk equal the LAG() query's."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("UPDATE captures SET mode = NULL WHERE id BETWEEN 20 AND 26")
+        conn.execute("UPDATE captures SET mode = 'night' WHERE id BETWEEN 40 AND 47")
+        conn.commit()
+        conn.close()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "DECODE_CHUNK_ROWS", 7):
+                batch = charts_service.query_chart_batch(
+                    start="2000-01-01T00:00:00", panels=self.PANELS, resolution="raw"
+                )
+            zones = charts_service._query_mode_zones(
+                charts_service.get_db_connection(), 0, float("inf")
+            )
+
+        assert batch["zones"] == zones
+        assert any(zone["mode"] is None for zone in zones)
+
+    def test_raw_batch_scans_captures_once(self, temp_db):
+        """Test the raw batch reads panels and zones in one range scan."""
+        statements = []
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            conn = charts_service.get_db_connection()
+            conn.set_trace_callback(statements.append)
+            try:
+                charts_service.query_chart_batch(panels=self.PANELS, resolution="raw")
+            finally:
+                conn.set_trace_callback(None)
+
+        scans = [sql for sql in statements if "unix_timestamp >=" in sql]
+        assert len(scans) == 1
+
+    def test_batch_uses_rollups_for_long_ranges(self, temp_db):
+        """Test long ranges read one rollup level for all panels."""
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+        charts_service.rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_batch(start=start, panels=self.PANELS)
+
+        assert result["panels"]["light"]["resolution"] == "hour"
+        assert len(result["zones"]) > 0
+
+    def test_batch_without_modes(self, temp_db):
+        """Test zones can be skipped."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_batch(
+                panels=self.PANELS, include_modes=False
+            )
+
+        assert result["zones"] == []
+
+    def test_batch_invalid_metrics(self, temp_db):
+        """Test panels without valid metrics are rejected."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_batch(
+                panels=[{"id": "x", "metrics": ["bogus"]}]
+            )
+
+        assert result.get("error") == "No valid metrics specified"
+
+
+class TestQueryChartDelta:
+    """Test cursor-based delta queries."""
+
+    def _append_row(self, path, ts):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            """
+            INSERT INTO captures (timestamp, unix_timestamp, camera_id, image_path, lux)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (ts.isoformat(), ts.timestamp(), "test_cam", "/tmp/new.jpg", 42.0),
+        )
+        conn.commit()
+        conn.close()
+
+    def test_full_query_returns_cursor(self, temp_db):
+        """Test full queries report the latest rowid as cursor."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(metrics=["lux"])
+
+        assert result["cursor"] == 100
+
+    def test_delta_returns_only_new_rows(self, temp_db):
+        """Test a delta after the cursor returns just appended rows."""
+        self._append_row(temp_db, datetime.now() + timedelta(minutes=1))
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_delta(cursor=100, metrics=["lux"])
+
+        assert result["delta"] is True
+        assert result["data"]["lux"] == [42.0]
+        assert result["cursor"] == 101
+
+    def test_delta_without_new_rows_keeps_cursor(self, temp_db):
+        """Test an empty delta returns the same cursor."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_delta(cursor=100, metrics=["lux"])
+
+        assert result["timestamps"] == []
+        assert result["cursor"] == 100
+
+    def test_delta_since_timestamp(self, temp_db):
+        """Test a delta based on a unix timestamp."""
+        since = (datetime.now() - timedelta(hours=2, minutes=30)).timestamp()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_delta(since=since, metrics=["lux"])
+
+        # Rows at 0, 1 and 2 hours ago
+        assert result["point_count"] == 3
+        assert result["cursor"] == 3
+
+    def test_delta_truncated_when_too_many_rows(self, temp_db):
+        """Test large backlogs ask the client for a full reload."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "DELTA_LIMIT", 10):
+                result = charts_service.query_chart_delta(cursor=0, metrics=["lux"])
+
+        assert result["truncated"] is True
+        assert result["cursor"] == 0
+
+    def test_delta_requires_cursor(self, temp_db):
+        """Test a delta without cursor or since is rejected."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_delta(metrics=["lux"])
+
+        assert result.get("error") == "No cursor specified"
+
+
 class TestDownsampleData:
     """Test LTTB downsampling algorithm."""
 
@@ -218,6 +731,125 @@ class TestDownsampleData:
         assert len(new_ts) == 20
 
 
+class TestReadColumns:
+    """Test column decoding on the raw query path."""
+
+    def test_columns_hold_nan_for_null(self, temp_db):
+        """Test NULLs decode to NaN and text metrics stay lists."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("UPDATE captures SET lux = NULL WHERE id = 100")
+        conn.commit()
+        conn.close()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "DECODE_CHUNK_ROWS", 7):
+                timestamps, data = charts_service._read_columns(
+                    charts_service.get_db_connection(), 0, 2e9, ["lux", "mode"]
+                )
+
+        assert len(timestamps) == 100
+        assert list(timestamps) == sorted(timestamps)
+        # id 100 is the oldest capture
+        assert data["lux"][0] != data["lux"][0]
+        assert data["lux"][-1] == 100.0
+        assert isinstance(data["mode"], list)
+
+    def test_columns_grow_past_first_chunk(self, temp_db):
+        """Test columns grow to hold every row and are trimmed to fit."""
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(charts_service, "DECODE_CHUNK_ROWS", 3):
+                timestamps, data = charts_service._read_columns(
+                    charts_service.get_db_connection(), 0, 2e9, ["lux"]
+                )
+
+        assert len(timestamps) == len(data["lux"]) == 100
+        assert list(data["lux"]) == [100.0 * i for i in range(100, 0, -1)]
+
+    @requires_numpy
+    @pytest.mark.parametrize("downsample", [50, 500])
+    def test_array_fallback_matches_numpy(self, temp_db, downsample):
+        """Test query results don't depend on NumPy being installed."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("UPDATE captures SET lux = NULL WHERE id % 9 = 0")
+        conn.commit()
+        conn.close()
+
+        def query():
+            charts_service._cache.clear()
+            return charts_service.query_chart_data(
+                start="2000-01-01T00:00:00",
+                metrics=["lux", "mode", "exposure_time_us"],
+                downsample=downsample,
+                resolution="raw",
+            )
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with_numpy = query()
+            with patch.object(charts_service, "np", None):
+                without_numpy = query()
+
+        assert with_numpy == without_numpy
+        assert None in with_numpy["data"]["lux"]
+        assert with_numpy["point_count"] == min(downsample, 100)
+
+
+class TestLTTBEngines:
+    """Test that the NumPy and pure-Python LTTB engines agree."""
+
+    @staticmethod
+    def _series(n):
+        import math
+        import random
+
+        rng = random.Random(42)
+        timestamps = [1700000000.0 + i * 30 + rng.random() for i in range(n)]
+        values = [
+            None if i % 37 == 0 else 1000 * math.sin(i / 150.0) + rng.gauss(0, 25)
+            for i in range(n)
+        ]
+        return timestamps, values
+
+    @requires_numpy
+    @pytest.mark.parametrize("n,target", [(100, 20), (5000, 500), (90000, 500)])
+    def test_engines_select_same_indices(self, n, target):
+        """Test both engines pick identical indices."""
+        timestamps, values = self._series(n)
+
+        python_idx = charts_service._lttb_indices_python(timestamps, values, target)
+        numpy_idx = charts_service._lttb_indices_numpy(timestamps, values, target)
+
+        assert numpy_idx == python_idx
+        assert len(numpy_idx) == target
+
+    @requires_numpy
+    def test_downsample_engines_match(self):
+        """Test downsample_data output is identical for both engines."""
+        timestamps, values = self._series(2000)
+        data = {"metric": values, "other": list(range(2000))}
+
+        py_ts, py_data = charts_service.downsample_data(
+            timestamps, data, 100, engine="python"
+        )
+        np_ts, np_data = charts_service.downsample_data(
+            timestamps, data, 100, engine="numpy"
+        )
+
+        assert np_ts == py_ts
+        assert np_data == py_data
+
+    def test_python_fallback_without_numpy(self):
+        """Test downsampling works when NumPy is unavailable."""
+        timestamps = list(range(100))
+        data = {"metric": list(range(100))}
+
+        with patch.object(charts_service, "np", None):
+            new_ts, new_data = charts_service.downsample_data(timestamps, data, 20)
+
+        assert len(new_ts) == 20
+        assert new_ts[0] == 0
+        assert new_ts[-1] == 99
+
+
 class TestGetModeZones:
     """Test get_mode_zones function."""
 
@@ -233,6 +865,40 @@ class TestGetModeZones:
             assert "mode" in zone
             assert zone["mode"] in ["day", "night"]
 
+    def test_window_query_matches_row_walk(self, temp_db):
+        """Test SQL-side zones equal collapsing every row in Python."""
+        conn = sqlite3.connect(temp_db)
+        # Runs of equal modes, including NULL runs
+        conn.execute("UPDATE captures SET mode = 'day' WHERE id % 7 < 3")
+        conn.execute("UPDATE captures SET mode = NULL WHERE id BETWEEN 40 AND 44")
+        conn.commit()
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT timestamp, mode FROM captures ORDER BY unix_timestamp"
+        ).fetchall()
+
+        zones = charts_service._query_mode_zones(conn, 0, float("inf"))
+        conn.close()
+
+        # Walk every row the way the zones used to be built
+        expected = []
+        for row in rows:
+            if expected and expected[-1]["mode"] == row["mode"]:
+                expected[-1]["end"] = row["timestamp"]
+            else:
+                if expected:
+                    expected[-1]["end"] = row["timestamp"]
+                expected.append(
+                    {
+                        "start": row["timestamp"],
+                        "end": row["timestamp"],
+                        "mode": row["mode"],
+                    }
+                )
+
+        assert zones == expected
+        assert any(zone["mode"] is None for zone in zones)
+
     def test_get_mode_zones_no_db(self):
         """Test getting mode zones when database doesn't exist."""
         with patch.object(
@@ -243,6 +909,80 @@ class TestGetModeZones:
         assert zones == []
 
 
+class TestGetCaptureGaps:
+    """Test get_capture_gaps function."""
+
+    def _delete(self, temp_db, where):
+        conn = sqlite3.connect(temp_db)
+        conn.execute(f"DELETE FROM captures WHERE {where}")
+        conn.commit()
+        conn.close()
+
+    def test_no_gaps_at_regular_interval(self, temp_db):
+        """Test hourly captures have no gaps at a one hour interval."""
+        start = (datetime.now() - timedelta(hours=120)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.get_capture_gaps(3600, start=start)
+
+        assert result == {"gaps": [], "threshold": 3600 * charts_service.GAP_FACTOR}
+
+    def test_gap_in_range(self, temp_db):
+        """Test missing captures are reported with their duration."""
+        # Rows are inserted newest first: ids 11-15 are 10-14 hours ago
+        self._delete(temp_db, "id BETWEEN 11 AND 15")
+        start = (datetime.now() - timedelta(hours=48)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.get_capture_gaps(3600, start=start)
+
+        assert len(result["gaps"]) == 1
+        gap = result["gaps"][0]
+        assert gap["duration"] == pytest.approx(6 * 3600)
+        assert gap["ongoing"] is False
+        assert gap["start"] < gap["end"]
+
+    def test_gap_crossing_range_start(self, temp_db):
+        """Test a gap overlapping the start of the range is reported whole."""
+        self._delete(temp_db, "id BETWEEN 11 AND 15")
+        start = (datetime.now() - timedelta(hours=12)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.get_capture_gaps(3600, start=start)
+
+        assert len(result["gaps"]) == 1
+        assert result["gaps"][0]["duration"] == pytest.approx(6 * 3600)
+
+    def test_factor_sets_threshold(self, temp_db):
+        """Test short gaps are ignored below the threshold."""
+        self._delete(temp_db, "id BETWEEN 11 AND 12")
+        start = (datetime.now() - timedelta(hours=48)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            loose = charts_service.get_capture_gaps(3600, start=start)
+            strict = charts_service.get_capture_gaps(3600, start=start, factor=2)
+
+        assert loose["gaps"] == []
+        assert len(strict["gaps"]) == 1
+
+    def test_ongoing_gap(self, temp_db):
+        """Test a stall since the newest capture is reported as ongoing."""
+        self._delete(temp_db, "id <= 5")
+        start = (datetime.now() - timedelta(hours=48)).isoformat()
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.get_capture_gaps(3600, start=start)
+
+        assert len(result["gaps"]) == 1
+        assert result["gaps"][0]["ongoing"] is True
+        assert result["gaps"][0]["duration"] == pytest.approx(5 * 3600, abs=60)
+
+    def test_no_db(self):
+        """Test error when database doesn't exist."""
+        with patch.object(
+            charts_service, "DATABASE_PATH", Path("/nonexistent/db.sqlite")
+        ):
+            result = charts_service.get_capture_gaps(30)
+
+        assert result["gaps"] == []
+        assert "error" in result
+
+
 class TestGetAvailableMetrics:
     """Test get_available_metrics function."""
 
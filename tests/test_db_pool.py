@@ -0,0 +1,107 @@
+"""Test the pooled read-only SQLite connections."""
+
+import pytest
+import sqlite3
+import tempfile
+import threading
+import os
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import db_pool
+
+
+@pytest.fixture
+def temp_db():
+    """Create a small temporary database."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE captures (id INTEGER PRIMARY KEY, lux REAL)")
+    conn.execute("INSERT INTO captures (lux) VALUES (1.0)")
+    conn.commit()
+    conn.close()
+
+    yield path
+
+    db_pool.close_connections()
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+class TestGetConnection:
+    """Test get_connection pooling behaviour."""
+
+    def test_reuses_connection_in_same_thread(self, temp_db):
+        """Test repeated calls return the same connection."""
+        first = db_pool.get_connection(temp_db)
+        second = db_pool.get_connection(temp_db)
+
+        assert first is second
+
+    def test_separate_connection_per_thread(self, temp_db):
+        """Test each thread gets its own connection."""
+        main_conn = db_pool.get_connection(temp_db)
+        other = []
+
+        def worker():
+            other.append(db_pool.get_connection(temp_db))
+            db_pool.close_connections()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        assert other[0] is not main_conn
+
+    def test_connection_is_read_only(self, temp_db):
+        """Test writes through a pooled connection are rejected."""
+        conn = db_pool.get_connection(temp_db)
+
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO captures (lux) VALUES (2.0)")
+
+    def test_pragmas_applied(self, temp_db):
+        """Test the tuned pragmas are set on new connections."""
+        conn = db_pool.get_connection(temp_db)
+
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -8192
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+    def test_sees_new_rows(self, temp_db):
+        """Test a pooled connection sees rows committed later."""
+        conn = db_pool.get_connection(temp_db)
+        assert conn.execute("SELECT COUNT(*) FROM captures").fetchone()[0] == 1
+
+        writer = sqlite3.connect(temp_db)
+        writer.execute("INSERT INTO captures (lux) VALUES (2.0)")
+        writer.commit()
+        writer.close()
+
+        conn = db_pool.get_connection(temp_db)
+        assert conn.execute("SELECT COUNT(*) FROM captures").fetchone()[0] == 2
+
+    def test_reopens_when_file_replaced(self, temp_db):
+        """Test the connection is recycled when the file is replaced."""
+        first = db_pool.get_connection(temp_db)
+
+        replacement = temp_db + ".new"
+        conn = sqlite3.connect(replacement)
+        conn.execute("CREATE TABLE captures (id INTEGER PRIMARY KEY, lux REAL)")
+        conn.commit()
+        conn.close()
+        os.replace(replacement, temp_db)
+
+        second = db_pool.get_connection(temp_db)
+
+        assert second is not first
+        assert second.execute("SELECT COUNT(*) FROM captures").fetchone()[0] == 0
+
+    def test_missing_file_raises(self):
+        """Test a missing database raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            db_pool.get_connection("/nonexistent/db.sqlite")
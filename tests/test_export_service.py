@@ -0,0 +1,114 @@
+"""Test streaming captures export."""
+
+import csv
+import io
+import pytest
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, export_service
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with 120 captures, one per minute."""
+    start = datetime(2024, 6, 1, 12, 0)
+    return captures_db(
+        [
+            {
+                "ts": start + timedelta(minutes=i),
+                "mode": "day" if i < 60 else "night",
+                "lux": None if i == 5 else i * 1.5,
+                "exposure_time_us": 1000 * i,
+            }
+            for i in range(120)
+        ],
+        patch_path=False,
+    )
+
+
+RANGE = {"start": "2024-06-01T12:00:00", "end": "2024-06-01T14:00:00"}
+
+
+class TestExportCsv:
+    """Test CSV export."""
+
+    def test_csv_streams_in_chunks(self, temp_db):
+        """Test every row arrives, split across fetchmany chunks."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(export_service, "EXPORT_CHUNK_ROWS", 50):
+                chunks = list(
+                    export_service.export_captures(metrics=["lux", "mode"], **RANGE)
+                )
+
+        # Header, then 50 + 50 + 20 rows
+        assert len(chunks) == 4
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        assert rows[0] == ["timestamp", "unix_timestamp", "lux", "mode"]
+        assert len(rows) == 121
+        assert rows[1][0] == "2024-06-01T12:00:00"
+        assert rows[6][2] == ""  # NULL lux
+        assert rows[-1][3] == "night"
+
+    def test_default_metrics_are_existing_columns(self, temp_db):
+        """Test the default export skips metrics the table doesn't have."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            chunks = export_service.export_captures(**RANGE)
+            header = next(iter(chunks)).decode().strip().split(",")
+
+        assert header == [
+            "timestamp",
+            "unix_timestamp",
+            "lux",
+            "mode",
+            "exposure_time_us",
+        ]
+
+    def test_errors(self, temp_db):
+        """Test bad formats, ranges and metrics are reported."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            assert "error" in export_service.export_captures(fmt="xlsx")
+            assert "error" in export_service.export_captures(start="yesterday")
+            assert "error" in export_service.export_captures(metrics=["bogus"])
+
+
+class TestExportParquet:
+    """Test Parquet export."""
+
+    @pytest.mark.skipif(export_service.pq is None, reason="pyarrow is not available")
+    def test_parquet_round_trip(self, temp_db):
+        """Test the streamed bytes form a valid Parquet file."""
+        pa, pq = export_service.pa, export_service.pq
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(export_service, "EXPORT_CHUNK_ROWS", 50):
+                data = b"".join(
+                    export_service.export_captures(
+                        metrics=["lux", "mode", "exposure_time_us"],
+                        fmt="parquet",
+                        **RANGE,
+                    )
+                )
+
+        parquet = pq.ParquetFile(pa.BufferReader(data))
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+        assert table.num_rows == 120
+        assert table.column("lux")[5].as_py() is None
+        assert table.column("mode")[119].as_py() == "night"
+        assert table.column("exposure_time_us")[2].as_py() == 2000.0
+
+    def test_parquet_unavailable_without_pyarrow(self, temp_db):
+        """Test parquet is not offered when pyarrow is missing."""
+        with patch.object(export_service, "pq", None):
+            assert export_service.get_export_formats() == ["csv"]
+            with patch.object(charts_service, "DATABASE_PATH", temp_db):
+                result = export_service.export_captures(fmt="parquet")
+
+        assert "error" in result
@@ -0,0 +1,84 @@
+"""Test index verification and provisioning for charts queries."""
+
+import pytest
+import sqlite3
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, index_service
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a captures table without any secondary index."""
+    return captures_db(columns=("mode TEXT", "lux REAL"), patch_path=False)
+
+
+class TestCheckQueryPlans:
+    """Test EXPLAIN QUERY PLAN reporting."""
+
+    def test_reports_uncovered_queries(self, temp_db):
+        """Test range queries without an index are reported."""
+        reports = {r["query"]: r for r in index_service.check_query_plans(temp_db)}
+
+        assert reports["chart_data"]["covered"] is False
+        assert reports["chart_data"]["full_scan"] is True
+        assert reports["chart_data"]["temp_sort"] is True
+        # Cursor deltas always use the rowid
+        assert reports["delta_cursor"]["covered"] is True
+
+    def test_all_covered_after_ensure(self, temp_db):
+        """Test every query shape is covered once indexes exist."""
+        created = index_service.ensure_indexes(temp_db)
+
+        assert created == ["idx_captures_unix_timestamp_mode"]
+        assert all(r["covered"] for r in index_service.check_query_plans(temp_db))
+
+
+class TestMissingIndexes:
+    """Test detection of missing indexes."""
+
+    def test_missing_on_fresh_table(self, temp_db):
+        """Test the recommended index is reported as missing."""
+        missing = index_service.get_missing_indexes(temp_db)
+        assert [name for name, _ in missing] == ["idx_captures_unix_timestamp_mode"]
+
+    def test_existing_equivalent_index_counts(self, temp_db):
+        """Test an index with the same leading columns satisfies it."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute("CREATE INDEX other_name ON captures (unix_timestamp, mode, lux)")
+        conn.commit()
+        conn.close()
+
+        assert index_service.get_missing_indexes(temp_db) == []
+        assert index_service.ensure_indexes(temp_db) == []
+
+
+class TestIndexesCommand:
+    """Test the flask charts indexes command."""
+
+    def test_reports_and_creates(self, app, temp_db):
+        """Test the CLI creates indexes and prints the plans."""
+        runner = app.test_cli_runner()
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = runner.invoke(args=["charts", "indexes", "--create"])
+
+        assert result.exit_code == 0
+        assert "Created index idx_captures_unix_timestamp_mode" in result.output
+        assert "NOT COVERED" not in result.output
+
+    def test_missing_database(self, app):
+        """Test the CLI fails cleanly without a database."""
+        runner = app.test_cli_runner()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path("/nonexistent.db")):
+            result = runner.invoke(args=["charts", "indexes"])
+
+        assert result.exit_code != 0
@@ -0,0 +1,166 @@
+"""Test the live captures feed."""
+
+import json
+import pytest
+import time
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, db_pool, live_service
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with 10 captures, one per minute."""
+    start = datetime(2024, 6, 1, 12, 0)
+    return captures_db(
+        [{"ts": start + timedelta(minutes=i), "lux": float(i)} for i in range(10)],
+        columns=("lux REAL",),
+    )
+
+
+@pytest.fixture
+def source():
+    """A broadcaster polling fast enough for tests."""
+    broadcaster = live_service.CaptureBroadcaster(poll_interval=0.01)
+    yield broadcaster
+    # Let the polling thread notice it has no subscribers left
+    deadline = time.monotonic() + 2
+    while broadcaster._thread is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _parse(message):
+    """Split an SSE message into its fields."""
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    if "data" in fields:
+        fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+class TestCaptureBroadcaster:
+    """Test CaptureBroadcaster."""
+
+    def test_wait_returns_newest_rowid(self, temp_db, source):
+        """Test the first poll publishes MAX(rowid)."""
+        assert source.subscribe()
+        try:
+            assert source.wait(None, 2) == 10
+        finally:
+            source.unsubscribe()
+
+    def test_wait_times_out_without_appends(self, temp_db, source):
+        """Test waiting past the newest rowid returns after the timeout."""
+        assert source.subscribe()
+        try:
+            assert source.wait(10, 0.05) == 10
+        finally:
+            source.unsubscribe()
+
+    def test_subscriber_limit(self, temp_db, source):
+        """Test slots beyond the limit are refused until one is released."""
+        assert source.subscribe(limit=1)
+        assert not source.subscribe(limit=1)
+        source.unsubscribe()
+        assert source.subscribe(limit=1)
+        source.unsubscribe()
+        assert source.subscribers == 0
+
+
+class TestLiveFeed:
+    """Test open_live_feed."""
+
+    def test_pushes_rows_after_cursor(self, temp_db, source, insert_captures):
+        """Test pending rows and then new appends are pushed as deltas."""
+        feed = live_service.open_live_feed(["lux"], cursor=7, source=source)
+        events = iter(feed)
+        try:
+            assert next(events).startswith("retry:")
+
+            first = _parse(next(events))
+            assert first["event"] == "captures"
+            assert first["id"] == "10"
+            assert first["data"]["data"]["lux"] == [7.0, 8.0, 9.0]
+
+            insert_captures(
+                temp_db, [{"ts": datetime(2024, 6, 1, 12, 10), "lux": 42.0}]
+            )
+
+            second = _parse(next(events))
+            assert second["id"] == "11"
+            assert second["data"]["data"]["lux"] == [42.0]
+        finally:
+            events.close()
+
+        assert source.subscribers == 0
+
+    def test_close_releases_connections(self, temp_db, source):
+        """Test a finished stream closes the connections its reads opened."""
+        feed = live_service.open_live_feed(["lux"], cursor=7, source=source)
+        events = iter(feed)
+        try:
+            next(events)
+            next(events)
+            assert db_pool._pool()
+        finally:
+            events.close()
+
+        assert db_pool._pool() == {}
+
+    def test_keepalive_without_appends(self, temp_db, source):
+        """Test idle streams send comments instead of events."""
+        feed = live_service.open_live_feed(["lux"], source=source)
+        events = iter(feed)
+        try:
+            next(events)
+            with patch.object(live_service, "KEEPALIVE_INTERVAL", 0.05):
+                assert next(events) == ": keepalive\n\n"
+        finally:
+            events.close()
+
+    def test_busy_when_full(self, temp_db, source):
+        """Test the subscriber cap is reported as busy."""
+        with patch.object(live_service, "MAX_SUBSCRIBERS", 1):
+            feed = live_service.open_live_feed(["lux"], source=source)
+            busy = live_service.open_live_feed(["lux"], source=source)
+        feed.close()
+
+        assert busy["busy"] is True
+        assert source.subscribers == 0
+
+    def test_invalid_metrics(self, temp_db, source):
+        """Test unknown metrics are rejected without taking a slot."""
+        result = live_service.open_live_feed(["nope"], source=source)
+
+        assert "error" in result
+        assert source.subscribers == 0
+
+    def test_no_db(self, source):
+        """Test error when database doesn't exist."""
+        with patch.object(
+            charts_service, "DATABASE_PATH", Path("/nonexistent/db.sqlite")
+        ):
+            result = live_service.open_live_feed(source=source)
+
+        assert result == {"error": "Database not found"}
+
+
+class TestConfigure:
+    """Test configure."""
+
+    def test_sets_stream_limit(self):
+        """Test the stream limit is set, and None keeps it."""
+        with patch.object(live_service, "MAX_SUBSCRIBERS", 2):
+            live_service.configure(200)
+            assert live_service.MAX_SUBSCRIBERS == 200
+            live_service.configure(None)
+            assert live_service.MAX_SUBSCRIBERS == 200
+            live_service.configure(0)
+            assert live_service.MAX_SUBSCRIBERS == 0
@@ -0,0 +1,154 @@
+"""Test day-over-day overlays."""
+
+import pytest
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, overlay_service
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with three days of captures every 10 minutes."""
+    rows = []
+    for day in range(3):
+        midnight = datetime(2024, 6, 1) + timedelta(days=day)
+        for i in range(144):
+            ts = midnight + timedelta(minutes=10 * i)
+            # Lux equals the hour of day plus 100 per day
+            rows.append({"ts": ts, "mode": "day", "lux": ts.hour + 100.0 * day})
+    return captures_db(
+        rows, columns=("mode TEXT", "lux REAL"), indexes={"idx_unix": "unix_timestamp"}
+    )
+
+
+class TestParsing:
+    """Test day and time-of-day parsing."""
+
+    def test_parse_day(self):
+        """Test ISO dates and day offsets."""
+        today = date(2024, 6, 3)
+        assert overlay_service.parse_day("2024-05-01", today) == date(2024, 5, 1)
+        assert overlay_service.parse_day("0", today) == today
+        assert overlay_service.parse_day("1", today) == date(2024, 6, 2)
+        assert overlay_service.parse_day("-7", today) == date(2024, 5, 27)
+
+        with pytest.raises(ValueError):
+            overlay_service.parse_day("yesterday", today)
+
+    def test_parse_time_of_day(self):
+        """Test HH:MM parsing, including the end of day."""
+        assert overlay_service.parse_time_of_day("06:30") == 6 * 3600 + 30 * 60
+        assert overlay_service.parse_time_of_day("24:00") == 86400
+
+        with pytest.raises(ValueError):
+            overlay_service.parse_time_of_day("25:00")
+
+
+class TestQueryOverlay:
+    """Test query_overlay."""
+
+    def test_days_share_time_axis(self, temp_db):
+        """Test each day is averaged onto the same time-of-day buckets."""
+        result = overlay_service.query_overlay(
+            ["2024-06-03", "2024-06-01"], ["lux"], downsample=24
+        )
+
+        assert [d["day"] for d in result["days"]] == ["2024-06-03", "2024-06-01"]
+        assert result["bucket_seconds"] == 3600
+        assert result["time_of_day"][:2] == [1800, 5400]
+        assert [d["count"] for d in result["days"]] == [144, 144]
+        assert result["days"][0]["data"]["lux"] == [200.0 + h for h in range(24)]
+        assert result["days"][1]["data"]["lux"] == [float(h) for h in range(24)]
+
+    def test_time_of_day_window(self, temp_db):
+        """Test only the selected hours are compared."""
+        result = overlay_service.query_overlay(
+            ["2024-06-02"], ["lux"], downsample=4, from_time=6 * 3600, to_time=10 * 3600
+        )
+
+        assert result["days"][0]["count"] == 24
+        assert result["days"][0]["data"]["lux"] == [106.0, 107.0, 108.0, 109.0]
+
+    def test_missing_day_is_empty(self, temp_db):
+        """Test days without captures have null buckets."""
+        result = overlay_service.query_overlay(["2024-01-01"], ["lux"], downsample=10)
+
+        assert result["days"][0]["count"] == 0
+        assert result["days"][0]["data"]["lux"] == [None] * 10
+
+    def test_non_numeric_metrics_rejected(self, temp_db):
+        """Test text metrics can't be averaged."""
+        result = overlay_service.query_overlay(["0"], ["mode"])
+        assert result["error"] == "No valid metrics specified"
+
+    def test_too_many_days(self, temp_db):
+        """Test the day limit."""
+        days = [str(i) for i in range(overlay_service.MAX_OVERLAY_DAYS + 1)]
+        result = overlay_service.query_overlay(days, ["lux"])
+        assert "error" in result
+
+    def test_invalid_day(self, temp_db):
+        """Test unparseable days are rejected."""
+        result = overlay_service.query_overlay(["soon"], ["lux"])
+        assert result["error"] == "Invalid day"
+
+    def test_no_db(self):
+        """Test error when database doesn't exist."""
+        with patch.object(
+            charts_service, "DATABASE_PATH", Path("/nonexistent/db.sqlite")
+        ):
+            result = overlay_service.query_overlay()
+        assert result == {"days": [], "error": "Database not found"}
+
+
+class TestQueryHeatmap:
+    """Test query_heatmap."""
+
+    def test_day_by_bin_matrix(self, temp_db):
+        """Test one row per local day with one cell per time-of-day bin."""
+        result = overlay_service.query_heatmap(
+            "lux", start="2024-06-01T00:00:00", end="2024-06-03T23:59:59", bins=24
+        )
+
+        assert result["days"] == ["2024-06-01", "2024-06-02", "2024-06-03"]
+        assert result["bin_seconds"] == 3600
+        assert result["values"][1] == [100.0 + h for h in range(24)]
+
+    def test_count_aggregate(self, temp_db):
+        """Test cells can count captures."""
+        result = overlay_service.query_heatmap(
+            "lux",
+            start="2024-06-02T00:00:00",
+            end="2024-06-02T23:55:00",
+            bins=48,
+            agg="count",
+        )
+
+        assert result["values"] == [[3] * 48]
+
+    def test_empty_bins_are_null(self, temp_db):
+        """Test bins without captures are None."""
+        result = overlay_service.query_heatmap(
+            "lux", start="2024-06-01T00:00:00", end="2024-06-01T11:55:00", bins=24
+        )
+
+        assert result["values"][0][:12] == [float(h) for h in range(12)]
+        assert result["values"][0][12:] == [None] * 12
+
+    def test_unknown_aggregate(self, temp_db):
+        """Test unknown aggregates are rejected."""
+        result = overlay_service.query_heatmap("lux", agg="median")
+        assert "error" in result
+
+    def test_non_numeric_metric(self, temp_db):
+        """Test text metrics are rejected."""
+        result = overlay_service.query_heatmap("mode")
+        assert result["error"] == "Unknown metric: mode"
@@ -0,0 +1,99 @@
+"""Test query time budgets."""
+
+import pytest
+import sqlite3
+import os
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import query_budget
+
+# Enough VM work to trip a budget check
+SLOW_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000)
+    SELECT SUM(i) FROM n
+"""
+
+
+@pytest.fixture
+def conn():
+    """An in-memory connection."""
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+class TestLimit:
+    """Test query_budget.limit."""
+
+    def test_within_budget(self, conn):
+        """Test queries inside the budget run normally."""
+        with query_budget.limit(conn, seconds=60):
+            assert conn.execute(SLOW_QUERY).fetchone()[0] == 200000 * 200001 // 2
+
+    def test_timeout(self, conn):
+        """Test a query over budget is interrupted."""
+        with pytest.raises(query_budget.QueryInterrupted) as excinfo:
+            with query_budget.limit(conn, seconds=0):
+                conn.execute(SLOW_QUERY).fetchone()
+
+        assert excinfo.value.reason == "timeout"
+
+    def test_superseded(self, conn):
+        """Test a newer request with the same token interrupts the older one."""
+        with pytest.raises(query_budget.QueryInterrupted) as excinfo:
+            with query_budget.limit(conn, seconds=60, token="page-1"):
+                with query_budget.limit(sqlite3.connect(":memory:"), token="page-1"):
+                    pass
+                conn.execute(SLOW_QUERY).fetchone()
+
+        assert excinfo.value.reason == "superseded"
+
+    def test_other_tokens_unaffected(self, conn):
+        """Test requests with different tokens don't cancel each other."""
+        with query_budget.limit(conn, seconds=60, token="page-2"):
+            with query_budget.limit(sqlite3.connect(":memory:"), token="page-3"):
+                pass
+            assert conn.execute(SLOW_QUERY).fetchone()[0] > 0
+
+    def test_other_errors_pass_through(self, conn):
+        """Test SQL errors unrelated to the budget are re-raised as is."""
+        with pytest.raises(sqlite3.OperationalError):
+            with query_budget.limit(conn):
+                conn.execute("SELECT * FROM missing")
+
+    def test_handler_removed(self, conn):
+        """Test the budget stops applying after the block."""
+        with patch.object(query_budget, "PROGRESS_STEPS", 1):
+            with query_budget.limit(conn, seconds=0):
+                pass
+        assert conn.execute(SLOW_QUERY).fetchone()[0] > 0
+
+
+class TestExtend:
+    """Test query_budget.extend."""
+
+    def test_unbounded_outside_limit(self, conn):
+        """Test extend() without an enclosing limit() changes nothing."""
+        with patch.object(query_budget, "PROGRESS_STEPS", 1):
+            with query_budget.extend(conn):
+                assert conn.execute(SLOW_QUERY).fetchone()[0] > 0
+
+    def test_shares_enclosing_budget(self, conn):
+        """Test another connection is interrupted by the enclosing budget."""
+        other = sqlite3.connect(":memory:")
+        with pytest.raises(query_budget.QueryInterrupted) as excinfo:
+            with query_budget.limit(conn, seconds=0):
+                with query_budget.extend(other):
+                    other.execute(SLOW_QUERY).fetchone()
+
+        assert excinfo.value.reason == "timeout"
+        # Both handlers are gone afterwards
+        assert other.execute(SLOW_QUERY).fetchone()[0] > 0
+        with query_budget.extend(other):
+            assert other.execute(SLOW_QUERY).fetchone()[0] > 0
+        other.close()
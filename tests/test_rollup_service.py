@@ -0,0 +1,345 @@
+"""Test rollup table maintenance and rollup-backed chart queries."""
+
+import pytest
+import sqlite3
+import time
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, db_pool, rollup_service, snapshot_service
+
+COLUMNS = ["lux", "brightness_mean", "exposure_time_us"]
+
+
+def _capture(ts, i):
+    return {
+        "ts": ts,
+        "camera_id": "test_cam",
+        "image_path": f"/tmp/img_{i}.jpg",
+        "lux": 100.0 * (i + 1),
+        "mode": "day" if i % 2 == 0 else "night",
+        "brightness_mean": 128.0 + i,
+        "exposure_time_us": 1000 * (i + 1),
+    }
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with 100 hourly captures."""
+    now = datetime.now()
+    return captures_db(
+        [_capture(now - timedelta(hours=i), i) for i in range(100)],
+        columns=(
+            "camera_id TEXT NOT NULL",
+            "image_path TEXT NOT NULL",
+            "lux REAL",
+            "mode TEXT",
+            "brightness_mean REAL",
+            "exposure_time_us INTEGER",
+        ),
+        patch_path=False,
+    )
+
+
+def _level_counts(db_path, level):
+    conn = sqlite3.connect(rollup_service.get_rollup_path(Path(db_path)))
+    try:
+        return conn.execute(
+            f"SELECT COUNT(*), SUM(count) FROM rollup_{level}"
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def _wait_for_refresh(db_path):
+    deadline = time.monotonic() + 5
+    while str(db_path) in rollup_service._refreshing:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _level_rows(db_path, level):
+    conn = sqlite3.connect(rollup_service.get_rollup_path(Path(db_path)))
+    try:
+        return conn.execute(f"SELECT * FROM rollup_{level} ORDER BY bucket").fetchall()
+    finally:
+        conn.close()
+
+
+class TestChooseLevel:
+    """Test rollup level selection."""
+
+    def test_picks_coarsest_level_with_enough_points(self):
+        """Test the coarsest level still giving target points is chosen."""
+        assert rollup_service.choose_level(365 * 86400, 300) == "day"
+        assert rollup_service.choose_level(30 * 86400, 500) == "hour"
+        assert rollup_service.choose_level(24 * 3600, 500) == "minute"
+
+    def test_returns_none_for_short_ranges(self):
+        """Test short ranges fall back to raw captures."""
+        assert rollup_service.choose_level(3600, 500) is None
+
+
+class TestRefreshRollups:
+    """Test incremental rollup maintenance."""
+
+    def test_builds_all_levels(self, temp_db):
+        """Test initial refresh aggregates every capture at each level."""
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        for level, _ in rollup_service.ROLLUP_LEVELS:
+            buckets, total = _level_counts(temp_db, level)
+            assert total == 100
+            assert buckets > 0
+        assert _level_counts(temp_db, "hour")[0] == 100
+
+    def test_aggregates_avg_min_max(self, temp_db):
+        """Test bucket aggregates match the captures table."""
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        conn = sqlite3.connect(rollup_service.get_rollup_path(Path(temp_db)))
+        try:
+            row = conn.execute(
+                "SELECT MIN(lux_min), MAX(lux_max), SUM(lux_avg * count) FROM rollup_day"
+            ).fetchone()
+        finally:
+            conn.close()
+
+        assert row[0] == 100.0
+        assert row[1] == 10000.0
+        assert row[2] == pytest.approx(sum(100.0 * (i + 1) for i in range(100)))
+
+    def test_incremental_refresh_adds_new_rows(self, temp_db, insert_captures):
+        """Test a refresh after new captures only extends the rollups."""
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        insert_captures(temp_db, [_capture(datetime.now() + timedelta(minutes=5), 100)])
+
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        for level, _ in rollup_service.ROLLUP_LEVELS:
+            assert _level_counts(temp_db, level)[1] == 101
+
+    def test_refresh_is_throttled(self, temp_db, insert_captures):
+        """Test refreshes within REFRESH_INTERVAL are skipped."""
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        insert_captures(temp_db, [_capture(datetime.now() + timedelta(minutes=5), 100)])
+
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS)
+
+        assert _level_counts(temp_db, "hour")[1] == 100
+
+    def test_chunked_build_matches_single_pass(self, temp_db):
+        """Test a build split into many transactions gives the same buckets."""
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+        single = _level_rows(temp_db, "hour")
+        rollup_service.get_rollup_path(Path(temp_db)).unlink()
+
+        with patch.object(rollup_service, "REFRESH_CHUNK_SECONDS", 86400):
+            rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+
+        assert _level_rows(temp_db, "hour") == single
+
+    def test_partial_build_is_not_served(self, temp_db):
+        """Test readers get None until a build has finished."""
+        real_refresh_level = rollup_service._refresh_level
+
+        def fail_after_day(conn, level, *args):
+            if level != "day":
+                raise sqlite3.OperationalError("interrupted")
+            real_refresh_level(conn, level, *args)
+
+        with patch.object(rollup_service, "_refresh_level", fail_after_day):
+            with pytest.raises(sqlite3.OperationalError):
+                rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+        assert (
+            rollup_service.query_rollup(Path(temp_db), "day", 0, 4e9, COLUMNS) is None
+        )
+
+        rollup_service.refresh_rollups(Path(temp_db), COLUMNS, force=True)
+        rows, cursor = rollup_service.query_rollup(
+            Path(temp_db), "day", 0, 4e9, COLUMNS
+        )
+        assert sum(row["count"] for row in rows) == 100
+        assert cursor == 100
+
+    def test_request_refresh_builds_in_background(self, temp_db):
+        """Test request_refresh returns at once and builds in a thread."""
+        rollup_service.request_refresh(Path(temp_db), COLUMNS)
+        _wait_for_refresh(temp_db)
+
+        rows, _ = rollup_service.query_rollup(Path(temp_db), "hour", 0, 4e9, COLUMNS)
+        assert len(rows) == 100
+
+    def test_built_from_snapshot_when_enabled(self, temp_db, insert_captures):
+        """Test background refreshes read the snapshot, not timelapse.db."""
+        snapshot_path = snapshot_service.get_snapshot_path(Path(temp_db))
+        snapshot_service.rebuild(Path(temp_db))
+        insert_captures(temp_db, [_capture(datetime.now() + timedelta(minutes=5), 100)])
+
+        try:
+            with patch.object(snapshot_service, "MAX_STALENESS", 3600):
+                rollup_service.request_refresh(Path(temp_db), COLUMNS)
+                _wait_for_refresh(temp_db)
+
+            # The row added after the snapshot was taken isn't rolled up yet
+            assert _level_counts(temp_db, "hour")[1] == 100
+        finally:
+            db_pool.close_connections()
+            snapshot_service._last_refresh.clear()
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{snapshot_path}{suffix}").unlink(missing_ok=True)
+
+    def test_waits_for_snapshot(self, temp_db):
+        """Test nothing is built from timelapse.db while the snapshot is missing."""
+        with patch.object(snapshot_service, "MAX_STALENESS", 3600):
+            with patch.object(
+                snapshot_service, "get_read_path", return_value=Path(temp_db)
+            ):
+                rollup_service.request_refresh(Path(temp_db), COLUMNS)
+                _wait_for_refresh(temp_db)
+
+        assert not rollup_service.get_rollup_path(Path(temp_db)).exists()
+
+    def test_only_tracks_existing_columns(self, temp_db):
+        """Test columns missing from captures are not rolled up."""
+        rollup_service.refresh_rollups(
+            Path(temp_db), COLUMNS + ["sun_elevation"], force=True
+        )
+
+        rows = rollup_service.query_rollup(
+            Path(temp_db), "hour", 0, 4e9, ["sun_elevation"]
+        )
+
+        assert rows is None
+
+
+class TestQueryChartDataRollups:
+    """Test query_chart_data reading from rollups."""
+
+    def test_long_range_uses_rollups(self, temp_db):
+        """Test a multi-day range is served from the hourly rollup."""
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+        rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start=start, metrics=["lux"], downsample=500
+            )
+
+        assert result["resolution"] == "hour"
+        assert result["original_count"] == 100
+        assert result["point_count"] == 100
+
+    def test_cursor_matches_rollups(self, temp_db, insert_captures):
+        """Test captures the rollups haven't seen yet reach the next delta."""
+        rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+        insert_captures(temp_db, [_capture(datetime.now() + timedelta(minutes=5), 100)])
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+        end = (datetime.now() + timedelta(hours=1)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(rollup_service, "request_refresh"):
+                result = charts_service.query_chart_data(
+                    start=start, end=end, metrics=["lux"]
+                )
+                batch = charts_service.query_chart_batch(
+                    start=start, end=end, panels=[{"id": "light", "metrics": ["lux"]}]
+                )
+            delta = charts_service.query_chart_delta(
+                cursor=result["cursor"], metrics=["lux"]
+            )
+
+        assert result["resolution"] == "hour"
+        assert result["cursor"] == 100
+        assert batch["cursor"] == 100
+        assert "cursor" not in batch["panels"]["light"]
+        assert delta["data"]["lux"] == [10100.0]
+
+    def test_lagging_rollups_are_not_cached(self, temp_db, insert_captures):
+        """Test a closed range isn't cached without captures the rollups lack."""
+        rollup_service.refresh_rollups(
+            Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+        )
+        now = datetime.now()
+        insert_captures(
+            temp_db,
+            [
+                _capture(now + timedelta(minutes=10), 100),
+                _capture(now + timedelta(hours=6), 101),
+            ],
+        )
+        # Ends between the two new captures, clear of the later one even after
+        # the range is snapped outwards and widened to whole buckets
+        start = (now - timedelta(days=30)).isoformat()
+        end = (now + timedelta(minutes=90)).isoformat()
+        panels = [{"id": "light", "metrics": ["lux"]}]
+
+        def query():
+            return (
+                charts_service.query_chart_data(start=start, end=end, metrics=["lux"]),
+                charts_service.query_chart_batch(start=start, end=end, panels=panels),
+            )
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(rollup_service, "request_refresh"):
+                lagging, lagging_batch = query()
+                rollup_service.refresh_rollups(
+                    Path(temp_db), charts_service.ROLLUP_COLUMNS, force=True
+                )
+                result, batch = query()
+
+        assert lagging["original_count"] == 100
+        assert lagging_batch["panels"]["light"]["original_count"] == 100
+        assert result["original_count"] == 101
+        assert batch["panels"]["light"]["original_count"] == 101
+
+    def test_raw_until_rollups_are_built(self, temp_db):
+        """Test the first long-range query reads captures, not a fresh build."""
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            with patch.object(rollup_service, "request_refresh") as request_refresh:
+                result = charts_service.query_chart_data(
+                    start=start, metrics=["lux"], downsample=500
+                )
+
+        request_refresh.assert_called_once()
+        assert "resolution" not in result
+        assert result["original_count"] == 100
+
+    def test_raw_resolution_skips_rollups(self, temp_db):
+        """Test resolution=raw always reads captures."""
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start=start, metrics=["lux"], resolution="raw"
+            )
+
+        assert "resolution" not in result
+        assert result["original_count"] == 100
+
+    def test_text_metric_falls_back_to_raw(self, temp_db):
+        """Test queries including mode are not served from rollups."""
+        start = (datetime.now() - timedelta(days=30)).isoformat()
+
+        with patch.object(charts_service, "DATABASE_PATH", Path(temp_db)):
+            result = charts_service.query_chart_data(
+                start=start, metrics=["lux", "mode"]
+            )
+
+        assert "resolution" not in result
+        assert len(result["data"]["mode"]) == result["point_count"]
@@ -0,0 +1,216 @@
+"""Test the local read snapshot of timelapse.db."""
+
+import pytest
+import sqlite3
+import time
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, snapshot_service
+
+
+def _captures(count, start=0):
+    return [
+        {"ts": datetime.fromtimestamp(1000.0 + i), "lux": float(i)}
+        for i in range(start, start + count)
+    ]
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT rowid, * FROM captures ORDER BY rowid").fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with 25 captures."""
+    path = captures_db(
+        _captures(25),
+        columns=("mode TEXT", "lux REAL"),
+        indexes={"idx_captures_unix": "unix_timestamp"},
+        patch_path=False,
+    )
+
+    with patch.object(snapshot_service, "MIRROR_CHUNK_ROWS", 10):
+        yield path
+
+    snapshot_service._last_refresh.clear()
+
+
+def _indexes(path):
+    conn = sqlite3.connect(path)
+    names = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    }
+    conn.close()
+    return names
+
+
+class TestRebuild:
+    """Test building the mirror."""
+
+    def test_mirrors_rows_and_rowids(self, temp_db):
+        """Test every row is copied with its rowid, in chunks."""
+        snapshot_service.rebuild(temp_db)
+        snapshot = snapshot_service.get_snapshot_path(temp_db)
+
+        assert _rows(snapshot) == _rows(temp_db)
+
+    def test_creates_indexes(self, temp_db):
+        """Test source and recommended charts indexes exist on the mirror."""
+        snapshot_service.rebuild(temp_db)
+        names = _indexes(snapshot_service.get_snapshot_path(temp_db))
+
+        assert "idx_captures_unix" in names
+        assert "idx_captures_unix_timestamp_mode" in names
+        assert "idx_captures_unix_timestamp_mode" not in _indexes(temp_db)
+
+    def test_rebuild_replaces_mirror(self, temp_db):
+        """Test a second rebuild reflects rows edited in place."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(temp_db)
+        conn.execute("UPDATE captures SET lux = -1 WHERE id = 3")
+        conn.commit()
+        conn.close()
+
+        snapshot_service.rebuild(temp_db)
+        assert _rows(snapshot_service.get_snapshot_path(temp_db)) == _rows(temp_db)
+
+
+class TestRefresh:
+    """Test topping the mirror up."""
+
+    def test_appends_new_rows(self, temp_db, insert_captures):
+        """Test rows appended to the source are copied over."""
+        snapshot_service.rebuild(temp_db)
+        insert_captures(temp_db, _captures(13, start=25))
+
+        assert snapshot_service.refresh(temp_db)
+        assert _rows(snapshot_service.get_snapshot_path(temp_db)) == _rows(temp_db)
+
+    def test_needs_rebuild_when_rows_shrink(self, temp_db):
+        """Test deleted tail rows can't be caught up by appending."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(temp_db)
+        conn.execute("DELETE FROM captures WHERE id > 20")
+        conn.commit()
+        conn.close()
+
+        assert not snapshot_service.refresh(temp_db)
+
+    def test_needs_rebuild_on_schema_change(self, temp_db):
+        """Test a new source column invalidates the mirror."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(temp_db)
+        conn.execute("ALTER TABLE captures ADD COLUMN sun_elevation REAL")
+        conn.commit()
+        conn.close()
+
+        assert not snapshot_service.refresh(temp_db)
+
+    def test_needs_rebuild_when_head_pruned(self, temp_db):
+        """Test deleting the oldest rows invalidates the mirror."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(temp_db)
+        conn.execute("DELETE FROM captures WHERE id <= 5")
+        conn.commit()
+        conn.close()
+
+        assert not snapshot_service.refresh(temp_db)
+
+    def test_count_drift_found_once_verify_is_due(self, temp_db):
+        """Test rows deleted from the middle are found by the periodic count."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(temp_db)
+        conn.execute("DELETE FROM captures WHERE id = 12")
+        conn.commit()
+        conn.close()
+
+        assert snapshot_service.refresh(temp_db)
+        with patch.object(snapshot_service, "VERIFY_INTERVAL", 0):
+            assert not snapshot_service.refresh(temp_db)
+
+    def test_no_periodic_rebuild_by_default(self, temp_db):
+        """Test an old but matching mirror is kept unless REBUILD_INTERVAL is set."""
+        snapshot_service.rebuild(temp_db)
+        conn = sqlite3.connect(snapshot_service.get_snapshot_path(temp_db))
+        conn.execute("UPDATE snapshot_meta SET value = '0' WHERE key = 'built_at'")
+        conn.commit()
+        conn.close()
+
+        assert snapshot_service.refresh(temp_db)
+        with patch.object(snapshot_service, "REBUILD_INTERVAL", 3600):
+            assert not snapshot_service.refresh(temp_db)
+
+    def test_needs_rebuild_without_snapshot(self, temp_db):
+        """Test an empty snapshot file is not usable."""
+        assert not snapshot_service.refresh(temp_db)
+
+
+class TestGetReadPath:
+    """Test get_read_path."""
+
+    def test_disabled_reads_source(self, temp_db):
+        """Test timelapse.db is read directly by default."""
+        assert snapshot_service.get_read_path(temp_db) == temp_db
+
+    def test_builds_then_serves_snapshot(self, temp_db):
+        """Test the source is read until the background build finishes."""
+        snapshot = snapshot_service.get_snapshot_path(temp_db)
+        with patch.object(snapshot_service, "MAX_STALENESS", 60):
+            assert snapshot_service.get_read_path(temp_db) == temp_db
+
+            deadline = time.monotonic() + 5
+            while snapshot_service._rebuilding and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert snapshot_service.get_read_path(temp_db) == snapshot
+
+    def test_staleness_bound(self, temp_db, insert_captures):
+        """Test appended rows show up once the snapshot is older than the bound."""
+        snapshot_service.rebuild(temp_db)
+        snapshot = snapshot_service.get_snapshot_path(temp_db)
+        insert_captures(temp_db, _captures(1, start=25))
+
+        with patch.object(snapshot_service, "MAX_STALENESS", 60):
+            snapshot_service.get_read_path(temp_db)
+            assert len(_rows(snapshot)) == 25
+
+            snapshot_service.expire(temp_db)
+            assert snapshot_service.get_read_path(temp_db) == snapshot
+            assert len(_rows(snapshot)) == 26
+
+    def test_chart_queries_read_snapshot(self, temp_db, insert_captures):
+        """Test charts_service reads go through the snapshot."""
+        snapshot_service.rebuild(temp_db)
+        insert_captures(temp_db, _captures(5, start=25))
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(snapshot_service, "MAX_STALENESS", 60):
+                stale = charts_service.query_chart_delta(cursor=0, metrics=["lux"])
+                snapshot_service.expire(temp_db)
+                fresh = charts_service.query_chart_delta(cursor=0, metrics=["lux"])
+
+        assert stale["point_count"] == 25
+        assert fresh["point_count"] == 30
+
+
+class TestConfigure:
+    """Test configure."""
+
+    def test_non_positive_disables(self):
+        """Test non-positive bounds disable snapshots."""
+        with patch.object(snapshot_service, "MAX_STALENESS", None):
+            snapshot_service.configure(15)
+            assert snapshot_service.MAX_STALENESS == 15
+            snapshot_service.configure(0)
+            assert snapshot_service.MAX_STALENESS is None
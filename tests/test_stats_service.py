@@ -0,0 +1,326 @@
+"""Test SQL-side summary statistics."""
+
+import pytest
+import sqlite3
+import statistics
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import charts_service, stats_service
+
+
+@pytest.fixture
+def temp_db(captures_db):
+    """Create a temporary database with three days of 10-minute captures."""
+    start = datetime(2024, 6, 1)
+    return captures_db(
+        [
+            {
+                "ts": start + timedelta(minutes=10 * i),
+                "mode": "day",
+                "lux": None if i % 10 == 0 else float((i * 37) % 500),
+                "exposure_time_us": 1000 + i,
+            }
+            for i in range(3 * 144)
+        ],
+        patch_path=False,
+    )
+
+
+RANGE = {"start": "2024-06-01T00:00:00", "end": "2024-06-03T23:59:59"}
+
+
+def _values(path, column):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        f"SELECT {column} FROM captures WHERE {column} IS NOT NULL"
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+class TestQueryStats:
+    """Test query_stats function."""
+
+    def test_matches_exact_statistics(self, temp_db):
+        """Test aggregates are exact and percentiles within one bin."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_stats(metrics=["lux"], **RANGE)
+
+        values = _values(temp_db, "lux")
+        stats = result["stats"]["lux"]
+        assert stats["count"] == len(values)
+        assert stats["min"] == min(values)
+        assert stats["max"] == max(values)
+        assert stats["mean"] == pytest.approx(statistics.mean(values))
+        assert stats["stddev"] == pytest.approx(statistics.pstdev(values))
+
+        width = (max(values) - min(values)) / stats_service.HISTOGRAM_BINS
+        quantiles = statistics.quantiles(values, n=20, method="inclusive")
+        assert stats["p5"] == pytest.approx(quantiles[0], abs=2 * width)
+        assert stats["p50"] == pytest.approx(statistics.median(values), abs=2 * width)
+        assert stats["p95"] == pytest.approx(quantiles[-1], abs=2 * width)
+
+    def test_daily_buckets(self, temp_db):
+        """Test per-day buckets add up to the overall stats."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_stats(
+                metrics=["lux", "exposure_time_us"], bucket="day", **RANGE
+            )
+
+        assert [b["start"] for b in result["buckets"]] == [
+            "2024-06-01",
+            "2024-06-02",
+            "2024-06-03",
+        ]
+        counts = [b["stats"]["exposure_time_us"]["count"] for b in result["buckets"]]
+        assert counts == [144, 144, 144]
+        assert result["buckets"][0]["stats"]["exposure_time_us"]["min"] == 1000
+        assert result["stats"]["exposure_time_us"]["max"] == 1000 + 3 * 144 - 1
+        for b in result["buckets"]:
+            stats = b["stats"]["lux"]
+            assert stats["min"] <= stats["p5"] <= stats["p50"] <= stats["p95"]
+            assert stats["p95"] <= stats["max"]
+
+    def test_empty_range(self, temp_db):
+        """Test an empty range reports zero counts."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_stats(
+                start="2000-01-01T00:00:00", end="2000-01-02T00:00:00", metrics=["lux"]
+            )
+
+        assert result["stats"]["lux"]["count"] == 0
+        assert result["stats"]["lux"]["p50"] is None
+
+    def test_rejects_text_metrics_and_bad_bucket(self, temp_db):
+        """Test non-numeric metrics and unknown buckets are errors."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            text_only = stats_service.query_stats(metrics=["mode"])
+            bad_bucket = stats_service.query_stats(bucket="week")
+
+        assert text_only["error"] == "No valid metrics specified"
+        assert "error" in bad_bucket
+
+
+class TestQueryHistogram:
+    """Test query_histogram function."""
+
+    def test_counts_match_python_binning(self, temp_db):
+        """Test SQL bin counts equal binning every value in Python."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_histogram("lux", bins=20, **RANGE)
+
+        values = _values(temp_db, "lux")
+        low, high = min(values), max(values)
+        expected = [0] * 20
+        for value in values:
+            expected[min(int((value - low) / ((high - low) / 20)), 19)] += 1
+
+        assert result["counts"] == expected
+        assert result["count"] == len(values)
+        assert result["edges"][0] == low
+        assert result["edges"][-1] == pytest.approx(high)
+
+    def test_log_scale(self, temp_db):
+        """Test log bins skip non-positive values and span decades."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_histogram("lux", bins=10, scale="log", **RANGE)
+
+        positive = [v for v in _values(temp_db, "lux") if v > 0]
+        assert result["count"] == len(positive)
+        assert sum(result["counts"]) == len(positive)
+        assert result["edges"][0] == pytest.approx(min(positive))
+        assert result["edges"][-1] == pytest.approx(max(positive))
+
+    def test_log_without_sqlite_math(self, temp_db):
+        """Test log10() is provided when SQLite lacks the math functions."""
+        conn = sqlite3.connect(":memory:")
+        real_execute = conn.execute
+
+        class NoMath:
+            def execute(self, sql, *args):
+                if sql == "SELECT log10(1)":
+                    raise sqlite3.OperationalError("no such function: log10")
+                return real_execute(sql, *args)
+
+            def create_function(self, *args, **kwargs):
+                return conn.create_function(*args, **kwargs)
+
+        stats_service._ensure_log10(NoMath())
+        assert conn.execute("SELECT log10(1000)").fetchone()[0] == pytest.approx(3)
+
+    def test_empty_range(self, temp_db):
+        """Test an empty range has no counts."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_histogram(
+                "lux", start="2020-01-01T00:00:00", end="2020-01-02T00:00:00"
+            )
+
+        assert result["count"] == 0
+        assert result["counts"] == []
+
+    def test_invalid_metric_and_scale(self, temp_db):
+        """Test text metrics and unknown scales are rejected."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            assert "error" in stats_service.query_histogram("mode")
+            assert "error" in stats_service.query_histogram("lux", scale="sqrt")
+
+
+class TestQueryCadence:
+    """Test query_cadence function."""
+
+    def test_regular_captures(self, temp_db):
+        """Test evenly spaced captures have no overruns."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_cadence(600, **RANGE)
+
+        overall = result["overall"]
+        assert overall["count"] == 3 * 144 - 1
+        assert overall["p50"] == overall["p99"] == 600
+        assert overall["overruns"] == 0
+        assert len(result["hours"]) == 72
+        assert set(result["modes"]) == {"day"}
+
+    def test_overruns_per_hour_and_mode(self, temp_db):
+        """Test late captures are counted under their own hour and mode."""
+        conn = sqlite3.connect(temp_db)
+        # Push the 02:00 capture back 5 minutes as a long night exposure
+        late = datetime(2024, 6, 2, 2, 5)
+        conn.execute(
+            "UPDATE captures SET unix_timestamp = ?, mode = 'night' "
+            "WHERE unix_timestamp = ?",
+            (late.timestamp(), datetime(2024, 6, 2, 2, 0).timestamp()),
+        )
+        conn.commit()
+        conn.close()
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_cadence(600, **RANGE)
+
+        assert result["overall"]["overruns"] == 1
+        assert result["modes"]["night"] == {
+            "count": 1,
+            "overruns": 1,
+            "stalls": 0,
+            "max": 900,
+            "p50": 900,
+            "p95": 900,
+            "p99": 900,
+        }
+        hours = {entry["hour"]: entry for entry in result["hours"]}
+        assert hours["2024-06-02T02:00:00"]["overruns"] == 1
+        assert hours["2024-06-02T02:00:00"]["modes"]["day"]["count"] == 5
+        assert hours["2024-06-02T02:00:00"]["modes"]["day"]["overruns"] == 0
+        assert hours["2024-06-02T01:00:00"]["overruns"] == 0
+
+    def test_stalls_left_out_of_percentiles(self, temp_db):
+        """Test deltas past the gap threshold are only counted as stalls."""
+        conn = sqlite3.connect(temp_db)
+        conn.execute(
+            "DELETE FROM captures WHERE unix_timestamp > ? AND unix_timestamp < ?",
+            (
+                datetime(2024, 6, 2, 3, 0).timestamp(),
+                datetime(2024, 6, 2, 6, 0).timestamp(),
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_cadence(600, **RANGE)
+
+        assert result["overall"]["stalls"] == 1
+        assert result["overall"]["max"] == 600
+        assert result["overall"]["overruns"] == 0
+
+    def test_empty_range(self, temp_db):
+        """Test an empty range has no percentiles."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_cadence(
+                600, start="2020-01-01T00:00:00", end="2020-01-02T00:00:00"
+            )
+
+        assert result["overall"]["count"] == 0
+        assert result["overall"]["p95"] is None
+        assert result["hours"] == []
+
+    def test_no_db(self):
+        """Test error when database doesn't exist."""
+        with patch.object(
+            charts_service, "DATABASE_PATH", Path("/nonexistent/db.sqlite")
+        ):
+            result = stats_service.query_cadence(600)
+
+        assert result["error"] == "Database not found"
+
+
+class TestQueryCorrelation:
+    """Test query_correlation function."""
+
+    def test_bins_cover_every_row(self, temp_db):
+        """Test bin counts add up and land in the right cells."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_correlation(
+                "exposure_time_us", "lux", bins=10, **RANGE
+            )
+
+        assert result["count"] == len(_values(temp_db, "lux"))
+        assert sum(n for _, _, n in result["bins"]) == result["count"]
+        assert len(result["x"]["edges"]) == 11
+        # Row 0 has no lux, so the first paired exposure is 1001
+        assert result["x"]["edges"][0] == 1001
+        assert result["x"]["edges"][-1] == pytest.approx(1000 + 3 * 144 - 1)
+        # The highest exposure lands in the last x bin
+        assert max(i for i, _, _ in result["bins"]) == 9
+
+    def test_log_scale_drops_non_positive(self, temp_db):
+        """Test log axes skip zero values and use geometric edges."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_correlation(
+                "lux", "exposure_time_us", bins=8, x_scale="log", **RANGE
+            )
+
+        positive = [v for v in _values(temp_db, "lux") if v > 0]
+        assert result["count"] == len(positive)
+        edges = result["x"]["edges"]
+        assert edges[0] == pytest.approx(min(positive))
+        assert edges[2] / edges[1] == pytest.approx(edges[1] / edges[0])
+
+    @pytest.mark.skipif(stats_service.np is None, reason="NumPy is not available")
+    def test_python_fallback_matches_numpy(self, temp_db):
+        """Test both binning engines give identical histograms."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            with patch.object(stats_service, "CORRELATION_CHUNK_ROWS", 50):
+                fast = stats_service._compute_correlation(
+                    charts_service.get_db_connection(),
+                    0,
+                    float("inf"),
+                    ("lux", "log"),
+                    ("exposure_time_us", "linear"),
+                    12,
+                )
+                with patch.object(stats_service, "np", None):
+                    slow = stats_service._compute_correlation(
+                        charts_service.get_db_connection(),
+                        0,
+                        float("inf"),
+                        ("lux", "log"),
+                        ("exposure_time_us", "linear"),
+                        12,
+                    )
+
+        assert fast == slow
+
+    def test_invalid_metric(self, temp_db):
+        """Test text and unknown metrics are rejected."""
+        with patch.object(charts_service, "DATABASE_PATH", temp_db):
+            result = stats_service.query_correlation("mode", "lux")
+
+        assert result["error"] == "Invalid metric: mode"